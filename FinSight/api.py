@@ -0,0 +1,157 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db.models import Count, Max
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.http import condition, require_GET
+
+from .dashboard import cached_portfolio_summary, favorites_summary
+from .models import FavoriteStock, Portfolio, Transaction
+from .pagination import DEFAULT_PAGE_SIZE, keyset_page
+from .views import filter_transactions
+
+API_VERSION = 'v1'
+
+
+def make_etag(request, *parts):
+    """
+    Strong ETag for one representation: the API version, the path and query
+    string, plus whatever versions the response depends on.
+    """
+    raw = "|".join([API_VERSION, request.path, request.GET.urlencode(), *map(str, parts)])
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def portfolio_version(request):
+    return Portfolio.objects.filter(user_id=request.user.pk).values_list('version', flat=True).first()
+
+
+def ledger_etag(request):
+    version = portfolio_version(request)
+    return None if version is None else make_etag(request, version)
+
+
+def api_response(data):
+    # Clients may keep the body but must revalidate it (cheaply, via the ETag) before reuse.
+    response = JsonResponse({'version': API_VERSION, **data})
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def priced_response(request, data, *parts):
+    """
+    api_response(data), or 304 Not Modified if the client's copy matches.
+    Priced views can only tell which prices they serve after pricing, so
+    their ETag (parts include the summary's price_version) is built here
+    rather than by @condition before the view runs.
+    """
+    etag = quote_etag(make_etag(request, *parts))
+    response = get_conditional_response(request, etag=etag) or api_response(data)
+    response.headers['ETag'] = etag
+    return response
+
+
+@login_required
+@require_GET
+def portfolioSummaryApi(request):
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    summary = cached_portfolio_summary(portfolio)
+    return priced_response(request, {
+        'portfolio': {
+            'name': portfolio.name,
+            'cashBalance': portfolio.cashBalance,
+            'riskTolerance': portfolio.riskTolerance,
+            'investmentGoal': portfolio.investmentGoal,
+            'costBasisMethod': portfolio.costBasisMethod,
+            'diversification': summary['diversification'],
+        },
+        'totals': {
+            'value': summary['total_portfolio_value'],
+            'pnl': summary['total_portfolio_pnl'],
+            'unrealizedPnl': summary['total_unrealized_pnl'],
+            'realizedPnl': summary['total_realized_pnl'],
+        },
+        'lastPriceUpdate': summary['last_cache_time'],
+        'staleSymbols': sorted(summary['stale_symbols']),
+    }, portfolio.version, summary['price_version'])
+
+
+@login_required
+@require_GET
+def holdingsApi(request):
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    summary = cached_portfolio_summary(portfolio)
+    return priced_response(request, {
+        'holdings': [
+            {
+                'symbol': row['symbol'],
+                'quantity': row['owned_qty'],
+                'price': row['current_price'],
+                'avgCost': row['avg_buy_price'],
+                'value': row['holding_value'],
+                'unrealizedPnl': row['pnl'],
+                'percent': row['percent'],
+                'stale': row['stale'],
+            }
+            for row in summary['stock_data']
+        ],
+        'lastPriceUpdate': summary['last_cache_time'],
+    }, portfolio.version, summary['price_version'])
+
+
+@login_required
+@require_GET
+@condition(etag_func=ledger_etag)
+def transactionsApi(request):
+    """
+    Same filters and keyset cursors ('after' / 'before') as the transaction list.
+    """
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    transactions = filter_transactions(Transaction.objects.filter(portfolio=portfolio), request.GET)
+    page, older, newer = keyset_page(transactions, after=request.GET.get('after'), before=request.GET.get('before'),
+                                     size=getattr(settings, 'TRANSACTIONS_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+    return api_response({
+        'transactions': [
+            {
+                'id': t.id,
+                'date': t.date,
+                'symbol': t.stockSymbol,
+                'name': t.stockName,
+                'type': t.transactionType,
+                'quantity': t.quantity,
+                'pricePerShare': t.pricePerShare,
+                'totalPrice': t.totalPrice,
+                'note': t.note or "",
+            }
+            for t in page
+        ],
+        'older': older,
+        'newer': newer,
+    })
+
+
+@login_required
+@require_GET
+def favoritesApi(request):
+    portfolio = Portfolio.objects.filter(user=request.user).first()
+    summary = favorites_summary(request.user, portfolio)
+    favorites = FavoriteStock.objects.filter(user_id=request.user.pk).aggregate(count=Count('id'), last=Max('id'))
+    return priced_response(request, {
+        'favorites': [
+            {
+                'symbol': row['symbol'],
+                'name': row['name'],
+                'price': row['current_price'],
+                'ownedQuantity': row['owned_qty'],
+                'value': row['value'],
+                'stale': row['stale'],
+            }
+            for row in summary['stock_data']
+        ],
+        'totalValue': summary['total_value'],
+        'lastPriceUpdate': summary['last_cache_time'],
+    }, favorites['count'], favorites['last'], portfolio and portfolio.version, summary['price_version'])
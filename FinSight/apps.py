@@ -5,6 +5,9 @@ class FinsightConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'FinSight'
 
+    def ready(self):
+        from . import db, metrics  # noqa: F401  (connection pragmas and the SQL timer)
+
 
 
 
@@ -0,0 +1,217 @@
+import random
+import time
+from collections import namedtuple
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction as db_transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import FavoriteStock, Holding, MainUser, Portfolio, Ticker, Transaction
+from .providers import FakeProvider
+from .tickers import BUNDLED_CSV, load_tickers, read_ticker_csv
+
+Dataset = namedtuple('Dataset', ['users', 'symbols', 'transactions'])
+Session = namedtuple('Session', ['client', 'portfolio', 'symbols'])
+
+FAKE_PROVIDERS = [{'BACKEND': 'FinSight.providers.FakeProvider'}]
+DEFAULT_SKEW = 1.1  # Zipf exponent: a handful of symbols get most of the trades
+DEFAULT_THRESHOLD = 0.2  # allowed p50/p95 growth over the baseline; query counts may not grow at all
+DEFAULT_MIN_DELTA_MS = 1.0  # latency changes smaller than this are noise
+DEFAULT_ROUNDS = 3  # timed rounds per scenario; each percentile is the best round's
+GATED_PERCENTILES = ('p50_ms', 'p95_ms')
+SELL_SHARE = 0.3
+PASSWORD = 'benchmark'
+
+
+def symbol_universe():
+    with open(BUNDLED_CSV, newline='') as f:
+        return [symbol for symbol, _, _ in read_ticker_csv(f)]
+
+
+def skewed_weights(count, skew, rng):
+    """
+    Zipf weights over count symbols in a shuffled order, so popularity does
+    not follow the alphabet.
+    """
+    weights = [1 / (rank + 1) ** skew for rank in range(count)]
+    rng.shuffle(weights)
+    return weights
+
+
+def generate_dataset(users, transactions, favorites, seed=1, skew=DEFAULT_SKEW, prefix='synth', years=1):
+    """
+    Create users with a portfolio each, `transactions` trades per portfolio
+    spread over the last `years` years at FakeProvider's prices (sells only
+    of shares held), and `favorites` watched symbols per user. Symbols come
+    from the bundled ticker directory, which is loaded if the table is
+    empty. The same seed always gives the same trades.
+    Returns Dataset
+    """
+    if not Ticker.objects.exists():
+        with open(BUNDLED_CSV, newline='') as f:
+            load_tickers(f)
+    rng = random.Random(seed)
+    symbols = symbol_universe()
+    weights = skewed_weights(len(symbols), skew, rng)
+    password = make_password(PASSWORD)
+    now = timezone.now()
+    span = timedelta(days=365 * years)
+
+    with db_transaction.atomic():
+        accounts = MainUser.objects.bulk_create([
+            MainUser(username=f"{prefix}{n}", email=f"{prefix}{n}@example.com", name=f"Synthetic {n}",
+                     password=password)
+            for n in range(users)
+        ])
+        portfolios = Portfolio.objects.bulk_create([
+            Portfolio(user=user, cashBalance=Decimal('1000000.00')) for user in accounts
+        ])
+        created = 0
+        for portfolio in portfolios:
+            rows = []
+            owned = {}
+            for offset in sorted(rng.random() for _ in range(transactions)):
+                when = now - span * (1 - offset)
+                symbol = rng.choices(symbols, weights)[0]
+                if owned.get(symbol) and rng.random() < SELL_SHARE:
+                    kind, quantity = "Sell", rng.randint(1, owned[symbol])
+                    owned[symbol] -= quantity
+                else:
+                    kind, quantity = "Buy", rng.randint(1, 50)
+                    owned[symbol] = owned.get(symbol, 0) + quantity
+                price = Decimal(str(FakeProvider.close_on(symbol, when.date())))
+                rows.append(Transaction(portfolio=portfolio, stockSymbol=symbol, stockName=symbol,
+                                        transactionType=kind, quantity=quantity, pricePerShare=price,
+                                        totalPrice=quantity * price, note="", date=when))
+            dates = [row.date for row in rows]
+            # bulk_create stamps `date` (auto_now_add) and skips the signals, so
+            # put the dates back and build holdings and lots in one pass.
+            Transaction.objects.bulk_create(rows, batch_size=500)
+            for row, when in zip(rows, dates):
+                row.date = when
+            Transaction.objects.bulk_update(rows, ['date'], batch_size=500)
+            Holding.rebuild(portfolio)
+            created += len(rows)
+
+        FavoriteStock.objects.bulk_create([
+            FavoriteStock(user=user, symbol=symbol)
+            for user in accounts
+            for symbol in sorted(_sample(symbols, weights, favorites, rng))
+        ])
+    return Dataset(accounts, symbols, created)
+
+
+def _sample(symbols, weights, count, rng):
+    chosen = set()
+    while len(chosen) < min(count, len(symbols)):
+        chosen.add(rng.choices(symbols, weights)[0])
+    return chosen
+
+
+def _get(path):
+    def run(session, i):
+        response = session.client.get(path)
+        assert response.status_code == 200, (path, response.status_code)
+        if response.streaming:
+            b"".join(response.streaming_content)
+    return run
+
+
+def _add_transaction(session, i):
+    response = session.client.post(reverse('addTransaction'), {
+        'stockSymbol': session.symbols[i % len(session.symbols)],
+        'stockName': '', 'transactionType': 'Buy', 'quantity': 1, 'note': '',
+    })
+    assert response.status_code == 302 and response.url == reverse('viewTransactions'), response
+
+
+def _update_diversification(session, i):
+    session.portfolio.update_diversification()
+
+
+def scenarios():
+    return {
+        'viewPortfolio': _get(reverse('viewPortfolio')),
+        'viewTransactions': _get(reverse('viewTransactions')),
+        'favoriteStocksPage': _get(reverse('favoriteStocksPage')),
+        'downloadTransactionsCSV': _get(reverse('downloadTransactionsCSV')),
+        'update_diversification': _update_diversification,
+        'addTransaction': _add_transaction,
+    }
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def run_scenarios(users, iterations, names=None, rounds=DEFAULT_ROUNDS):
+    """
+    Time each scenario `iterations` times, rotating over users, after one
+    untimed warm-up request per user so quote and dashboard caches are in
+    their steady state, and repeat that `rounds` times. Each latency figure
+    is the lowest of the rounds: a pause from the scheduler or the GC rarely
+    hits every round, a regression does, so the tail is stable enough to
+    gate on. Needs a deterministic provider (FAKE_PROVIDERS).
+    Returns dict: scenario -> {p50_ms, p95_ms, p99_ms, mean_ms, queries, max_queries}
+    """
+    sessions = []
+    for user in users:
+        client = Client()
+        client.force_login(user)
+        portfolio = Portfolio.objects.get(user=user)
+        symbols = sorted(Holding.objects.filter(portfolio=portfolio).values_list('stockSymbol', flat=True))
+        sessions.append(Session(client, portfolio, symbols or ['AAPL']))
+
+    results = {}
+    for name, run in scenarios().items():
+        if names and name not in names:
+            continue
+        for i, session in enumerate(sessions):
+            run(session, i)
+        stats, queries = [], []
+        for _ in range(rounds):
+            timings = []
+            for i in range(iterations):
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    run(sessions[i % len(sessions)], i)
+                    timings.append((time.perf_counter() - started) * 1000)
+                queries.append(len(captured))
+            timings.sort()
+            stats.append({
+                'p50_ms': percentile(timings, 0.5),
+                'p95_ms': percentile(timings, 0.95),
+                'p99_ms': percentile(timings, 0.99),
+                'mean_ms': sum(timings) / len(timings),
+            })
+        queries.sort()
+        results[name] = {key: round(min(s[key] for s in stats), 3) for key in stats[0]}
+        results[name].update(queries=percentile(queries, 0.5), max_queries=queries[-1])
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta_ms=DEFAULT_MIN_DELTA_MS):
+    """
+    Query counts may not grow at all; p50 and p95 may grow by `threshold`
+    (a fraction) or by less than min_delta_ms. p99 is reported but not
+    gated: at a hundred samples per round it is a single request.
+    Scenarios missing from the baseline are not compared.
+    Returns list of str, one per regression
+    """
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for key in GATED_PERCENTILES:
+            now, previous = current[key], before[key]
+            if now > previous * (1 + threshold) and now - previous > min_delta_ms:
+                regressions.append(f"{name}: {key} {previous:.2f} -> {now:.2f} (+{(now / previous - 1) * 100:.0f}%)")
+        if current['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {current['queries']}")
+    return regressions
@@ -0,0 +1,234 @@
+import asyncio
+import threading
+from collections import Counter
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .db import dashboard_reads
+from .metrics import record_cache
+from .models import FavoriteStock
+from .stock_api import aget_stock_prices, cache_to_async, get_stock_prices
+
+DEFAULT_CACHE_ALIAS = 'default'
+DEFAULT_CACHE_TIMEOUT = 600
+
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+
+
+def portfolio_summary(portfolio, prices=None):
+    """
+    Priced holdings and totals for the portfolio dashboard and the JSON API.
+    Per-symbol pnl is unrealized, against the open lots' average cost.
+    `prices` are looked up unless the caller already has them.
+    Returns dict: stock_data, top5, top_gainer, top_loser, totals,
+    last_cache_time, stale_symbols and price_version
+    """
+    diversification = portfolio.diversification or {}
+    # All holdings, including closed ones, so realized P&L from full sells counts.
+    with dashboard_reads():
+        if prices is None:
+            prices = get_stock_prices(diversification.keys())
+        return _summarize_portfolio(diversification, portfolio.positions(), prices)
+
+
+async def aportfolio_summary(portfolio):
+    """
+    portfolio_summary() for async views: holdings and prices are loaded concurrently.
+    """
+    diversification = portfolio.diversification or {}
+    with dashboard_reads():
+        positions, prices = await asyncio.gather(portfolio.apositions(), aget_stock_prices(diversification.keys()))
+    return _summarize_portfolio(diversification, positions, prices)
+
+
+def _summarize_portfolio(diversification, positions, prices):
+    stock_data = []
+    total_portfolio_value = Decimal(0)
+    total_unrealized_pnl = Decimal(0)
+    last_cache_time = None
+    total_realized_pnl = sum((p.realized_pnl for p in positions.values()), Decimal(0))
+
+    for symbol, percent in diversification.items():
+        position = positions.get(symbol)
+        owned_qty = position.owned_qty if position else 0
+        avg_buy_price = position.avg_cost if position else Decimal(0)
+        current_price, updated_at = prices[symbol]
+        if updated_at and (not last_cache_time or updated_at > last_cache_time):
+            last_cache_time = updated_at
+        holding_value = owned_qty * current_price
+        pnl = owned_qty * (current_price - avg_buy_price)
+
+        total_portfolio_value += holding_value
+        total_unrealized_pnl += pnl
+
+        stock_data.append({
+            'symbol': symbol,
+            'owned_qty': owned_qty,
+            'current_price': round(current_price, 2),
+            'avg_buy_price': round(avg_buy_price, 2),
+            'holding_value': round(holding_value, 2),
+            'pnl': round(pnl, 2),
+            'percent': percent,
+            'stale': symbol in prices.stale,
+        })
+
+    # Determine top gainer and top loser
+    top_gainer = top_loser = None
+    if stock_data:
+        top_gainer = max(stock_data, key=lambda x: x['pnl'])
+        top_loser = min(stock_data, key=lambda x: x['pnl'])
+
+    # Compute top 5 holdings by value
+    top5 = []
+    for item in sorted(stock_data, key=lambda x: x['holding_value'], reverse=True)[:5]:
+        pct_by_value = (Decimal(item['holding_value']) / total_portfolio_value * 100) if total_portfolio_value > 0 else Decimal(0)
+        top5.append({
+            'symbol': item['symbol'],
+            'qty': item['owned_qty'],
+            'price': item['current_price'],
+            'value': item['holding_value'],
+            'pnl': item['pnl'],
+            'avg_buy_price': item['avg_buy_price'],
+            'percent_by_diversification': item['percent'],
+            'percent_by_value': round(pct_by_value, 2)
+        })
+
+    return {
+        'diversification': diversification,
+        'stock_data': stock_data,
+        'total_portfolio_value': round(total_portfolio_value, 2),
+        'total_portfolio_pnl': round(total_unrealized_pnl + total_realized_pnl, 2),
+        'total_unrealized_pnl': round(total_unrealized_pnl, 2),
+        'total_realized_pnl': round(total_realized_pnl, 2),
+        'last_cache_time': last_cache_time,
+        'top5': top5,
+        'top_gainer': top_gainer,
+        'top_loser': top_loser,
+        'stale_symbols': prices.stale,
+        'price_version': prices.version(),
+    }
+
+
+def favorites_summary(user, portfolio=None):
+    """
+    The user's favorite stocks with prices and owned quantities.
+    Returns dict: favorites, stock_data, last_cache_time, total_value,
+    stale_symbols and price_version
+    """
+    with dashboard_reads():
+        favorites = FavoriteStock.objects.filter(user=user).order_by('-added_at')
+        # Owned quantities for all favorites in one query; empty if the user has no portfolio
+        symbols = [fav.symbol for fav in favorites]
+        positions = portfolio.positions(symbols) if portfolio else {}
+        return _summarize_favorites(favorites, positions, get_stock_prices(symbols))
+
+
+async def afavorites_summary(user, portfolio=None):
+    """
+    favorites_summary() for async views: holdings and prices are loaded concurrently.
+    """
+    with dashboard_reads():
+        favorites = [fav async for fav in FavoriteStock.objects.filter(user=user).order_by('-added_at')]
+        symbols = [fav.symbol for fav in favorites]
+        if portfolio:
+            positions, prices = await asyncio.gather(portfolio.apositions(symbols), aget_stock_prices(symbols))
+        else:
+            positions, prices = {}, await aget_stock_prices(symbols)
+    return _summarize_favorites(favorites, positions, prices)
+
+
+def _summarize_favorites(favorites, positions, prices):
+    stock_data = []
+    last_cache_time = None
+    total_value = Decimal(0)
+
+    for fav in favorites:
+        symbol = fav.symbol
+        current_price, updated_at = prices[symbol]
+        if updated_at and (not last_cache_time or updated_at > last_cache_time):
+            last_cache_time = updated_at
+
+        owned_qty = positions[symbol].owned_qty if symbol in positions else 0
+        value = owned_qty * current_price
+        total_value += Decimal(value)
+
+        stock_data.append({
+            'symbol': symbol,
+            'name': fav.name or "",
+            'current_price': round(current_price, 2),
+            'owned_qty': owned_qty,
+            'value': round(value, 2),
+            'stale': symbol in prices.stale,
+        })
+
+    return {
+        'favorites': favorites,
+        'stock_data': stock_data,
+        'last_cache_time': last_cache_time,
+        'total_value': round(total_value, 2),
+        'stale_symbols': prices.stale,
+        'price_version': prices.version(),
+    }
+
+
+def dashboard_cache_metrics():
+    """
+    Hits and misses of the dashboard summary cache in this process.
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def summary_cache_key(portfolio, prices):
+    # Transaction signals and Portfolio.save() bump portfolio.version; the
+    # prices are those of the portfolio's own symbols, looked up first, so
+    # quotes of other symbols changing (or this lookup fetching them) does
+    # not make the entry unreachable.
+    return f"dashboard_summary_{portfolio.pk}_{portfolio.version}_{prices.version()}"
+
+
+def _count(summary):
+    with _metrics_lock:
+        _metrics['hit' if summary is not None else 'miss'] += 1
+    record_cache('dashboard', summary is not None, summary is None)
+
+
+def cached_portfolio_summary(portfolio):
+    """
+    portfolio_summary(), reused until the portfolio or the price of one of
+    its symbols changes. Prices are always looked up (from the quote cache,
+    revalidating soft-expired ones); the hit saves the positions query and
+    the summary work.
+    """
+    cache = caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+    with dashboard_reads():
+        prices = get_stock_prices((portfolio.diversification or {}).keys())
+    key = summary_cache_key(portfolio, prices)
+    summary = cache.get(key)
+    _count(summary)
+    if summary is None:
+        summary = portfolio_summary(portfolio, prices)
+        cache.set(key, summary, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return summary
+
+
+async def acached_portfolio_summary(portfolio):
+    """
+    cached_portfolio_summary() for async views.
+    """
+    cache = caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+    diversification = portfolio.diversification or {}
+    with dashboard_reads():
+        prices = await aget_stock_prices(diversification.keys())
+    key = summary_cache_key(portfolio, prices)
+    summary = await cache_to_async(cache.get)(key)
+    _count(summary)
+    if summary is None:
+        with dashboard_reads():
+            positions = await portfolio.apositions()
+        summary = _summarize_portfolio(diversification, positions, prices)
+        await cache_to_async(cache.set)(key, summary, getattr(settings, 'DASHBOARD_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return summary
@@ -0,0 +1,74 @@
+import contextvars
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DEFAULT_SQLITE_PRAGMAS = {
+    # ms a writer waits for the lock; SQLite's sleep-and-retry wait is
+    # unfair, so write bursts need the headroom.
+    'busy_timeout': 20000,
+}
+DEFAULT_READ_ALIAS = 'dashboard'
+
+_dashboard_reads = contextvars.ContextVar('finsight_dashboard_reads', default=False)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    # journal_mode is stored in the database file, the rest is per connection.
+    # Run on the raw connection so they are not logged or timed as queries.
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_SQLITE_PRAGMAS).items():
+        connection.connection.execute(f"PRAGMA {name} = {value}")
+
+
+@contextmanager
+def dashboard_reads():
+    """
+    Mark the queries made inside as read-only dashboard reads, which
+    DashboardRouter may send to the read alias. Carried through
+    sync_to_async and the quote fetch pool via the context.
+    """
+    token = _dashboard_reads.set(True)
+    try:
+        yield
+    finally:
+        _dashboard_reads.reset(token)
+
+
+class DashboardRouter:
+    """
+    Sends reads made inside dashboard_reads() to the DASHBOARD_READ_DATABASE
+    alias when DATABASES has one: a query-only second connection to the
+    SQLite file, or a replica. Everything else, and every write, uses the
+    default database. A replica may lag: only pages that tolerate it read
+    from it, and their cache keys come from the default database.
+    """
+
+    @staticmethod
+    def read_alias():
+        alias = getattr(settings, 'DASHBOARD_READ_DATABASE', DEFAULT_READ_ALIAS)
+        return alias if alias in connections.settings else None
+
+    def db_for_read(self, model, **hints):
+        if _dashboard_reads.get():
+            return self.read_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Also for instances loaded from the read alias.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {DEFAULT_DB_ALIAS, self.read_alias()}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == self.read_alias():
+            return False
+        return None
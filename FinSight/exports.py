@@ -0,0 +1,140 @@
+import csv
+import io
+import zlib
+
+DEFAULT_CHUNK_SIZE = 2000
+FLUSH_BYTES = 64 * 1024
+
+HEADER = [
+    "Date", "Stock Symbol", "Stock Name", "Transaction Type",
+    "Quantity", "Price Per Share", "Total Price", "Note",
+]
+FIELDS = ('date', 'stockSymbol', 'stockName', 'transactionType', 'quantity', 'pricePerShare', 'totalPrice', 'note')
+FORMATS = {
+    'csv': ('text/csv', 'transaction_history.csv'),
+    'gzip': ('application/gzip', 'transaction_history.csv.gz'),
+    'parquet': ('application/vnd.apache.parquet', 'transaction_history.parquet'),
+}
+
+
+def export_rows(transactions, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream raw tuples in FIELDS order with a server-side cursor; no model
+    instances are built and at most chunk_size rows are held at once.
+    """
+    return transactions.values_list(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+def csv_chunks(rows):
+    """
+    Encode rows as CSV, yielding roughly FLUSH_BYTES at a time.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HEADER)
+    for when, symbol, name, transactionType, quantity, price, total, note in rows:
+        writer.writerow([when.strftime("%Y-%m-%d %H:%M"), symbol, name, transactionType,
+                         quantity, float(price), float(total), note or ""])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode()
+
+
+def gzip_chunks(chunks, level=6):
+    """
+    Gzip a stream of byte chunks incrementally.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+class _Drain(io.RawIOBase):
+    """
+    Write-only file that keeps what was written until drained, so a
+    ParquetWriter can be streamed one row group at a time.
+    """
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def parquet_chunks(rows, row_group_size=10000):
+    """
+    Encode rows as Parquet, one row group per row_group_size rows.
+    Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('date', pa.timestamp('us', tz='UTC')),
+        ('stockSymbol', pa.string()),
+        ('stockName', pa.string()),
+        ('transactionType', pa.string()),
+        ('quantity', pa.int64()),
+        ('pricePerShare', pa.decimal128(12, 2)),
+        ('totalPrice', pa.decimal128(12, 2)),
+        ('note', pa.string()),
+    ])
+    sink = _Drain()
+    writer = pq.ParquetWriter(sink, schema)
+    batch = []
+
+    def write_batch():
+        columns = list(zip(*batch))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(column, type=field.type) for column, field in zip(columns, schema)], schema=schema))
+        batch.clear()
+
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= row_group_size:
+            write_batch()
+            yield sink.drain()
+    if batch:
+        write_batch()
+    writer.close()
+    yield sink.drain()
+
+
+def export_chunks(transactions, fmt='csv', chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Byte chunks of the transactions in fmt ('csv', 'gzip' or 'parquet').
+    """
+    rows = export_rows(transactions, chunk_size)
+    if fmt == 'parquet':
+        return parquet_chunks(rows)
+    if fmt == 'gzip':
+        return gzip_chunks(csv_chunks(rows))
+    return csv_chunks(rows)
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
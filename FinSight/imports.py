@@ -0,0 +1,182 @@
+import csv
+import json
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exports import FIELDS, HEADER
+from .models import Holding, Portfolio, Transaction
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+
+# Accept both the export's column titles and the model field names.
+COLUMN_NAMES = {name.lower(): field for name, field in zip(HEADER, FIELDS)}
+COLUMN_NAMES.update({field.lower(): field for field in FIELDS})
+
+
+class RowError(ValueError):
+    pass
+
+
+class ImportResult:
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message), first MAX_REPORTED_ERRORS only
+        self.cash_delta = Decimal(0)
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+def detect_format(filename):
+    return 'jsonl' if filename.lower().endswith(('.jsonl', '.ndjson')) else 'csv'
+
+
+def read_records(lines, fmt='csv'):
+    """
+    Yield (line number, dict) from an iterable of text lines, one at a time.
+    """
+    if fmt == 'jsonl':
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield number, RowError(f"Invalid JSON: {e}")
+                continue
+            yield number, record if isinstance(record, dict) else RowError("Expected a JSON object.")
+        return
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def parse_row(record):
+    """
+    Validate one raw record and return the Transaction field values.
+    Raises RowError with a message fit for the user.
+    """
+    row = {}
+    for key, value in record.items():
+        field = COLUMN_NAMES.get(str(key).strip().lower())
+        if field:
+            row[field] = value.strip() if isinstance(value, str) else value
+
+    symbol = (row.get('stockSymbol') or '').upper()
+    if not symbol or len(symbol) > 10:
+        raise RowError("Stock symbol is missing or longer than 10 characters.")
+
+    transactionType = str(row.get('transactionType') or '').capitalize()
+    if transactionType not in ("Buy", "Sell"):
+        raise RowError(f"Transaction type must be Buy or Sell, got '{row.get('transactionType')}'.")
+
+    try:
+        quantity = int(row.get('quantity'))
+        price = Decimal(str(row.get('pricePerShare'))).quantize(Decimal('0.01'))
+    except (TypeError, ValueError, InvalidOperation):
+        raise RowError("Quantity must be a whole number and price a decimal.")
+    if quantity <= 0 or price <= 0:
+        raise RowError("Quantity and price must be positive.")
+
+    when = None
+    if row.get('date'):
+        value = str(row['date'])
+        try:
+            when = parse_datetime(value)
+            if when is None and parse_date(value):
+                when = datetime.combine(parse_date(value), time.min)
+        except ValueError:
+            when = None
+        if when is None:
+            raise RowError(f"Unrecognised date '{value}'.")
+        if timezone.is_naive(when):
+            when = timezone.make_aware(when)
+
+    return {
+        'stockSymbol': symbol,
+        'stockName': (row.get('stockName') or symbol)[:100],
+        'transactionType': transactionType,
+        'quantity': quantity,
+        'pricePerShare': price,
+        'totalPrice': quantity * price,
+        'note': row.get('note') or '',
+        'date': when,
+    }
+
+
+def _insert(portfolio, rows):
+    # bulk_create never sends post_save, so the per-row Holding and
+    # diversification work is skipped.
+    objs = Transaction.objects.bulk_create([Transaction(portfolio=portfolio, **row) for row in rows])
+    return len(objs)
+
+
+def import_transactions(portfolio, lines, fmt='csv', dry_run=False, adjust_cash=True,
+                        batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Validate and insert transactions from CSV or JSONL lines in batches of
+    batch_size, inside one DB transaction. Holdings, tax lots,
+    diversification and cash are recomputed once at the end. Rows are
+    checked and inserted in (date, file position) order, the order lots are
+    replayed in, so sells are checked against the position on their date;
+    rows without a date are stamped with the import time. Any invalid row
+    rolls the whole import back; dry_run validates without writing.
+    Returns ImportResult
+    """
+    result = ImportResult(dry_run)
+    owned = dict(Holding.objects.filter(portfolio=portfolio).values_list('stockSymbol', 'quantity'))
+    now = timezone.now()
+
+    parsed = []
+    for line, record in read_records(lines, fmt):
+        result.rows += 1
+        try:
+            if isinstance(record, RowError):
+                raise record
+            row = parse_row(record)
+        except RowError as e:
+            result.add_error(line, str(e))
+            continue
+        row['date'] = row['date'] or now
+        parsed.append((line, row))
+    # sort() is stable, so trades on the same date keep their file order.
+    parsed.sort(key=lambda item: item[1]['date'])
+
+    rows = []
+    for line, row in parsed:
+        held = owned.get(row['stockSymbol'], 0)
+        if row['transactionType'] == "Sell" and row['quantity'] > held:
+            result.add_error(line, f"Cannot sell {row['quantity']} shares of {row['stockSymbol']}; "
+                                   f"only {held} held at this point.")
+            continue
+        sign = 1 if row['transactionType'] == "Buy" else -1
+        owned[row['stockSymbol']] = held + sign * row['quantity']
+        result.cash_delta -= sign * row['totalPrice']
+        rows.append(row)
+    result.errors.sort()
+    if dry_run or not result.ok:
+        return result
+
+    with db_transaction.atomic():
+        for i in range(0, len(rows), batch_size):
+            result.created += _insert(portfolio, rows[i:i + batch_size])
+        if adjust_cash:
+            Portfolio.objects.filter(pk=portfolio.pk).update(cashBalance=F('cashBalance') + result.cash_delta)
+            portfolio.refresh_from_db(fields=['cashBalance'])
+        Holding.rebuild(portfolio)
+    return result
@@ -0,0 +1,146 @@
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from types import ModuleType
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import include, path
+
+from FinSight import views
+from FinSight.models import FavoriteStock, MainUser, Portfolio, Transaction
+from FinSight.stock_api import quote_cache, quote_metrics
+
+PAGES = ['/view/', '/favorite-stocks/']
+
+
+def urlconf(portfolio_view, favorites_view):
+    # The two price pages bound to one implementation, everything else as deployed.
+    module = ModuleType('bench_urls')
+    module.urlpatterns = [
+        path('view/', portfolio_view, name='viewPortfolio'),
+        path('favorite-stocks/', favorites_view, name='favoriteStocksPage'),
+        path('', include('FinSight.urls')),
+    ]
+    return module
+
+
+class Command(BaseCommand):
+    help = ("Compare the sync price views under a WSGI-style thread pool with the async views on one "
+            "ASGI event loop, with every user loading the portfolio and favorites pages at once "
+            "against a simulated slow quote provider. Runs on a temporary database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help="Concurrent users.")
+        parser.add_argument('--latency', type=float, default=0.3, help="Simulated upstream latency in seconds.")
+        parser.add_argument('--rounds', type=int, default=3, help="Cold-cache rounds per mode.")
+        parser.add_argument('--wsgi-threads', type=int, default=32,
+                            help="Request threads of the WSGI server (e.g. 4 workers x 8 threads).")
+        parser.add_argument('--upstream-concurrency', type=int, default=32,
+                            help="Provider requests in flight at once, for both modes.")
+        parser.add_argument('--symbols', type=int, default=5, help="Holdings (and favorites) per user.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        workdir = tempfile.mkdtemp(prefix='bench-async-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                STOCK_PRICE_PROVIDERS=[{'BACKEND': 'FinSight.providers.FakeProvider',
+                                        'OPTIONS': {'latency': options['latency']}}],
+                STOCK_PRICE_FETCH_ON_REQUEST=True,  # the point is to wait on upstream
+                STOCK_PRICE_FETCH_WORKERS=options['upstream_concurrency'],
+                STOCK_PRICE_ASYNC_CONCURRENCY=options['upstream_concurrency'],
+                CACHES={alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+                        for alias in ('default', 'quotes')},
+            ):
+                cookies = self.populate(options['users'], options['symbols'])
+                with override_settings(ROOT_URLCONF=urlconf(views.viewPortfolio, views.favoriteStocksPage)):
+                    self.measure("sync views, WSGI threads", options, lambda: self.run_wsgi(cookies, options))
+                with override_settings(ROOT_URLCONF=urlconf(views.viewPortfolioAsync, views.favoriteStocksPageAsync)):
+                    self.measure("async views, ASGI loop", options, lambda: asyncio.run(self.run_asgi(cookies)))
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    def populate(self, count, per_user):
+        """
+        Users holding and watching symbols of their own, so no two requests
+        share a quote fetch. Returns list of session cookies
+        """
+        started = time.perf_counter()
+        cookies = []
+        client = Client()
+        for n in range(count):
+            user = MainUser.objects.create(email=f"bench{n}@example.com", username=f"bench{n}", name=f"Bench {n}")
+            portfolio = Portfolio.objects.create(user=user, cashBalance=Decimal('100000.00'))
+            for k in range(per_user):
+                Transaction.objects.create(
+                    portfolio=portfolio, stockSymbol=f"U{n}H{k}", stockName=f"Holding {k}", transactionType="Buy",
+                    quantity=10, pricePerShare=Decimal('50.00'), totalPrice=Decimal('500.00'),
+                )
+                FavoriteStock.objects.create(user=user, symbol=f"U{n}F{k}")
+            client.force_login(user)
+            cookies.append(client.cookies)
+            client = Client()
+        self.stdout.write(f"Created {count} users with {per_user} holdings and favorites each "
+                          f"in {time.perf_counter() - started:.1f}s")
+        return cookies
+
+    @staticmethod
+    def cold_caches():
+        quote_cache.clear()
+        caches['default'].clear()
+
+    # Every user arrives when the round starts, so the time until their last
+    # page is done includes any wait for a free request thread.
+
+    def run_wsgi(self, cookies, options):
+        started = time.perf_counter()
+
+        def visit(cookie):
+            client = Client()
+            client.cookies = cookie
+            for page in PAGES:
+                assert client.get(page).status_code == 200
+            return time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=options['wsgi_threads']) as pool:
+            return list(pool.map(visit, cookies))
+
+    async def run_asgi(self, cookies):
+        started = time.perf_counter()
+
+        async def visit(cookie):
+            client = AsyncClient()
+            client.cookies = cookie
+            for page in PAGES:
+                assert (await client.get(page)).status_code == 200
+            return time.perf_counter() - started
+
+        return await asyncio.gather(*map(visit, cookies))
+
+    def measure(self, label, options, run):
+        for round_number in range(1, options['rounds'] + 1):
+            self.cold_caches()
+            before = quote_metrics()
+            started = time.perf_counter()
+            done = sorted(run())
+            elapsed = time.perf_counter() - started
+            after = quote_metrics()
+            stale = sum(after.get(k, 0) - before.get(k, 0) for k in ('stale', 'missing'))
+            live = after.get('live', 0) - before.get('live', 0)
+            pages = len(done) * len(PAGES)
+            self.stdout.write(
+                f"{label}, round {round_number}: {pages} pages in {elapsed:.2f}s = {pages / elapsed:.0f} pages/s, "
+                f"users done after p50 {done[len(done) // 2]:.2f}s, p95 {done[int(len(done) * 0.95)]:.2f}s; "
+                f"{live} quotes fetched live, {stale} served stale past the deadline"
+            )
@@ -0,0 +1,124 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, connections
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from FinSight.benchmarks import FAKE_PROVIDERS, generate_dataset, percentile
+from FinSight.dashboard import favorites_summary, portfolio_summary
+from FinSight.db import DEFAULT_READ_ALIAS, DEFAULT_SQLITE_PRAGMAS
+from FinSight.models import Portfolio, Transaction
+from FinSight.providers import FakeProvider
+from FinSight.stock_api import quote_cache, store_prices
+
+def profiles():
+    return [
+        # The default profile: rollback journal, a connection per request.
+        ("per-request connections, rollback journal",
+         {**DEFAULT_SQLITE_PRAGMAS, 'journal_mode': 'DELETE', 'synchronous': 'FULL'}, 0, False),
+        ("production profile (WAL, pragmas, persistent, read alias)", settings.SQLITE_PRODUCTION_PRAGMAS, 600, True),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Compare the default SQLite settings with the production profile: reader threads load "
+            "dashboards while writer threads store prices and update diversification, as the dashboard "
+            "and the price refresher do. Runs on a temporary SQLite file database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=10, help="Duration per profile.")
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--transactions', type=int, default=200)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        workdir = tempfile.mkdtemp(prefix='bench-db-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        default = connections.settings['default']
+        try:
+            with override_settings(
+                STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS,
+                STOCK_PRICE_FETCH_ON_REQUEST=False,
+                CACHES={alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+                        for alias in ('default', 'quotes')},
+            ):
+                dataset = generate_dataset(options['users'], options['transactions'], favorites=10)
+                portfolios = list(Portfolio.objects.select_related('user'))
+                for label, pragmas, max_age, read_alias in profiles():
+                    connections.close_all()
+                    default['CONN_MAX_AGE'] = max_age
+                    if read_alias:
+                        connections.settings[DEFAULT_READ_ALIAS] = {
+                            **default, 'OPTIONS': {'init_command': 'PRAGMA query_only = 1'},
+                        }
+                    with override_settings(SQLITE_PRAGMAS=pragmas):
+                        self.run(label, portfolios, dataset.symbols, options)
+                    connections.close_all()
+                    connections.settings.pop(DEFAULT_READ_ALIAS, None)
+        finally:
+            default['CONN_MAX_AGE'] = 0
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, label, portfolios, symbols, options):
+        quote_cache.clear()
+        prices = {s: FakeProvider.close_on(s, date.today()) for s in symbols}
+        store_prices({s: str(p) for s, p in prices.items()})
+        stop = time.perf_counter() + options['seconds']
+        reads, writes = [], []
+        lock = threading.Lock()
+
+        def reader(seed):
+            rng = random.Random(seed)
+            latencies = []
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                portfolio = Portfolio.objects.select_related('user').get(pk=rng.choice(portfolios).pk)
+                portfolio_summary(portfolio)
+                favorites_summary(portfolio.user, portfolio)
+                list(Transaction.objects.filter(portfolio=portfolio).order_by('-date', '-id')[:50])
+                latencies.append(time.perf_counter() - started)
+                close_old_connections()  # end of request
+            with lock:
+                reads.extend(latencies)
+            connections.close_all()
+
+        def writer(seed):
+            rng = random.Random(seed)
+            done = 0
+            while time.perf_counter() < stop:
+                batch = rng.sample(symbols, 20)
+                store_prices({s: str(round(prices[s] * rng.uniform(0.99, 1.01), 2)) for s in batch})
+                rng.choice(portfolios).update_diversification()
+                done += 1
+                close_old_connections()
+            with lock:
+                writes.append(done)
+            connections.close_all()
+
+        threads = [threading.Thread(target=reader, args=(n,)) for n in range(options['readers'])]
+        threads += [threading.Thread(target=writer, args=(1000 + n,)) for n in range(options['writers'])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        reads.sort()
+        seconds = options['seconds']
+        self.stdout.write(
+            f"{label}: {len(reads) / seconds:.0f} dashboard loads/s (p50 {percentile(reads, 0.5) * 1000:.1f} ms, "
+            f"p95 {percentile(reads, 0.95) * 1000:.1f} ms), {sum(writes) / seconds:.0f} price+diversification "
+            f"writes/s"
+        )
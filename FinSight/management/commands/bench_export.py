@@ -0,0 +1,80 @@
+import time
+import tracemalloc
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from FinSight.exports import export_chunks, parquet_available
+from FinSight.models import MainUser, Portfolio, Transaction
+
+
+class Command(BaseCommand):
+    help = ("Benchmark streaming transaction exports on synthetic rows (default 1M). "
+            "Rows are inserted in a transaction that is rolled back afterwards.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000)
+        parser.add_argument('--formats', default='csv,gzip,parquet')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--compare', action='store_true',
+                            help="Also measure the old approach of materialising the queryset.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            portfolio = self.populate(options['rows'])
+            transactions = Transaction.objects.filter(portfolio=portfolio).order_by('-date')
+            for fmt in options['formats'].split(','):
+                if fmt == 'parquet' and not parquet_available():
+                    self.stdout.write("parquet: skipped (pyarrow not installed)")
+                    continue
+                self.measure(fmt, lambda: export_chunks(transactions, fmt, options['chunk_size']))
+            if options['compare']:
+                self.measure('materialised list', lambda: [list(transactions)])
+            transaction.set_rollback(True)
+
+    def populate(self, count):
+        user = MainUser.objects.create(email="bench-export@example.com", username="bench-export", name="Bench")
+        portfolio = Portfolio.objects.create(user=user)
+        start = timezone.now() - timedelta(days=3650)
+        step = timedelta(days=3650) / max(count, 1)
+        started = time.perf_counter()
+        batch = []
+        for i in range(count):
+            price = Decimal(10 + i % 490) + Decimal('0.25')
+            quantity = 1 + i % 50
+            batch.append(Transaction(
+                portfolio=portfolio, stockSymbol=f"SYM{i % 200:03d}", stockName=f"Company {i % 200}",
+                transactionType="Buy" if i % 3 else "Sell", quantity=quantity, pricePerShare=price,
+                totalPrice=quantity * price, note="" if i % 10 else "rebalance",
+            ))
+            if len(batch) == 10000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        # `date` is auto_now_add, so spread the rows over ten years afterwards.
+        for i, pk in enumerate(Transaction.objects.filter(portfolio=portfolio).values_list('pk', flat=True)
+                               .iterator(chunk_size=10000)):
+            if i % 10000 == 0:
+                Transaction.objects.filter(pk__gte=pk, pk__lt=pk + 10000).update(date=start + step * i)
+        self.stdout.write(f"Inserted {count} rows in {time.perf_counter() - started:.1f}s")
+        return portfolio
+
+    def measure(self, label, make_stream):
+        tracemalloc.start()
+        started = time.perf_counter()
+        first_byte = None
+        size = 0
+        for chunk in make_stream():
+            if first_byte is None:
+                first_byte = time.perf_counter() - started
+            size += len(chunk) if isinstance(chunk, bytes) else 0
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{label}: {size / 2**20:.1f} MiB in {elapsed:.1f}s, first byte after {first_byte * 1000:.0f} ms, "
+            f"peak Python memory {peak / 2**20:.1f} MiB"
+        )
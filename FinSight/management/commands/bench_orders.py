@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, connections
+from django.db.models import Q, Sum
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from FinSight.models import Holding, MainUser, Portfolio, Transaction
+from FinSight.orders import OrderRejected, book_order
+
+SYMBOLS = ["AAPL", "MSFT", "NVDA", "AMZN", "GOOG"]
+PRICE = Decimal('10.00')
+
+
+def legacy_book(portfolio_id, symbol, transactionType, quantity, price):
+    """
+    addTransaction's booking before book_order(): check against a fresh
+    read, create the transaction (post_save rescans and bumps the version),
+    then save the whole portfolio row with the cash computed in Python.
+    """
+    portfolio = Portfolio.objects.get(pk=portfolio_id)
+    totalPrice = quantity * price
+    if transactionType == "Sell":
+        ownedShares = Transaction.getOwnedShares(portfolio, symbol)
+        if ownedShares <= 0 or quantity > ownedShares:
+            raise OrderRejected(symbol)
+    elif totalPrice > portfolio.cashBalance:
+        raise OrderRejected(symbol)
+    Transaction.objects.create(portfolio=portfolio, stockSymbol=symbol, stockName=symbol,
+                               transactionType=transactionType, quantity=quantity, pricePerShare=price,
+                               totalPrice=totalPrice)
+    portfolio.cashBalance += -totalPrice if transactionType == "Buy" else totalPrice
+    portfolio.save()
+
+
+def atomic_book(portfolio_id, symbol, transactionType, quantity, price):
+    book_order(Portfolio.objects.get(pk=portfolio_id), symbol, symbol, transactionType, quantity, price)
+
+
+class Command(BaseCommand):
+    help = ("Stress order booking with parallel submitters on one portfolio, comparing the previous "
+            "read-check-save sequence with book_order(). Checks the final cash balance and holdings "
+            "against the booked transactions. Runs on a temporary SQLite file database.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50)
+        parser.add_argument('--orders', type=int, default=20, help="Orders per thread (alternating buy/sell).")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        workdir = tempfile.mkdtemp(prefix='bench-orders-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            for label, book in (("read-check-save", legacy_book), ("book_order", atomic_book)):
+                self.run(label, book, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    def run(self, label, book, options):
+        user = MainUser.objects.create(email=f"{label}@example.com", username=label, name=label)
+        initial = Decimal('1000000.00')
+        portfolio = Portfolio.objects.create(user=user, cashBalance=initial)
+        outcomes = {'booked': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(options['threads'])
+
+        def submitter(n):
+            start.wait()
+            for i in range(options['orders']):
+                symbol = SYMBOLS[(n + i // 2) % len(SYMBOLS)]
+                transactionType, quantity = ("Buy", 2) if i % 2 == 0 else ("Sell", 1)
+                try:
+                    book(portfolio.pk, symbol, transactionType, quantity, PRICE)
+                    outcome = 'booked'
+                except OrderRejected:
+                    outcome = 'rejected'
+                except DatabaseError:
+                    outcome = 'errors'
+                with lock:
+                    outcomes[outcome] += 1
+            connections.close_all()
+
+        threads = [threading.Thread(target=submitter, args=(n,)) for n in range(options['threads'])]
+        started = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+
+        portfolio.refresh_from_db()
+        ledger = Transaction.objects.filter(portfolio=portfolio)
+        bought = ledger.filter(transactionType="Buy").aggregate(total=Sum('totalPrice', default=0))['total']
+        sold = ledger.filter(transactionType="Sell").aggregate(total=Sum('totalPrice', default=0))['total']
+        expected = initial - bought + sold
+        net = dict(ledger.values('stockSymbol').annotate(
+            net=Sum('quantity', filter=Q(transactionType="Buy"), default=0)
+            - Sum('quantity', filter=Q(transactionType="Sell"), default=0),
+        ).values_list('stockSymbol', 'net'))
+        held = dict(Holding.objects.filter(portfolio=portfolio).values_list('stockSymbol', 'quantity'))
+        holdings_ok = {s: q for s, q in held.items() if q} == {s: q for s, q in net.items() if q}
+        self.stdout.write(
+            f"{label}: {outcomes['booked']} booked, {outcomes['rejected']} rejected, {outcomes['errors']} failed "
+            f"in {elapsed:.2f}s = {outcomes['booked'] / elapsed:.0f} orders/s; cash {portfolio.cashBalance} vs "
+            f"{expected} from the ledger ({'correct' if portfolio.cashBalance == expected else 'LOST UPDATES'}), "
+            f"holdings {'match' if holdings_ok else 'DO NOT match'} the ledger"
+        )
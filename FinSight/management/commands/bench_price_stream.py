@@ -0,0 +1,91 @@
+import asyncio
+import random
+import time
+import tracemalloc
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from FinSight.price_stream import PriceBroker, event_stream
+
+
+class Command(BaseCommand):
+    help = ("Load-test the price stream broker in-process with thousands of idle SSE connections, "
+            "a simulated quote provider and a share of clients that never read.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=5000)
+        parser.add_argument('--symbols', type=int, default=200, help="Size of the symbol universe.")
+        parser.add_argument('--per-connection', type=int, default=10, help="Symbols each client follows.")
+        parser.add_argument('--ticks', type=int, default=10, help="Polls to run with changing prices.")
+        parser.add_argument('--interval', type=float, default=0.2, help="Poll interval in seconds.")
+        parser.add_argument('--latency', type=float, default=0.05, help="Simulated provider latency in seconds.")
+        parser.add_argument('--slow', type=float, default=0.1, help="Share of clients that stop reading.")
+
+    def handle(self, *args, **options):
+        asyncio.run(self.run(options))
+
+    async def run(self, options):
+        rng = random.Random(1)
+        universe = [f"SYM{i:03d}" for i in range(options['symbols'])]
+        state = {'tick': 0, 'published_at': None, 'requested': []}
+
+        async def fetch(symbols):
+            state['requested'].append(len(symbols))
+            await asyncio.sleep(options['latency'])
+            state['tick'] += 1
+            # Roughly a third of the symbols move on every poll.
+            updates = {s: {'price': str(Decimal(100 + (hash((s, state['tick'])) % 5000) / 100)), 'stale': False}
+                       for s in symbols if rng.random() < 0.33 or state['tick'] == 1}
+            state['published_at'] = time.perf_counter()
+            return updates
+
+        broker = PriceBroker(fetch=fetch, interval=options['interval'])
+        slow_count = int(options['connections'] * options['slow'])
+        latencies = []
+        received = [0]
+
+        async def reader(symbols):
+            async for chunk in event_stream(broker, symbols, heartbeat=3600):
+                if chunk.startswith('event:'):
+                    latencies.append(time.perf_counter() - state['published_at'])
+                    received[0] += 1
+
+        tracemalloc.start()
+        before, _ = tracemalloc.get_traced_memory()
+        started = time.perf_counter()
+        readers = [asyncio.create_task(reader(rng.sample(universe, options['per_connection'])))
+                   for _ in range(options['connections'] - slow_count)]
+        slow = [broker.subscribe(rng.sample(universe, options['per_connection'])) for _ in range(slow_count)]
+        await asyncio.sleep(0)  # let every reader subscribe
+        connected, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(
+            f"{options['connections']} connections ({slow_count} not reading) open in "
+            f"{(time.perf_counter() - started) * 1000:.0f} ms, "
+            f"{(connected - before) / options['connections'] / 1024:.1f} KiB each"
+        )
+
+        while state['tick'] < options['ticks']:
+            await asyncio.sleep(options['interval'] / 4)
+        await asyncio.sleep(options['interval'] / 2)  # let the last fan-out drain
+        for task in readers:
+            task.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+
+        latencies.sort()
+        if latencies:
+            p50 = latencies[len(latencies) // 2] * 1000
+            p99 = latencies[int(len(latencies) * 0.99)] * 1000
+            self.stdout.write(f"Fan-out: {received[0]} events delivered, latency p50 {p50:.1f} ms, p99 {p99:.1f} ms")
+        self.stdout.write(
+            f"Upstream: {broker.polls} polls for {options['ticks']} ticks, "
+            f"at most {max(state['requested'], default=0)} symbols per poll"
+        )
+        self.stdout.write(
+            f"Backpressure: stalled clients hold at most {max((len(s.pending) for s in slow), default=0)} "
+            f"pending updates (cap {options['per_connection']}), "
+            f"{sum(s.conflated for s in slow)} superseded updates dropped"
+        )
+        for subscription in slow:
+            broker.unsubscribe(subscription)
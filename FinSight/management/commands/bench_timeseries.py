@@ -0,0 +1,86 @@
+import statistics
+import tempfile
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from FinSight.price_history import PriceHistoryStore
+from FinSight.providers import FakeProvider
+from FinSight.timeseries import build_timeseries, business_days, close_matrix
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the vectorized portfolio time-series engine on synthetic data "
+            "(default: 10k transactions over 5 years).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=10000)
+        parser.add_argument('--years', type=int, default=5)
+        parser.add_argument('--symbols', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--compare', action='store_true',
+                            help="Also time a day-by-day Decimal replay for comparison.")
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        end = date.today()
+        start = end - timedelta(days=365 * options['years'])
+        calendar = business_days(start, end)
+        symbols = [f"SYM{i:03d}" for i in range(options['symbols'])]
+        count = options['transactions']
+
+        # Zipf-like skew: a few symbols get most of the trades.
+        weights = 1 / np.arange(1, len(symbols) + 1)
+        symbol_index = rng.choice(len(symbols), size=count, p=weights / weights.sum())
+        day_index = np.sort(rng.integers(0, len(calendar), size=count))
+        signed_qty = np.where(rng.random(count) < 0.7, 1.0, -1.0) * rng.integers(1, 50, size=count)
+        trade_prices = rng.uniform(10, 500, size=count).round(2)
+        flows = -signed_qty * trade_prices
+
+        with tempfile.TemporaryDirectory() as root:
+            store = PriceHistoryStore(root)
+            provider = FakeProvider()
+            for symbol in symbols:
+                store.append(symbol, provider.get_daily_history(symbol, start, end))
+
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                closes = close_matrix(symbols, calendar, store)
+                series = build_timeseries(calendar, symbols, day_index, symbol_index, signed_qty,
+                                          trade_prices, flows, 100000.0, closes)
+                timings.append(time.perf_counter() - started)
+
+            self.stdout.write(
+                f"{count} transactions x {len(calendar)} days x {len(symbols)} symbols: "
+                f"median {statistics.median(timings) * 1000:.1f} ms, "
+                f"min {min(timings) * 1000:.1f} ms over {options['repeat']} run(s)"
+            )
+
+            if options['compare']:
+                started = time.perf_counter()
+                replayed = self.replay(calendar, symbols, day_index, symbol_index, signed_qty, closes)
+                elapsed = time.perf_counter() - started
+                drift = np.nanmax(np.abs(np.array(replayed, dtype=float) - series['value']))
+                self.stdout.write(f"Decimal day-by-day replay: {elapsed * 1000:.1f} ms (max difference {drift:.4f})")
+
+    def replay(self, calendar, symbols, day_index, symbol_index, signed_qty, closes):
+        values = []
+        holdings = {}
+        cursor = 0
+        for day in range(len(calendar)):
+            while cursor < len(day_index) and day_index[cursor] == day:
+                symbol = symbols[symbol_index[cursor]]
+                holdings[symbol] = holdings.get(symbol, 0) + int(signed_qty[cursor])
+                cursor += 1
+            total = Decimal(0)
+            for column, symbol in enumerate(symbols):
+                price = closes[day, column]
+                if symbol in holdings and not np.isnan(price):
+                    total += holdings[symbol] * Decimal(str(price))
+            values.append(total)
+        return values
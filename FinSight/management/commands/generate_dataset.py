@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from FinSight.benchmarks import DEFAULT_SKEW, FAKE_PROVIDERS, generate_dataset
+from FinSight.models import MainUser
+from FinSight.price_history import update_history
+
+
+class Command(BaseCommand):
+    help = ("Fill the configured database with synthetic users, portfolios, transactions with a skewed "
+            "symbol mix, favorites and price history (from the offline fake provider), for development "
+            "and benchmarking. The same --seed always gives the same data.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--transactions', type=int, default=200, help="Transactions per portfolio.")
+        parser.add_argument('--favorites', type=int, default=10, help="Favorite stocks per user.")
+        parser.add_argument('--years', type=int, default=1, help="Years of trading and price history.")
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--skew', type=float, default=DEFAULT_SKEW,
+                            help="Zipf exponent of symbol popularity (0 = uniform).")
+        parser.add_argument('--prefix', default='synth', help="Username prefix of the generated users.")
+        parser.add_argument('--no-history', action='store_true', help="Skip the daily price history.")
+
+    def handle(self, *args, **options):
+        if MainUser.objects.filter(username__startswith=options['prefix']).exists():
+            raise CommandError(f"Users named {options['prefix']}* already exist; pick another --prefix.")
+        started = time.perf_counter()
+        dataset = generate_dataset(options['users'], options['transactions'], options['favorites'],
+                                   seed=options['seed'], skew=options['skew'], prefix=options['prefix'],
+                                   years=options['years'])
+        self.stdout.write(f"Created {len(dataset.users)} users with {dataset.transactions} transactions "
+                          f"in {time.perf_counter() - started:.1f}s (password 'benchmark')")
+        if not options['no_history']:
+            started = time.perf_counter()
+            with override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS):
+                rows = sum(update_history(dataset.symbols, years=options['years']).values())
+            self.stdout.write(f"Wrote {rows} daily bars for {len(dataset.symbols)} symbols "
+                              f"in {time.perf_counter() - started:.1f}s")
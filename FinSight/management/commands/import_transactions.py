@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from FinSight.imports import DEFAULT_BATCH_SIZE, detect_format, import_transactions
+from FinSight.models import Portfolio
+
+
+class Command(BaseCommand):
+    help = ("Bulk import transactions from a CSV (export format or field names) or JSONL file "
+            "into a user's portfolio. The whole file is rejected if any row is invalid.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('email', help="Owner of the portfolio to import into.")
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default=None,
+                            help="Default: from the file extension.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only, write nothing.")
+        parser.add_argument('--no-cash', action='store_true',
+                            help="Do not adjust the cash balance by the imported trades.")
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            portfolio = Portfolio.objects.get(user__email=options['email'])
+        except Portfolio.DoesNotExist:
+            raise CommandError(f"No portfolio for {options['email']}.")
+
+        fmt = options['format'] or detect_format(options['path'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as f:
+            result = import_transactions(portfolio, f, fmt=fmt, dry_run=options['dry_run'],
+                                         adjust_cash=not options['no_cash'], batch_size=options['batch_size'])
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... and {result.error_count - len(result.errors)} more errors")
+        if not result.ok:
+            raise CommandError(f"{result.error_count} of {result.rows} rows invalid; nothing imported.")
+        if result.dry_run:
+            self.stdout.write(f"Dry run: {result.rows} rows valid, cash change {result.cash_delta:+.2f}.")
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f"Imported {result.created} transactions, cash change {result.cash_delta:+.2f}."))
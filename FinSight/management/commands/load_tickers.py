@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from FinSight.tickers import BUNDLED_CSV, load_tickers
+
+
+class Command(BaseCommand):
+    help = ("Load or refresh the ticker directory from a CSV (Symbol,Name[,Exchange]) or a "
+            "pipe-delimited exchange listing. Defaults to the bundled FinSight/data/tickers.csv.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=str(BUNDLED_CSV))
+        parser.add_argument('--deactivate-missing', action='store_true',
+                            help="Mark symbols that are not in the file as inactive (delisted).")
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig', newline='') as f:
+            loaded, deactivated = load_tickers(f, deactivate_missing=options['deactivate_missing'])
+        self.stdout.write(self.style.SUCCESS(f"Loaded {loaded} tickers, deactivated {deactivated}."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from FinSight.models import Holding, Portfolio
+
+
+class Command(BaseCommand):
+    help = "Rebuild the Holding table, tax lots and diversification from the transaction ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('portfolio_ids', nargs='*', type=int,
+                            help="Only rebuild these portfolios (default: all).")
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all()
+        if options['portfolio_ids']:
+            portfolios = portfolios.filter(pk__in=options['portfolio_ids'])
+
+        count = 0
+        for portfolio in portfolios.iterator():
+            Holding.rebuild(portfolio)
+            count += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt holdings for {count} portfolio(s)."))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from FinSight.stock_api import fetch_and_cache_all_prices, tracked_symbols
+
+
+class Command(BaseCommand):
+    help = ("Refresh cached prices for every held or watched symbol, most popular first. "
+            "Run once from cron, or with --loop as a long-running worker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help="Keep refreshing every --interval seconds.")
+        parser.add_argument('--interval', type=float, default=300,
+                            help="Seconds between refresh cycles in --loop mode (default: 300).")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help="Symbols per provider request (default: STOCK_PRICE_BATCH_SIZE).")
+        parser.add_argument('--limit', type=int, default=None,
+                            help="Only refresh the N most popular symbols.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            self.refresh(options['batch_size'], options['limit'])
+            if not options['loop']:
+                break
+            close_old_connections()
+            time.sleep(max(0, options['interval'] - (time.monotonic() - started)))
+
+    def refresh(self, batch_size, limit):
+        symbols = [symbol for symbol, _ in tracked_symbols()][:limit]
+        refreshed, failed = fetch_and_cache_all_prices(symbols, batch_size=batch_size)
+        self.stdout.write(f"Refreshed {len(refreshed)} of {len(symbols)} symbol(s).")
+        if failed:
+            self.stderr.write(f"Failed to update price for: {', '.join(failed)}")
@@ -0,0 +1,104 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from FinSight.benchmarks import (
+    DEFAULT_MIN_DELTA_MS, DEFAULT_ROUNDS, DEFAULT_SKEW, DEFAULT_THRESHOLD, FAKE_PROVIDERS, compare_to_baseline,
+    generate_dataset, run_scenarios, scenarios,
+)
+from FinSight.price_history import update_history
+from FinSight.stock_api import fetch_and_cache_all_prices
+
+DATASET_OPTIONS = ('users', 'transactions', 'favorites', 'years', 'seed', 'skew', 'sample', 'iterations', 'rounds')
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the hot paths (portfolio, transactions, favorites, CSV export, diversification, "
+            "adding a transaction) on a generated dataset in a temporary database, with the offline fake "
+            "quote provider. Reports latency percentiles and query counts and fails on regressions "
+            "against the stored baseline.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--transactions', type=int, default=500, help="Transactions per portfolio.")
+        parser.add_argument('--favorites', type=int, default=10)
+        parser.add_argument('--years', type=int, default=1)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--skew', type=float, default=DEFAULT_SKEW)
+        parser.add_argument('--sample', type=int, default=10, help="Users the requests rotate over.")
+        parser.add_argument('--iterations', type=int, default=100, help="Timed runs per scenario and round.")
+        parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS,
+                            help="Rounds per scenario; the best round's percentiles are reported.")
+        parser.add_argument('--scenario', action='append', choices=sorted(scenarios()),
+                            help="Only run this scenario (repeatable).")
+        parser.add_argument('--baseline', default=str(getattr(settings, 'BENCHMARK_BASELINE', '')),
+                            help="Baseline JSON file (default settings.BENCHMARK_BASELINE).")
+        parser.add_argument('--save-baseline', action='store_true', help="Store these results as the baseline.")
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help="Allowed p50 and p95 growth over the baseline, as a fraction.")
+        parser.add_argument('--min-delta', type=float, default=DEFAULT_MIN_DELTA_MS,
+                            help="Latency growth in ms below which a change counts as noise.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        workdir = tempfile.mkdtemp(prefix='bench-')
+        connection.settings_dict['TEST']['NAME'] = os.path.join(workdir, 'bench.sqlite3')
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            with override_settings(
+                STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS,
+                PRICE_HISTORY_DIR=os.path.join(workdir, 'history'),
+                CACHES={alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{alias}'}
+                        for alias in ('default', 'quotes')},
+            ):
+                dataset = generate_dataset(options['users'], options['transactions'], options['favorites'],
+                                           seed=options['seed'], skew=options['skew'], years=options['years'])
+                update_history(dataset.symbols, years=options['years'])
+                # Requests don't fetch quotes themselves; refresh_prices keeps them warm.
+                fetch_and_cache_all_prices()
+                self.stdout.write(f"Dataset: {len(dataset.users)} users, {dataset.transactions} transactions, "
+                                  f"{len(dataset.symbols)} symbols")
+                results = run_scenarios(dataset.users[:options['sample']], options['iterations'],
+                                        options['scenario'], options['rounds'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        for name, stats in results.items():
+            self.stdout.write(f"{name:24} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms  "
+                              f"p99 {stats['p99_ms']:8.2f} ms  {stats['queries']:4} queries")
+        self.check_baseline(results, options)
+
+    def check_baseline(self, results, options):
+        path = options['baseline']
+        params = {key: options[key] for key in DATASET_OPTIONS}
+        if options['save_baseline']:
+            if not path:
+                raise CommandError("No baseline path; set BENCHMARK_BASELINE or pass --baseline.")
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'w') as f:
+                json.dump({'params': params, 'scenarios': results}, f, indent=2, sort_keys=True)
+                f.write("\n")
+            self.stdout.write(f"Baseline written to {path}")
+            return
+        if not path or not os.path.exists(path):
+            self.stdout.write("No baseline to compare with; run with --save-baseline to record one.")
+            return
+        with open(path) as f:
+            baseline = json.load(f)
+        if baseline['params'] != params:
+            raise CommandError(f"The baseline was recorded with {baseline['params']}; rerun with those options "
+                               f"or record a new one with --save-baseline.")
+        regressions = compare_to_baseline(results, baseline['scenarios'], options['threshold'], options['min_delta'])
+        if regressions:
+            raise CommandError("Regressions against the baseline:\n  " + "\n  ".join(regressions))
+        self.stdout.write(self.style.SUCCESS(f"No regressions against {path}"))
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from FinSight.price_history import DEFAULT_BACKFILL_YEARS, update_history
+from FinSight.risk import DEFAULT_BENCHMARK_SYMBOL
+from FinSight.stock_api import tracked_symbols
+
+
+class Command(BaseCommand):
+    help = ("Backfill and incrementally append daily price bars to the on-disk history store "
+            "for the given symbols, or for every held or watched symbol and the risk benchmark.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('symbols', nargs='*', help="Symbols to update (default: all tracked symbols).")
+        parser.add_argument('--years', type=int, default=DEFAULT_BACKFILL_YEARS,
+                            help=f"Years to backfill for new symbols (default: {DEFAULT_BACKFILL_YEARS}).")
+
+    def handle(self, *args, **options):
+        symbols = [s.upper() for s in options['symbols']]
+        if not symbols:
+            symbols = [symbol for symbol, _ in tracked_symbols()]
+            benchmark = getattr(settings, 'RISK_BENCHMARK_SYMBOL', DEFAULT_BENCHMARK_SYMBOL)
+            if benchmark not in symbols:
+                symbols.append(benchmark)
+        added = update_history(symbols, years=options['years'])
+        for symbol, rows in added.items():
+            self.stdout.write(f"{symbol}: +{rows} bar(s)")
+        self.stdout.write(self.style.SUCCESS(f"Updated history for {len(added)} symbol(s)."))
@@ -0,0 +1,239 @@
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+DEFAULT_ALLOWED_IPS = ('127.0.0.1', '::1')
+
+METRICS = {
+    'finsight_request_duration_seconds': ('histogram', "Wall time of a request, by view."),
+    'finsight_request_db_queries': ('histogram', "SQL queries run by one request, by view."),
+    'finsight_request_db_seconds': ('histogram', "Time one request spent in SQL, by view."),
+    'finsight_upstream_call_seconds': ('histogram', "Latency of each quote provider call made for a request, by view."),
+    'finsight_requests_total': ('counter', "Requests served, by view and status code."),
+    'finsight_cache_requests_total': ('counter', "Cache lookups made for a request, by view, cache and result."),
+}
+
+_current = contextvars.ContextVar('finsight_request_stats', default=None)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram in the Prometheus layout: counts[i] holds
+    observations <= buckets[i], the last slot those above every bucket.
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """
+    In-process metrics for this worker, keyed by metric name and a tuple of
+    (label, value) pairs.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = defaultdict(float)
+
+    def observe(self, name, labels, value, buckets=DURATION_BUCKETS):
+        with self._lock:
+            histogram = self._histograms.get((name, labels))
+            if histogram is None:
+                histogram = self._histograms[(name, labels)] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, amount=1):
+        with self._lock:
+            self._counters[(name, labels)] += amount
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        """
+        Returns str in the Prometheus text exposition format
+        """
+        with self._lock:
+            histograms = {key: (list(h.counts), h.sum, h.buckets) for key, h in self._histograms.items()}
+            counters = dict(self._counters)
+        lines = []
+        for name, (kind, help_text) in METRICS.items():
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f"{name}{format_labels(labels)} {value:g}")
+                continue
+            for (metric, labels), (counts, total, buckets) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{format_labels(labels + (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(labels)} {total:g}")
+                lines.append(f"{name}_count{format_labels(labels)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join('{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')) for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def render_counter(name, help_text, label, values):
+    """
+    Prometheus text for a counter kept elsewhere, e.g. quote_metrics().
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+    lines += [f"{name}{format_labels(((label, key),))} {value:g}" for key, value in sorted(values.items())]
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class RequestStats:
+    """
+    What one request spent its time on. Quote fetches for the request may run
+    on worker threads, hence the lock.
+    """
+    __slots__ = ('queries', 'db_time', 'upstream', 'cache', '_lock')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.upstream = []  # seconds per provider call
+        self.cache = Counter()  # (cache, 'hit' | 'miss') -> lookups
+        self._lock = threading.Lock()
+
+    def add_query(self, seconds):
+        with self._lock:
+            self.queries += 1
+            self.db_time += seconds
+
+    def add_upstream(self, seconds):
+        with self._lock:
+            self.upstream.append(seconds)
+
+    def add_cache(self, cache, hits, misses):
+        with self._lock:
+            self.cache[(cache, 'hit')] += hits
+            self.cache[(cache, 'miss')] += misses
+
+    def server_timing(self, total):
+        entries = [f"total;dur={total * 1000:.1f}",
+                   f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"']
+        if self.upstream:
+            entries.append(f'upstream;dur={sum(self.upstream) * 1000:.1f};desc="{len(self.upstream)} calls"')
+        for cache in sorted({cache for cache, _ in self.cache}):
+            entries.append(f'cache-{cache};desc="{self.cache[(cache, "hit")]} hit, {self.cache[(cache, "miss")]} miss"')
+        return ", ".join(entries)
+
+
+def record_cache(cache, hits, misses):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_cache(cache, hits, misses)
+
+
+def record_upstream(seconds):
+    stats = _current.get()
+    if stats is not None:
+        stats.add_upstream(seconds)
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add_query(time.perf_counter() - started)
+
+
+@receiver(connection_created)
+def install_query_timer(sender, connection, **kwargs):
+    # Installed on every connection, so queries the async ORM runs on its
+    # worker thread are counted too; the request is found through the context.
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+class PerformanceMiddleware:
+    """
+    Per-view wall time, SQL queries and time, cache hits and misses and quote
+    provider calls, aggregated into the registry and, with
+    PERF_SERVER_TIMING, sent back in a Server-Timing header. Goes first in
+    MIDDLEWARE so the time includes the other middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    @staticmethod
+    def finish(request, response, stats, elapsed):
+        match = getattr(request, 'resolver_match', None)
+        view = (('view', match.view_name if match else 'unmatched'),)
+        registry.observe('finsight_request_duration_seconds', view, elapsed)
+        registry.observe('finsight_request_db_queries', view, stats.queries, COUNT_BUCKETS)
+        registry.observe('finsight_request_db_seconds', view, stats.db_time)
+        for seconds in stats.upstream:
+            registry.observe('finsight_upstream_call_seconds', view, seconds)
+        registry.inc('finsight_requests_total', view + (('code', response.status_code),))
+        for (cache, result), count in stats.cache.items():
+            if count:
+                registry.inc('finsight_cache_requests_total', view + (('cache', cache), ('result', result)), count)
+        if getattr(settings, 'PERF_SERVER_TIMING', False):
+            response['Server-Timing'] = stats.server_timing(elapsed)
+        return response
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:58
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_holdings(apps, schema_editor):
+    Transaction = apps.get_model('FinSight', 'Transaction')
+    Holding = apps.get_model('FinSight', 'Holding')
+    holdings = {}
+    for t in Transaction.objects.all().iterator():
+        holding = holdings.setdefault(
+            (t.portfolio_id, t.stockSymbol),
+            Holding(portfolio_id=t.portfolio_id, stockSymbol=t.stockSymbol, costBasis=Decimal(0)),
+        )
+        if t.transactionType == "Buy":
+            holding.quantity += t.quantity
+            holding.buyQuantity += t.quantity
+            holding.costBasis += t.quantity * Decimal(t.pricePerShare)
+        else:
+            holding.quantity -= t.quantity
+    Holding.objects.bulk_create(holdings.values())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FinSight', '0014_favoritestock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Holding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stockSymbol', models.CharField(max_length=10)),
+                ('quantity', models.IntegerField(default=0)),
+                ('buyQuantity', models.IntegerField(default=0)),
+                ('costBasis', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=16)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holdings', to='FinSight.portfolio')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'stockSymbol')},
+            },
+        ),
+        migrations.RunPython(populate_holdings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:11
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+
+def populate_lots(apps, schema_editor):
+    # Existing portfolios default to FIFO.
+    Transaction = apps.get_model('FinSight', 'Transaction')
+    Holding = apps.get_model('FinSight', 'Holding')
+    TaxLot = apps.get_model('FinSight', 'TaxLot')
+    open_lots, totals = {}, {}
+    for t in Transaction.objects.order_by('date', 'id').iterator():
+        key = (t.portfolio_id, t.stockSymbol)
+        lots = open_lots.setdefault(key, [])
+        total = totals.setdefault(key, [Decimal(0), Decimal(0)])  # open cost, realized
+        if t.transactionType == "Buy":
+            lots.append(TaxLot(portfolio_id=t.portfolio_id, transaction_id=t.id, stockSymbol=t.stockSymbol,
+                               acquiredAt=t.date, quantity=t.quantity, openQuantity=t.quantity,
+                               pricePerShare=t.pricePerShare))
+            total[0] += t.quantity * t.pricePerShare
+            continue
+        remaining = t.quantity
+        for lot in lots:
+            take = min(lot.openQuantity, remaining)
+            lot.openQuantity -= take
+            remaining -= take
+            total[0] -= take * lot.pricePerShare
+            total[1] += take * (t.pricePerShare - lot.pricePerShare)
+    TaxLot.objects.bulk_create([lot for lots in open_lots.values() for lot in lots])
+    for (portfolio_id, symbol), (open_cost, realized) in totals.items():
+        Holding.objects.filter(portfolio_id=portfolio_id, stockSymbol=symbol).update(
+            openCost=open_cost, realizedPnl=realized)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FinSight', '0016_pricehistory'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='holding',
+            name='openCost',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='holding',
+            name='realizedPnl',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0'), max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='portfolio',
+            name='costBasisMethod',
+            field=models.CharField(choices=[('FIFO', 'First in, first out'), ('LIFO', 'Last in, first out'), ('AVG', 'Average cost')], default='FIFO', max_length=4),
+        ),
+        migrations.CreateModel(
+            name='TaxLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stockSymbol', models.CharField(max_length=10)),
+                ('acquiredAt', models.DateTimeField()),
+                ('quantity', models.IntegerField()),
+                ('openQuantity', models.IntegerField()),
+                ('pricePerShare', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='FinSight.portfolio')),
+                ('transaction', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='FinSight.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['portfolio', 'stockSymbol', 'openQuantity'], name='FinSight_ta_portfol_c68ad5_idx')],
+            },
+        ),
+        migrations.RunPython(populate_lots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FinSight', '0018_transaction_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ticker',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('symbol', models.CharField(max_length=10, unique=True)),
+                ('name', models.CharField(max_length=200)),
+                ('exchange', models.CharField(blank=True, default='', max_length=20)),
+                ('active', models.BooleanField(default=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 04:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('FinSight', '0019_ticker'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='portfolio',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
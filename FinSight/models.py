@@ -1,10 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.db.models import JSONField
+from django.db.models import JSONField, F, Sum, Q
+from django.db import IntegrityError, transaction as db_transaction
 from decimal import Decimal
+from collections import namedtuple
+
+Position = namedtuple('Position', ['owned_qty', 'buy_qty', 'avg_buy_price', 'avg_cost', 'realized_pnl'])
+FOUR_PLACES = Decimal('0.0001')
 
 class MainUser(AbstractUser):
     email = models.EmailField(unique=True)
@@ -25,6 +31,11 @@ class Portfolio(models.Model):
         ('Medium', 'Medium'),
         ('High', 'High'),
     ]
+    COST_BASIS_CHOICES = [
+        ('FIFO', 'First in, first out'),
+        ('LIFO', 'Last in, first out'),
+        ('AVG', 'Average cost'),
+    ]
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     name = models.CharField(max_length=100, default="My Portfolio")
     description = models.TextField(blank=True, null=True)
@@ -33,42 +44,91 @@ class Portfolio(models.Model):
     investmentGoal = models.CharField(max_length=100, default="Long-term growth")
     createdAt = models.DateTimeField(auto_now_add=True)
     diversification = JSONField(default=dict, blank=True)
+    costBasisMethod = models.CharField(max_length=4, choices=COST_BASIS_CHOICES, default='FIFO')
+    # Incremented by every write to the portfolio or its transactions; used for ETags and caches.
+    version = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return f"{self.user.username}'s Portfolio"
 
-    def update_diversification(self):
-        transactions = Transaction.objects.filter(portfolio=self)
-        stock_totals = {}
-        for t in transactions:
-            symbol = t.stockSymbol
-            qty = t.quantity if t.transactionType == "Buy" else -t.quantity
-            stock_totals[symbol] = stock_totals.get(symbol, 0) + qty
-        stock_totals = {k: v for k, v in stock_totals.items() if v > 0}
+    def save(self, *args, **kwargs):
+        # Bump in SQL so a stale instance can never write an older version back.
+        bump = not self._state.adding
+        if bump:
+            self.version = F('version') + 1
+        super().save(*args, **kwargs)
+        if bump:
+            self.refresh_from_db(fields=['version'])
+
+    @classmethod
+    def bump_version(cls, pk):
+        cls.objects.filter(pk=pk).update(version=F('version') + 1)
+
+    def compute_diversification(self):
+        # Reads the materialized holdings, so the cost is one row per symbol
+        # rather than one row per transaction ever made.
+        stock_totals = dict(Holding.objects.filter(portfolio=self, quantity__gt=0)
+                            .values_list('stockSymbol', 'quantity'))
         total_shares = sum(stock_totals.values())
         if total_shares == 0:
-            self.diversification = {}
-        else:
-            self.diversification = {k: round((v / total_shares) * 100, 2) for k, v in stock_totals.items()}
-        self.save()
+            return {}
+        return {k: round((v / total_shares) * 100, 2) for k, v in stock_totals.items()}
+
+    def update_diversification(self):
+        self.diversification = self.compute_diversification()
+        Portfolio.objects.filter(pk=self.pk).update(diversification=self.diversification)
+
+    def positions(self, symbols=None):
+        """
+        Load owned qty, buy qty, average buy price, average cost of the open
+        lots and realized P&L for every symbol in one query.
+        Returns dict: symbol -> Position
+        """
+        return dict(self._position(*row) for row in self._position_rows(symbols))
+
+    async def apositions(self, symbols=None):
+        """
+        positions() with the async ORM.
+        """
+        return dict([self._position(*row) async for row in self._position_rows(symbols)])
+
+    def _position_rows(self, symbols):
+        holdings = Holding.objects.filter(portfolio=self)
+        if symbols is not None:
+            holdings = holdings.filter(stockSymbol__in=list(symbols))
+        return holdings.values_list('stockSymbol', 'quantity', 'buyQuantity', 'costBasis', 'openCost', 'realizedPnl')
+
+    @staticmethod
+    def _position(symbol, qty, buy_qty, cost, open_cost, realized):
+        avg_buy_price = cost / buy_qty if buy_qty else Decimal(0)
+        avg_cost = open_cost / qty if qty > 0 else Decimal(0)
+        return symbol, Position(qty, buy_qty, avg_buy_price, avg_cost, realized)
+
+    def _cached_prices(self, symbols):
+        return dict(StockPriceCache.objects.filter(ticker__in=list(symbols))
+                    .values_list('ticker', 'last_price'))
 
     def total_holdings_value(self):
+        positions = self.positions(self.diversification.keys())
+        prices = self._cached_prices(positions)
         total = Decimal(0)
-        for symbol, _ in self.diversification.items():
-            cache = StockPriceCache.objects.filter(ticker=symbol).first()
-            if cache:
-                qty = Transaction.getOwnedShares(self, symbol)
-                total += Decimal(qty) * Decimal(cache.last_price)
+        for symbol, position in positions.items():
+            if symbol in prices:
+                total += Decimal(position.owned_qty) * Decimal(prices[symbol])
         return total
 
     def total_profit_loss(self):
+        """
+        Realized P&L of every symbol ever traded plus unrealized P&L of the
+        open lots at the cached prices.
+        """
+        positions = self.positions()
+        prices = self._cached_prices(positions)
         total_pnl = Decimal(0)
-        for symbol, _ in self.diversification.items():
-            cache = StockPriceCache.objects.filter(ticker=symbol).first()
-            if cache:
-                qty = Transaction.getOwnedShares(self, symbol)
-                avg_buy_price = Transaction.getAverageBuyPrice(self, symbol)
-                total_pnl += Decimal(qty) * (Decimal(cache.last_price) - Decimal(avg_buy_price))
+        for symbol, position in positions.items():
+            total_pnl += position.realized_pnl
+            if symbol in prices and position.owned_qty > 0:
+                total_pnl += Decimal(position.owned_qty) * (Decimal(prices[symbol]) - position.avg_cost)
         return total_pnl
 
 class Transaction(models.Model):
@@ -84,42 +144,251 @@ class Transaction(models.Model):
     pricePerShare = models.DecimalField(max_digits=12, decimal_places=2)
     totalPrice = models.DecimalField(max_digits=12, decimal_places=2)
     note = models.TextField(blank=True, null=True)
-    date = models.DateTimeField(auto_now_add=True)
+    # A default rather than auto_now_add, so imports can insert historical dates directly.
+    date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination and date ranges on the transaction list.
+            models.Index(fields=['portfolio', 'date', 'id'], name='tx_portfolio_date_id'),
+            # Symbol prefix / type filters and per-symbol replays.
+            models.Index(fields=['portfolio', 'stockSymbol', 'transactionType'], name='tx_portfolio_symbol_type'),
+        ]
 
     def __str__(self):
         return f"{self.transactionType} {self.stockSymbol} ({self.quantity})"
 
     @staticmethod
     def getOwnedShares(portfolio, stockSymbol):
-        bought = sum(t.quantity for t in Transaction.objects.filter(
-            portfolio=portfolio,
-            stockSymbol=stockSymbol,
-            transactionType="Buy"
-        ))
-        sold = sum(t.quantity for t in Transaction.objects.filter(
-            portfolio=portfolio,
-            stockSymbol=stockSymbol,
-            transactionType="Sell"
-        ))
-        return bought - sold
+        holding = Holding.objects.filter(portfolio=portfolio, stockSymbol=stockSymbol).first()
+        return holding.quantity if holding else 0
 
     @staticmethod
     def getAverageBuyPrice(portfolio, stockSymbol):
-        buys = Transaction.objects.filter(
-            portfolio=portfolio,
-            stockSymbol=stockSymbol,
-            transactionType="Buy"
-        )
-        total_qty = sum(t.quantity for t in buys)
-        if total_qty == 0:
+        holding = Holding.objects.filter(portfolio=portfolio, stockSymbol=stockSymbol).first()
+        if not holding or holding.buyQuantity == 0:
             return Decimal(0)
-        total_spent = sum(Decimal(t.pricePerShare) * t.quantity for t in buys)
-        return total_spent / total_qty
+        return holding.costBasis / holding.buyQuantity
+
+
+class Holding(models.Model):
+    """
+    Running per-symbol totals for a portfolio, maintained from Transaction
+    signals so reads never have to replay the ledger.
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='holdings')
+    stockSymbol = models.CharField(max_length=10)
+    quantity = models.IntegerField(default=0)
+    buyQuantity = models.IntegerField(default=0)
+    costBasis = models.DecimalField(max_digits=16, decimal_places=2, default=Decimal('0.00'))
+    # Maintained by TaxLot using the portfolio's cost basis method.
+    openCost = models.DecimalField(max_digits=18, decimal_places=4, default=Decimal('0'))
+    realizedPnl = models.DecimalField(max_digits=18, decimal_places=4, default=Decimal('0'))
+
+    class Meta:
+        unique_together = ('portfolio', 'stockSymbol')
+
+    def __str__(self):
+        return f"{self.stockSymbol} ({self.quantity})"
+
+    @classmethod
+    def apply(cls, portfolio_id, stockSymbol, transactionType, quantity, pricePerShare, sign=1):
+        """
+        Add (sign=1) or reverse (sign=-1) one transaction's effect on the holding.
+        """
+        if transactionType == "Buy":
+            deltas = {
+                'quantity': sign * quantity,
+                'buyQuantity': sign * quantity,
+                'costBasis': sign * quantity * Decimal(pricePerShare),
+            }
+        else:
+            deltas = {'quantity': -sign * quantity, 'buyQuantity': 0, 'costBasis': Decimal(0)}
+
+        updated = cls.objects.filter(portfolio_id=portfolio_id, stockSymbol=stockSymbol).update(
+            **{field: F(field) + delta for field, delta in deltas.items()}
+        )
+        if not updated and sign > 0:
+            try:
+                with db_transaction.atomic():
+                    cls.objects.create(portfolio_id=portfolio_id, stockSymbol=stockSymbol, **deltas)
+            except IntegrityError:
+                # A concurrent first trade of the symbol created the row.
+                cls.objects.filter(portfolio_id=portfolio_id, stockSymbol=stockSymbol).update(
+                    **{field: F(field) + delta for field, delta in deltas.items()}
+                )
+
+    @classmethod
+    def rebuild(cls, portfolio):
+        """
+        Recompute a portfolio's holdings from its full transaction history.
+        """
+        totals = (Transaction.objects.filter(portfolio=portfolio)
+                  .values('stockSymbol')
+                  .annotate(
+                      bought=Sum('quantity', filter=Q(transactionType="Buy"), default=0),
+                      sold=Sum('quantity', filter=Q(transactionType="Sell"), default=0),
+                      spent=Sum(F('quantity') * F('pricePerShare'), filter=Q(transactionType="Buy"),
+                                output_field=models.DecimalField(max_digits=16, decimal_places=2)),
+                  ))
+        with db_transaction.atomic():
+            cls.objects.filter(portfolio=portfolio).delete()
+            cls.objects.bulk_create([
+                cls(
+                    portfolio=portfolio,
+                    stockSymbol=row['stockSymbol'],
+                    quantity=row['bought'] - row['sold'],
+                    buyQuantity=row['bought'],
+                    costBasis=row['spent'] or Decimal(0),
+                )
+                for row in totals
+            ])
+            for row in totals:
+                TaxLot.rebuild(portfolio, row['stockSymbol'])
+            portfolio.update_diversification()
+            Portfolio.bump_version(portfolio.pk)
+
+
+class TaxLot(models.Model):
+    """
+    Shares bought by one Buy transaction that have not all been sold yet.
+    Sells consume open lots in the portfolio's costBasisMethod order and
+    move the difference into Holding.realizedPnl.
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='lots')
+    transaction = models.ForeignKey(Transaction, on_delete=models.CASCADE, related_name='lots')
+    stockSymbol = models.CharField(max_length=10)
+    acquiredAt = models.DateTimeField()
+    quantity = models.IntegerField()
+    openQuantity = models.IntegerField()
+    pricePerShare = models.DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        indexes = [models.Index(fields=['portfolio', 'stockSymbol', 'openQuantity'])]
+
+    def __str__(self):
+        return f"{self.stockSymbol} {self.openQuantity}/{self.quantity} @ {self.pricePerShare}"
+
+    @staticmethod
+    def consume(lots, quantity, price, method, open_cost):
+        """
+        Sell quantity shares out of lots (open lots, oldest first), updating
+        their openQuantity in place.
+        Returns tuple: (cost removed, realized P&L, touched lots)
+        """
+        open_qty = sum(lot.openQuantity for lot in lots)
+        remaining = quantity
+        lot_cost = Decimal(0)
+        touched = []
+        for lot in (reversed(lots) if method == 'LIFO' else lots):
+            if not remaining:
+                break
+            if not lot.openQuantity:
+                continue
+            take = min(lot.openQuantity, remaining)
+            lot.openQuantity -= take
+            remaining -= take
+            lot_cost += take * lot.pricePerShare
+            touched.append(lot)
+        sold = quantity - remaining
+        if method == 'AVG':
+            cost = (open_cost * sold / open_qty).quantize(FOUR_PLACES) if open_qty else Decimal(0)
+        else:
+            cost = lot_cost
+        return cost, sold * Decimal(price) - cost, touched
+
+    @classmethod
+    def book(cls, transaction):
+        """
+        Apply a newly added (latest) transaction to its symbol's open lots.
+        Touches only the open lots, never the history.
+        """
+        holding = Holding.objects.filter(portfolio_id=transaction.portfolio_id,
+                                         stockSymbol=transaction.stockSymbol)
+        if transaction.transactionType == "Buy":
+            cls.objects.create(
+                portfolio_id=transaction.portfolio_id, transaction=transaction,
+                stockSymbol=transaction.stockSymbol, acquiredAt=transaction.date,
+                quantity=transaction.quantity, openQuantity=transaction.quantity,
+                pricePerShare=transaction.pricePerShare,
+            )
+            holding.update(openCost=F('openCost') + transaction.quantity * Decimal(transaction.pricePerShare))
+            return
+
+        lots = list(cls.objects.filter(portfolio_id=transaction.portfolio_id, stockSymbol=transaction.stockSymbol,
+                                       openQuantity__gt=0).order_by('acquiredAt', 'id'))
+        open_cost = holding.values_list('openCost', flat=True).first() or Decimal(0)
+        cost, realized, touched = cls.consume(lots, transaction.quantity, transaction.pricePerShare,
+                                              transaction.portfolio.costBasisMethod, open_cost)
+        cls.objects.bulk_update(touched, ['openQuantity'])
+        holding.update(openCost=F('openCost') - cost, realizedPnl=F('realizedPnl') + realized)
+
+    @classmethod
+    def rebuild(cls, portfolio, stockSymbol):
+        """
+        Replay one symbol's transactions to recreate its lots, open cost and
+        realized P&L. Used when history is edited or the method changes.
+        """
+        transactions = (Transaction.objects.filter(portfolio=portfolio, stockSymbol=stockSymbol)
+                        .order_by('date', 'id')
+                        .values_list('id', 'date', 'transactionType', 'quantity', 'pricePerShare'))
+        lots = []
+        open_cost = realized = Decimal(0)
+        for pk, when, transactionType, quantity, price in transactions:
+            if transactionType == "Buy":
+                lots.append(cls(portfolio=portfolio, transaction_id=pk, stockSymbol=stockSymbol, acquiredAt=when,
+                                quantity=quantity, openQuantity=quantity, pricePerShare=price))
+                open_cost += quantity * price
+            else:
+                cost, gain, _ = cls.consume(lots, quantity, price, portfolio.costBasisMethod, open_cost)
+                open_cost -= cost
+                realized += gain
+        with db_transaction.atomic():
+            cls.objects.filter(portfolio=portfolio, stockSymbol=stockSymbol).delete()
+            cls.objects.bulk_create(lots)
+            Holding.objects.filter(portfolio=portfolio, stockSymbol=stockSymbol).update(
+                openCost=open_cost, realizedPnl=realized)
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_transaction(sender, instance, **kwargs):
+    # Keep the stored row so post_save can reverse it before applying the edit.
+    instance._previous = None
+    if instance.pk:
+        instance._previous = (Transaction.objects.filter(pk=instance.pk)
+                              .values('portfolio_id', 'stockSymbol', 'transactionType',
+                                      'quantity', 'pricePerShare')
+                              .first())
+
 
 @receiver(post_save, sender=Transaction)
-@receiver(post_delete, sender=Transaction)
 def update_portfolio_diversification(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous', None)
+    if previous:
+        Holding.apply(sign=-1, **previous)
+    Holding.apply(instance.portfolio_id, instance.stockSymbol, instance.transactionType,
+                  instance.quantity, instance.pricePerShare)
+    if previous:
+        # An edit can change history before later sells, so replay the symbol(s) it touched.
+        TaxLot.rebuild(instance.portfolio, instance.stockSymbol)
+        if (previous['portfolio_id'], previous['stockSymbol']) != (instance.portfolio_id, instance.stockSymbol):
+            TaxLot.rebuild(Portfolio.objects.get(pk=previous['portfolio_id']), previous['stockSymbol'])
+    else:
+        TaxLot.book(instance)
+    instance.portfolio.update_diversification()
+    Portfolio.bump_version(instance.portfolio_id)
+    if previous and previous['portfolio_id'] != instance.portfolio_id:
+        Portfolio.objects.get(pk=previous['portfolio_id']).update_diversification()
+        Portfolio.bump_version(previous['portfolio_id'])
+
+
+@receiver(post_delete, sender=Transaction)
+def reverse_portfolio_diversification(sender, instance, **kwargs):
+    Holding.apply(instance.portfolio_id, instance.stockSymbol, instance.transactionType,
+                  instance.quantity, instance.pricePerShare, sign=-1)
+    TaxLot.rebuild(instance.portfolio, instance.stockSymbol)
     instance.portfolio.update_diversification()
+    Portfolio.bump_version(instance.portfolio_id)
 
 class StockPriceCache(models.Model):
     ticker = models.CharField(max_length=10, unique=True)
@@ -130,6 +399,34 @@ class StockPriceCache(models.Model):
         return f"{self.ticker}: {self.last_price}"
 
 
+class PriceHistory(models.Model):
+    """
+    Index of the daily bars kept on disk by FinSight.price_history.
+    """
+    symbol = models.CharField(max_length=10, unique=True)
+    first_date = models.DateField()
+    last_date = models.DateField()
+    rows = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.symbol}: {self.first_date} - {self.last_date}"
+
+
+class Ticker(models.Model):
+    """
+    Directory of known symbols, loaded from a CSV by `manage.py load_tickers`.
+    """
+    symbol = models.CharField(max_length=10, unique=True)
+    name = models.CharField(max_length=200)
+    exchange = models.CharField(max_length=20, blank=True, default='')
+    active = models.BooleanField(default=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.symbol}: {self.name}"
+
+
 class FavoriteStock(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     symbol = models.CharField(max_length=10)
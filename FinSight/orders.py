@@ -0,0 +1,63 @@
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+
+from .models import Holding, Portfolio, TaxLot, Transaction
+
+
+class OrderRejected(ValueError):
+    pass
+
+
+def book_order(portfolio, stockSymbol, stockName, transactionType, quantity, pricePerShare, note=''):
+    """
+    Book one trade in a single DB transaction without read-then-write races:
+    a sell decrements the holding only if enough shares are held, the
+    transaction row is inserted once, its tax lots are booked, and the
+    portfolio row gets one UPDATE that moves the cash (a buy only if the
+    balance covers it), stores the new diversification and bumps the
+    version. Every step is a conditional UPDATE or an INSERT, so the first
+    statement takes the write lock and concurrent orders queue instead of
+    overwriting each other's balance.
+    Raises OrderRejected; returns the Transaction
+    """
+    if transactionType not in ("Buy", "Sell"):
+        raise OrderRejected(f"Unknown transaction type {transactionType}.")
+    pricePerShare = Decimal(pricePerShare)
+    if quantity <= 0:
+        raise OrderRejected(f"Quantity must be a positive number of shares, not {quantity}.")
+    if pricePerShare <= 0:
+        raise OrderRejected(f"Price per share must be positive, not {pricePerShare}.")
+    totalPrice = quantity * pricePerShare
+    holding = Holding.objects.filter(portfolio_id=portfolio.pk, stockSymbol=stockSymbol)
+
+    with db_transaction.atomic():
+        if transactionType == "Sell":
+            if not holding.filter(quantity__gte=quantity).update(quantity=F('quantity') - quantity):
+                owned = holding.values_list('quantity', flat=True).first() or 0
+                raise OrderRejected(f"Cannot sell {quantity} shares of {stockSymbol}. You own {owned}.")
+        else:
+            Holding.apply(portfolio.pk, stockSymbol, transactionType, quantity, pricePerShare)
+
+        order = Transaction(portfolio=portfolio, stockSymbol=stockSymbol, stockName=stockName,
+                            transactionType=transactionType, quantity=quantity, pricePerShare=pricePerShare,
+                            totalPrice=totalPrice, note=note)
+        # bulk_create skips post_save: the holding was updated above and the
+        # portfolio row is written once below.
+        Transaction.objects.bulk_create([order])
+        TaxLot.book(order)
+
+        diversification = portfolio.compute_diversification()
+        portfolios = Portfolio.objects.filter(pk=portfolio.pk)
+        if transactionType == "Buy":
+            portfolios = portfolios.filter(cashBalance__gte=totalPrice)
+        updated = portfolios.update(
+            cashBalance=F('cashBalance') + (-totalPrice if transactionType == "Buy" else totalPrice),
+            diversification=diversification,
+            version=F('version') + 1,
+        )
+        if not updated:
+            raise OrderRejected(f"Insufficient cash balance to buy {quantity} shares of {stockSymbol}.")
+    portfolio.diversification = diversification
+    return order
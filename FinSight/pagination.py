@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+def encode_cursor(when, pk):
+    micros = (when - EPOCH) // timedelta(microseconds=1)
+    return f"{micros}-{pk}"
+
+
+def decode_cursor(cursor):
+    """
+    Returns (datetime, pk), or None if the cursor is malformed.
+    """
+    try:
+        micros, pk = cursor.split('-')
+        return EPOCH + timedelta(microseconds=int(micros)), int(pk)
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def keyset_page(queryset, after=None, before=None, size=DEFAULT_PAGE_SIZE, field='date'):
+    """
+    One page of queryset, newest first, positioned by (field, id) instead of
+    OFFSET so the database seeks straight to it through an index on
+    (..., field, id) however deep the page is. `after` continues past the
+    last row of a page, `before` goes back from the first row of one.
+    Returns tuple: (rows, cursor for the older page or None, cursor for the newer page or None)
+    """
+    newest_first = queryset.order_by(f'-{field}', '-id')
+    position = decode_cursor(before) if before else decode_cursor(after) if after else None
+
+    if before and position:
+        when, pk = position
+        rows = list(queryset.filter(Q(**{f'{field}__gte': when}),
+                                    Q(**{f'{field}__gt': when}) | Q(id__gt=pk))
+                    .order_by(field, 'id')[:size + 1])
+        has_newer = len(rows) > size
+        rows = rows[:size][::-1]
+        has_older = True
+    else:
+        if position:
+            when, pk = position
+            # The plain range comes first so the index can seek to it; the OR only settles ties.
+            newest_first = newest_first.filter(Q(**{f'{field}__lte': when}),
+                                               Q(**{f'{field}__lt': when}) | Q(id__lt=pk))
+        rows = list(newest_first[:size + 1])
+        has_older = len(rows) > size
+        rows = rows[:size]
+        has_newer = position is not None
+
+    older = encode_cursor(getattr(rows[-1], field), rows[-1].pk) if rows and has_older else None
+    newer = encode_cursor(getattr(rows[0], field), rows[0].pk) if rows and has_newer else None
+    return rows, older, newer
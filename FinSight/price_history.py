@@ -0,0 +1,142 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from .models import PriceHistory
+from .providers import get_provider_chain
+
+# One raw little-endian file per column per symbol. `date` is written last on
+# append, and readers take the row count from its size, so a half-finished
+# append is never visible.
+COLUMNS = {
+    'open': np.dtype('<f8'),
+    'high': np.dtype('<f8'),
+    'low': np.dtype('<f8'),
+    'close': np.dtype('<f8'),
+    'volume': np.dtype('<i8'),
+    'date': np.dtype('<M8[D]'),
+}
+BAR_FIELDS = ('date', 'open', 'high', 'low', 'close', 'volume')
+DEFAULT_BACKFILL_YEARS = 5
+DEFAULT_MAX_OPEN_MAPS = 256  # column maps kept open; each holds a file descriptor
+
+
+class PriceHistoryStore:
+    """
+    Daily OHLCV bars stored column-per-file under settings.PRICE_HISTORY_DIR,
+    read through memory maps so a date range is a zero-copy slice. Only the
+    columns asked for are mapped, and at most max_open_maps maps stay open,
+    least recently used first out.
+    """
+
+    def __init__(self, root=None, max_open_maps=None):
+        self.root = str(root or settings.PRICE_HISTORY_DIR)
+        self.max_open_maps = max_open_maps or getattr(settings, 'PRICE_HISTORY_MAX_OPEN_MAPS', DEFAULT_MAX_OPEN_MAPS)
+        self._maps = OrderedDict()  # (symbol, column) -> (rows, np.memmap)
+        self._lock = threading.Lock()
+
+    def _path(self, symbol, column):
+        return os.path.join(self.root, symbol, f"{column}.bin")
+
+    def rows(self, symbol):
+        try:
+            return os.path.getsize(self._path(symbol, 'date')) // COLUMNS['date'].itemsize
+        except FileNotFoundError:
+            return 0
+
+    def _columns(self, symbol, columns):
+        # 'date' is always mapped, reads locate the range with it.
+        rows = self.rows(symbol)
+        with self._lock:
+            return {column: self._map(symbol, column, rows) for column in dict.fromkeys(('date', *columns))}
+
+    def _map(self, symbol, column, rows):
+        if rows == 0:
+            return np.empty(0, COLUMNS[column])
+        key = (symbol, column)
+        cached = self._maps.get(key)
+        if cached and cached[0] == rows:
+            self._maps.move_to_end(key)
+            return cached[1]
+        column_map = np.memmap(self._path(symbol, column), dtype=COLUMNS[column], mode='r', shape=(rows,))
+        self._maps[key] = (rows, column_map)
+        self._maps.move_to_end(key)
+        # An evicted map's descriptor is released once no returned view uses it.
+        while len(self._maps) > self.max_open_maps:
+            self._maps.popitem(last=False)
+        return column_map
+
+    def read(self, symbol, start=None, end=None, columns=None):
+        """
+        Bars for symbol between start and end (inclusive) as read-only views
+        into the memory-mapped column files.
+        Returns dict: column -> np.ndarray
+        """
+        columns = columns or COLUMNS
+        maps = self._columns(symbol, columns)
+        dates = maps['date']
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, 'D'), side='left')
+        hi = len(dates) if end is None else np.searchsorted(dates, np.datetime64(end, 'D'), side='right')
+        return {column: maps[column][lo:hi] for column in columns}
+
+    def last_date(self, symbol):
+        dates = self._columns(symbol, ['date'])['date']
+        return dates[-1].astype(date) if len(dates) else None
+
+    def append(self, symbol, bars):
+        """
+        Append (date, open, high, low, close, volume) bars newer than the last
+        stored one. Returns number of rows written.
+        """
+        last = self.last_date(symbol)
+        bars = sorted(bar for bar in bars if last is None or bar[0] > last)
+        if not bars:
+            return 0
+        os.makedirs(os.path.join(self.root, symbol), exist_ok=True)
+        values = dict(zip(BAR_FIELDS, zip(*bars)))
+        for column, dtype in COLUMNS.items():
+            with open(self._path(symbol, column), 'ab') as f:
+                f.write(np.asarray(values[column], dtype=dtype).tobytes())
+        return len(bars)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None or _store.root != str(settings.PRICE_HISTORY_DIR):
+        _store = PriceHistoryStore()
+    return _store
+
+
+def update_history(symbols, years=DEFAULT_BACKFILL_YEARS, store=None):
+    """
+    Backfill symbols that have no history yet and append the days missing
+    since the last stored bar for the rest, then refresh the index table.
+    Returns dict: symbol -> rows added
+    """
+    store = store or get_store()
+    chain = get_provider_chain()
+    today = timezone.now().date()
+    added = {}
+    for symbol in symbols:
+        last = store.last_date(symbol)
+        start = last + timedelta(days=1) if last else today - timedelta(days=365 * years)
+        if start > today:
+            added[symbol] = 0
+            continue
+        added[symbol] = store.append(symbol, chain.get_daily_history(symbol, start, today))
+        columns = store.read(symbol, columns=['date'])
+        if len(columns['date']):
+            PriceHistory.objects.update_or_create(symbol=symbol, defaults={
+                'first_date': columns['date'][0].astype(date),
+                'last_date': columns['date'][-1].astype(date),
+                'rows': len(columns['date']),
+            })
+    return added
@@ -0,0 +1,180 @@
+import asyncio
+import json
+import logging
+import weakref
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import FavoriteStock, Holding
+from .stock_api import get_stock_prices
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POLL_INTERVAL = 5  # seconds between polls of the subscribed symbols
+DEFAULT_HEARTBEAT = 15  # seconds of silence before a keep-alive comment is sent
+DEFAULT_RETRY_MS = 5000  # EventSource reconnect delay
+DEFAULT_SNAPSHOT_RETRY_MS = 300000  # reconnect delay after a one-shot snapshot (WSGI)
+
+
+class Subscription:
+    """
+    One connection's mailbox. Updates are conflated per symbol: a reader
+    that falls behind gets the latest price of each symbol when it catches
+    up, so memory per connection is bounded by its symbol count and a slow
+    client never blocks the poller or other clients.
+    """
+
+    def __init__(self, symbols):
+        self.symbols = frozenset(symbols)
+        self.pending = {}
+        self.conflated = 0
+        self._ready = asyncio.Event()
+
+    def push(self, symbol, update):
+        # update is the symbol's JSON, encoded once by the broker for all subscribers
+        if symbol in self.pending:
+            self.conflated += 1
+        self.pending[symbol] = update
+        self._ready.set()
+
+    async def next_batch(self, timeout):
+        """
+        Wait up to timeout seconds for updates.
+        Returns dict: symbol -> encoded update, empty on timeout
+        """
+        if not self._ready.is_set():
+            # A timer handle rather than wait_for(), which would start a task per wait.
+            timer = asyncio.get_running_loop().call_later(timeout, self._ready.set)
+            try:
+                await self._ready.wait()
+            finally:
+                timer.cancel()
+        self._ready.clear()
+        batch, self.pending = self.pending, {}
+        return batch
+
+
+async def fetch_prices(symbols):
+    prices = await sync_to_async(get_stock_prices)(symbols)
+    return {
+        s: {'price': str(price), 'updated': updated.isoformat() if updated else None, 'stale': s in prices.stale}
+        for s, (price, updated) in prices.items()
+    }
+
+
+class PriceBroker:
+    """
+    In-process pub/sub for price updates. A single poller asks for the union
+    of all subscribed symbols once per interval, whatever the number of
+    connections, and fans changed prices out to each subscriber of the symbol.
+    """
+
+    def __init__(self, fetch=fetch_prices, interval=None):
+        self.fetch = fetch
+        self.interval = interval or getattr(settings, 'STOCK_STREAM_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self.latest = {}  # symbol -> last published update, JSON-encoded
+        self.polls = 0
+        self._topics = defaultdict(set)  # symbol -> subscriptions
+        self._wake = asyncio.Event()
+        self._task = None
+
+    @property
+    def subscribers(self):
+        return len({sub for subs in self._topics.values() for sub in subs})
+
+    def subscribe(self, symbols):
+        subscription = Subscription(symbols)
+        new_symbols = False
+        for symbol in subscription.symbols:
+            new_symbols |= symbol not in self._topics
+            self._topics[symbol].add(subscription)
+            if symbol in self.latest:
+                subscription.push(symbol, self.latest[symbol])
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        elif new_symbols:
+            self._wake.set()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for symbol in subscription.symbols:
+            subs = self._topics.get(symbol)
+            if subs is not None:
+                subs.discard(subscription)
+                if not subs:
+                    del self._topics[symbol]
+                    self.latest.pop(symbol, None)
+
+    def publish(self, updates):
+        for symbol, update in updates.items():
+            update = json.dumps(update, separators=(',', ':'))
+            if self.latest.get(symbol) == update:
+                continue
+            self.latest[symbol] = update
+            for subscription in self._topics.get(symbol, ()):
+                subscription.push(symbol, update)
+
+    async def _run(self):
+        while self._topics:
+            self._wake.clear()
+            try:
+                self.publish(await self.fetch(list(self._topics)))
+                self.polls += 1
+            except Exception as e:
+                logger.warning("Price stream poll failed: %s", e)
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+_brokers = weakref.WeakKeyDictionary()  # event loop -> PriceBroker
+
+
+def get_broker():
+    """
+    The broker of the running event loop (one per ASGI worker process).
+    """
+    loop = asyncio.get_running_loop()
+    broker = _brokers.get(loop)
+    if broker is None:
+        broker = _brokers[loop] = PriceBroker()
+    return broker
+
+
+async def stream_symbols(user):
+    """
+    Symbols the user holds or watches.
+    """
+    symbols = {s async for s in Holding.objects.filter(portfolio__user=user, quantity__gt=0)
+               .values_list('stockSymbol', flat=True)}
+    symbols.update([s async for s in FavoriteStock.objects.filter(user=user).values_list('symbol', flat=True)])
+    return sorted(symbols)
+
+
+def sse_event(data, event='prices'):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def sse_batch(batch, event='prices'):
+    # Same payload as sse_event() from updates already encoded by PriceBroker.publish().
+    fields = ",".join(f"{json.dumps(symbol)}:{update}" for symbol, update in batch.items())
+    return f"event: {event}\ndata: {{{fields}}}\n\n"
+
+
+async def event_stream(broker, symbols, heartbeat=None):
+    """
+    Server-sent events for symbols until the client disconnects: an event
+    with every changed price per wake-up, or a comment line as keep-alive.
+    """
+    heartbeat = heartbeat or getattr(settings, 'STOCK_STREAM_HEARTBEAT', DEFAULT_HEARTBEAT)
+    subscription = broker.subscribe(symbols)
+    try:
+        yield f"retry: {DEFAULT_RETRY_MS}\n\n"
+        while True:
+            batch = await subscription.next_batch(heartbeat)
+            yield sse_batch(batch) if batch else ": keep-alive\n\n"
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,424 @@
+import asyncio
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import date, timedelta
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PROVIDERS = [
+    {'BACKEND': 'FinSight.providers.YFinanceProvider'},
+]
+DEFAULT_CIRCUIT_BREAKER = {'failure_threshold': 5, 'reset_timeout': 30}
+
+
+class ProviderError(Exception):
+    """The provider could not answer (network error, rate limit, bad response)."""
+
+
+class ProviderUnavailable(ProviderError):
+    """Every provider in the chain failed or has its circuit open."""
+
+
+class QuoteProvider:
+    """
+    Base class for price sources. Subclasses implement get_quotes and
+    get_daily_history, and may override aget_quotes with a native async
+    client. A symbol the provider has no data for is left out of
+    the quotes / gets no bars rather than raising; exceptions mean the
+    provider itself failed and count against its circuit breaker.
+    """
+    name = 'base'
+
+    def __init__(self, connect_timeout=3.05, read_timeout=5, **options):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.options = options
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def timeout(self):
+        """(connect, read) seconds, as requests and curl_cffi take them."""
+        return (self.connect_timeout, self.read_timeout)
+
+    def get_quote(self, symbol):
+        """
+        Returns Decimal price, or None if the provider has no data for symbol.
+        """
+        return self.get_quotes([symbol]).get(symbol)
+
+    def get_quotes(self, symbols):
+        """
+        Returns dict: symbol -> Decimal price
+        """
+        raise NotImplementedError
+
+    async def aget_quotes(self, symbols):
+        """
+        get_quotes for async callers. Providers without an async client run
+        the blocking one on a worker thread.
+        Returns dict: symbol -> Decimal price
+        """
+        return await sync_to_async(self.get_quotes, thread_sensitive=False)(symbols)
+
+    def get_daily_history(self, symbol, start, end=None):
+        """
+        Daily bars between start and end (inclusive), oldest first.
+        Returns list of tuples: (date, open, high, low, close, volume)
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(QuoteProvider):
+    name = 'yfinance'
+
+    def get_quotes(self, symbols):
+        import yfinance as yf
+
+        symbols = list(symbols)
+        data = yf.download(symbols, period="5d", interval="1d", progress=False,
+                           auto_adjust=False, threads=False, timeout=self.timeout)
+        if data is None or data.empty:
+            return {}
+        closes = data['Close']
+        if not hasattr(closes, 'columns'):
+            closes = closes.to_frame(name=symbols[0])
+
+        prices = {}
+        for symbol in symbols:
+            if symbol not in closes.columns:
+                continue
+            series = closes[symbol].dropna()
+            if not series.empty:
+                prices[symbol] = Decimal(str(round(float(series.iloc[-1]), 2)))
+        return prices
+
+    def get_daily_history(self, symbol, start, end=None):
+        import yfinance as yf
+
+        end = end or date.today()
+        frame = yf.Ticker(symbol).history(start=start, end=end + timedelta(days=1), interval="1d",
+                                          auto_adjust=False, timeout=self.timeout)
+        return [
+            (index.date(), row['Open'], row['High'], row['Low'], row['Close'], int(row['Volume']))
+            for index, row in frame.dropna(subset=['Close']).iterrows()
+        ]
+
+
+class AlphaVantageProvider(QuoteProvider):
+    """
+    Alpha Vantage-style JSON API: GLOBAL_QUOTE per symbol and
+    TIME_SERIES_DAILY for history.
+    """
+    name = 'alphavantage'
+
+    def __init__(self, api_key='', base_url='https://www.alphavantage.co/query', **kwargs):
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.base_url = base_url
+        self._local = threading.local()
+
+    def _get(self, **params):
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        try:
+            response = session.get(self.base_url, params={**params, 'apikey': self.api_key},
+                                   timeout=self.timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError) as e:
+            raise ProviderError(f"{self.name} request failed: {e}") from e
+        # Rate limiting is reported in the body of a 200 response.
+        if 'Note' in data or 'Information' in data:
+            raise ProviderError(data.get('Note') or data.get('Information'))
+        return data
+
+    def get_quotes(self, symbols):
+        prices = {}
+        for symbol in symbols:
+            quote = self._get(function='GLOBAL_QUOTE', symbol=symbol).get('Global Quote') or {}
+            if quote.get('05. price'):
+                prices[symbol] = Decimal(quote['05. price']).quantize(Decimal('0.01'))
+            else:
+                logger.info("No quote data returned for %s", symbol)
+        return prices
+
+    def get_daily_history(self, symbol, start, end=None):
+        end = end or date.today()
+        outputsize = 'compact' if (end - start).days < 100 else 'full'
+        series = self._get(function='TIME_SERIES_DAILY', symbol=symbol, outputsize=outputsize).get('Time Series (Daily)')
+        if not series:
+            logger.info("No daily time series data returned for %s", symbol)
+            return []
+        bars = []
+        for day, bar in series.items():
+            day = date.fromisoformat(day)
+            if start <= day <= end:
+                bars.append((day, float(bar['1. open']), float(bar['2. high']), float(bar['3. low']),
+                             float(bar['4. close']), int(bar['5. volume'])))
+        return sorted(bars)
+
+
+class FakeProvider(QuoteProvider):
+    """
+    Deterministic offline provider for tests, benchmarks and development.
+    Prices are a smooth function of symbol and date, so quotes and history
+    always agree. `latency` simulates upstream delay per request; symbols in
+    `invalid_symbols`, or not shaped like a ticker, have no data.
+    """
+    name = 'fake'
+    SYMBOL_RE = re.compile(r'^[A-Z][A-Z0-9.\-]{0,9}$')
+
+    def __init__(self, latency=0, invalid_symbols=(), **kwargs):
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.invalid_symbols = set(invalid_symbols)
+
+    def knows(self, symbol):
+        return bool(self.SYMBOL_RE.match(symbol)) and symbol not in self.invalid_symbols
+
+    @staticmethod
+    def close_on(symbol, day):
+        seed = zlib.crc32(symbol.encode())
+        base = 20 + seed % 480
+        t = day.toordinal()
+        wave = 0.15 * math.sin(t / (40 + seed % 60) + seed) + 0.05 * math.sin(t / 7 + seed % 13)
+        trend = 1 + ((seed >> 8) % 50 - 15) / 1000 * (t - 730120) / 365
+        return round(base * max(trend, 0.05) * math.exp(wave), 2)
+
+    def _quotes(self, symbols):
+        today = date.today()
+        return {s: Decimal(str(self.close_on(s, today))) for s in symbols if self.knows(s)}
+
+    def get_quotes(self, symbols):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._quotes(symbols)
+
+    async def aget_quotes(self, symbols):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._quotes(symbols)
+
+    def get_daily_history(self, symbol, start, end=None):
+        if self.latency:
+            time.sleep(self.latency)
+        if not self.knows(symbol):
+            return []
+        end = end or date.today()
+        bars = []
+        day = start
+        previous = self.close_on(symbol, start - timedelta(days=1))
+        while day <= end:
+            if day.weekday() < 5:
+                close = self.close_on(symbol, day)
+                volume = 100000 + zlib.crc32(f"{symbol}{day}".encode()) % 900000
+                bars.append((day, previous, max(previous, close) * 1.005, min(previous, close) * 0.995, close, volume))
+                previous = close
+            day += timedelta(days=1)
+        return bars
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after `failure_threshold` consecutive failures.
+    After `reset_timeout` seconds one trial call is let through (half-open);
+    its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """
+        Returns the state a call is let through in: 'closed', or 'half-open'
+        for the one trial call. None while the circuit is open.
+        """
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return state
+            if state == 'half-open' and not self._trial:
+                self._trial = True
+                return state
+            return None
+
+    def end_trial(self):
+        """
+        Called when the trial call is over. If it was cancelled before it
+        recorded an outcome, the next call may be the trial instead of the
+        circuit staying half-open with no trial running.
+        """
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class ProviderChain:
+    """
+    Providers in failover order, each behind its own circuit breaker. A
+    symbol the first provider cannot price is asked of the next one.
+    """
+
+    def __init__(self, providers, failure_threshold=5, reset_timeout=30):
+        self.providers = [(p, CircuitBreaker(failure_threshold, reset_timeout)) for p in providers]
+
+    def _available(self, errors):
+        for provider, breaker in self.providers:
+            state = breaker.allow()
+            if state:
+                yield provider, breaker, state == 'half-open'
+            else:
+                errors.append(f"{provider}: circuit open")
+
+    def get_quotes(self, symbols):
+        """
+        Returns dict: symbol -> Decimal price. Raises ProviderUnavailable if no
+        provider could be reached.
+        """
+        remaining = list(symbols)
+        prices, errors = {}, []
+        answered = False
+        for provider, breaker, trial in self._available(errors):
+            try:
+                result = provider.get_quotes(remaining)
+            except Exception as e:
+                breaker.record_failure()
+                logger.warning("Quote provider %s failed: %s", provider, e)
+                errors.append(f"{provider}: {e}")
+                continue
+            else:
+                breaker.record_success()
+            finally:
+                if trial:
+                    breaker.end_trial()
+            answered = True
+            prices.update(result)
+            remaining = [s for s in remaining if s not in result]
+            if not remaining:
+                break
+        if not answered and errors:
+            raise ProviderUnavailable("; ".join(errors))
+        return prices
+
+    async def aget_quotes(self, symbols):
+        """
+        get_quotes through each provider's async client.
+        """
+        remaining = list(symbols)
+        prices, errors = {}, []
+        answered = False
+        for provider, breaker, trial in self._available(errors):
+            try:
+                result = await provider.aget_quotes(remaining)
+            except Exception as e:
+                breaker.record_failure()
+                logger.warning("Quote provider %s failed: %s", provider, e)
+                errors.append(f"{provider}: {e}")
+                continue
+            else:
+                breaker.record_success()
+            finally:
+                if trial:
+                    breaker.end_trial()
+            answered = True
+            prices.update(result)
+            remaining = [s for s in remaining if s not in result]
+            if not remaining:
+                break
+        if not answered and errors:
+            raise ProviderUnavailable("; ".join(errors))
+        return prices
+
+    def get_daily_history(self, symbol, start, end=None):
+        """
+        Returns list of daily bar tuples from the first provider that has any.
+        """
+        errors = []
+        for provider, breaker, trial in self._available(errors):
+            try:
+                bars = provider.get_daily_history(symbol, start, end)
+            except Exception as e:
+                breaker.record_failure()
+                logger.warning("History provider %s failed for %s: %s", provider, symbol, e)
+                errors.append(f"{provider}: {e}")
+                continue
+            else:
+                breaker.record_success()
+            finally:
+                if trial:
+                    breaker.end_trial()
+            if bars:
+                return bars
+        if errors:
+            raise ProviderUnavailable("; ".join(errors))
+        return []
+
+
+_chain = None
+_chain_config = None
+_chain_lock = threading.Lock()
+
+
+def get_provider_chain():
+    """
+    The process-wide chain built from settings.STOCK_PRICE_PROVIDERS, so
+    circuit breaker state is shared by every request. It is rebuilt when
+    those settings (or STOCK_PRICE_CIRCUIT_BREAKER) hold different values.
+    """
+    global _chain, _chain_config
+    config = (getattr(settings, 'STOCK_PRICE_PROVIDERS', DEFAULT_PROVIDERS),
+              getattr(settings, 'STOCK_PRICE_CIRCUIT_BREAKER', DEFAULT_CIRCUIT_BREAKER))
+    with _chain_lock:
+        if _chain is None or _chain_config != config:
+            entries, breaker = config
+            providers = [import_string(entry['BACKEND'])(**entry.get('OPTIONS', {})) for entry in entries]
+            _chain, _chain_config = ProviderChain(providers, **breaker), config
+        return _chain
+
+
+def reset_provider_chain():
+    """
+    Drop the chain, and with it the circuit breaker state.
+    """
+    global _chain
+    with _chain_lock:
+        _chain = None
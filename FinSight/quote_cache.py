@@ -0,0 +1,127 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+
+DEFAULT_ALIAS = 'quotes'
+DEFAULT_L1_MAX_ENTRIES = 1024
+DEFAULT_L1_TTL = 60  # seconds an entry may live in the in-process tier
+DEFAULT_L1_VALIDATE_AFTER = 1  # seconds before an L1 entry is checked against L2
+ATOMIC_ADD_BACKENDS = {
+    'django.core.cache.backends.redis',
+    'django.core.cache.backends.memcached',
+}
+
+
+def version_key(key):
+    return f"{key}:version"
+
+
+class QuoteCache:
+    """
+    Two-tier cache for quotes. L1 is a small LRU dict inside each worker
+    process; L2 is the Django cache alias shared by all workers (file-based
+    by default, Redis when configured). Every L2 write stamps a new version,
+    and L1 entries older than STOCK_PRICE_L1_VALIDATE_AFTER seconds are
+    checked against it, so a refresh in one worker reaches the others within
+    that delay.
+    """
+
+    def __init__(self, alias=None):
+        self.alias = alias or getattr(settings, 'STOCK_PRICE_CACHE_ALIAS', DEFAULT_ALIAS)
+        self._entries = OrderedDict()  # key -> [value, version, expires_at, checked_at]
+        self._lock = threading.Lock()
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def _remember(self, key, value, version, timeout, now):
+        ttl = getattr(settings, 'STOCK_PRICE_L1_TTL', DEFAULT_L1_TTL)
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        self._entries[key] = [value, version, now + ttl, now]
+        self._entries.move_to_end(key)
+        limit = getattr(settings, 'STOCK_PRICE_L1_MAX_ENTRIES', DEFAULT_L1_MAX_ENTRIES)
+        while len(self._entries) > limit:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        validate_after = getattr(settings, 'STOCK_PRICE_L1_VALIDATE_AFTER', DEFAULT_L1_VALIDATE_AFTER)
+        found, to_check, missing = {}, {}, []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None or entry[2] < now:
+                    self._entries.pop(key, None)
+                    missing.append(key)
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[0]
+                if now - entry[3] >= validate_after:
+                    to_check[key] = entry[1]
+
+        if to_check:
+            versions = self.shared.get_many([version_key(k) for k in to_check])
+            with self._lock:
+                for key, version in to_check.items():
+                    entry = self._entries.get(key)
+                    if entry is not None and versions.get(version_key(key)) == version:
+                        entry[3] = now
+                    else:
+                        self._entries.pop(key, None)
+                        del found[key]
+                        missing.append(key)
+
+        if missing:
+            stored = self.shared.get_many(missing)
+            with self._lock:
+                for key, (value, version) in stored.items():
+                    # L2 does not report the remaining lifetime; the L1 TTL bounds it.
+                    self._remember(key, value, version, None, now)
+                    found[key] = value
+        return found
+
+    def set_many(self, mapping, timeout=None):
+        if not mapping:
+            return
+        now = time.monotonic()
+        version = time.time_ns()
+        shared = {}
+        for key, value in mapping.items():
+            shared[key] = (value, version)
+            shared[version_key(key)] = version
+        self.shared.set_many(shared, timeout=timeout)
+        with self._lock:
+            for key, value in mapping.items():
+                self._remember(key, value, version, timeout, now)
+
+    def add(self, key, value, timeout=None):
+        # Locks only make sense in the shared tier. Only some backends make
+        # add() atomic across processes, see atomic_add.
+        return self.shared.add(key, value, timeout=timeout)
+
+    @property
+    def atomic_add(self):
+        """
+        True if the shared tier's add() is atomic across processes, so a key
+        added as a lock has exactly one owner. The file-based cache checks
+        and writes in two steps: two workers can both win.
+        """
+        return type(self.shared).__module__ in ATOMIC_ADD_BACKENDS
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        # Dropping the version stamps makes other workers' L1 copies fail validation.
+        self.shared.delete_many(keys + [version_key(k) for k in keys])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        self.shared.clear()
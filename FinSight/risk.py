@@ -0,0 +1,168 @@
+from datetime import timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .metrics import record_cache
+from .models import Holding, PriceHistory
+from .timeseries import business_days, close_matrix
+
+DEFAULT_BENCHMARK_SYMBOL = 'SPY'
+DEFAULT_LOOKBACK_DAYS = 365
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_RISK_FREE_RATE = 0.0  # annual
+DEFAULT_CACHE_ALIAS = 'default'
+DEFAULT_CACHE_TIMEOUT = 86400
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 20
+
+
+def return_matrix(closes):
+    """
+    Daily simple returns of an aligned close matrix. Days on which any
+    column has no return are dropped, so every column covers the same days.
+    Returns (mask of kept days, np.ndarray of shape (kept days, columns))
+    """
+    returns = closes[1:] / closes[:-1] - 1
+    keep = ~np.isnan(returns).any(axis=1)
+    return keep, returns[keep]
+
+
+def risk_metrics(returns, weights, benchmark=None, confidence=DEFAULT_CONFIDENCE,
+                 risk_free_rate=DEFAULT_RISK_FREE_RATE):
+    """
+    Risk of a fixed-weight portfolio from a (days x symbols) return matrix,
+    with one pass of matrix algebra instead of per-symbol loops. benchmark
+    is the benchmark's return on the same days, or None. Volatility and
+    Sharpe are annualized; drawdown and VaR are positive fractions of value
+    (one-day VaR at `confidence`).
+    Returns dict of floats and np.ndarray
+    """
+    days = len(returns)
+    portfolio = returns @ weights
+    mean, std = portfolio.mean(), portfolio.std(ddof=1)
+    growth = np.cumprod(1 + portfolio)
+    drawdown = 1 - growth / np.maximum.accumulate(growth)
+
+    centered = returns - returns.mean(axis=0)
+    covariance = centered.T @ centered / (days - 1)
+    symbol_std = np.sqrt(np.diag(covariance))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        correlation = np.nan_to_num(covariance / np.outer(symbol_std, symbol_std))
+    np.fill_diagonal(correlation, 1.0)
+
+    z = NormalDist().inv_cdf(1 - confidence)
+    metrics = {
+        'volatility': std * np.sqrt(TRADING_DAYS),
+        'max_drawdown': max(drawdown.max(), 0.0),
+        'sharpe': (mean - risk_free_rate / TRADING_DAYS) / std * np.sqrt(TRADING_DAYS) if std else None,
+        'var_historical': -np.quantile(portfolio, 1 - confidence),
+        'var_parametric': -(mean + z * std),
+        'symbol_volatility': symbol_std * np.sqrt(TRADING_DAYS),
+        'correlation': correlation,
+        'beta': None,
+        'symbol_beta': None,
+    }
+    if benchmark is not None:
+        deviation = benchmark - benchmark.mean()
+        variance = deviation @ deviation / (days - 1)
+        if variance:
+            # Betas of every column at once: cov(symbol, benchmark) / var(benchmark).
+            metrics['symbol_beta'] = centered.T @ deviation / (days - 1) / variance
+            metrics['beta'] = float(weights @ metrics['symbol_beta'])
+    return metrics
+
+
+def portfolio_risk(portfolio, end=None, store=None):
+    """
+    Volatility, max drawdown, Sharpe ratio, beta against
+    settings.RISK_BENCHMARK_SYMBOL, the holdings' correlation matrix and
+    historical and parametric VaR over the last RISK_LOOKBACK_DAYS of daily
+    closes, for the current holdings weighted by their latest close.
+    Holdings without stored history are listed in 'missing'.
+    Returns dict ready for JSON; 'available' is False without enough history
+    """
+    benchmark = getattr(settings, 'RISK_BENCHMARK_SYMBOL', DEFAULT_BENCHMARK_SYMBOL)
+    confidence = getattr(settings, 'RISK_CONFIDENCE', DEFAULT_CONFIDENCE)
+    lookback = getattr(settings, 'RISK_LOOKBACK_DAYS', DEFAULT_LOOKBACK_DAYS)
+    holdings = dict(Holding.objects.filter(portfolio=portfolio, quantity__gt=0)
+                    .order_by('stockSymbol').values_list('stockSymbol', 'quantity'))
+    end = end or timezone.now().date()
+    calendar = business_days(end - timedelta(days=lookback), end)
+
+    symbols = list(holdings)
+    closes = close_matrix(symbols + [benchmark], calendar, store)
+    priced = ~np.isnan(closes[:, :-1]).all(axis=0)
+    missing = [symbol for symbol, known in zip(symbols, priced) if not known]
+    symbols = [symbol for symbol, known in zip(symbols, priced) if known]
+    has_benchmark = not np.isnan(closes[:, -1]).all()
+    result = {'available': False, 'benchmark': benchmark if has_benchmark else None, 'confidence': confidence,
+              'observations': 0, 'symbols': symbols, 'missing': missing}
+    if not symbols:
+        return result
+    keep, returns = return_matrix(closes[:, np.append(priced, has_benchmark)])
+    result['observations'] = len(returns)
+    if len(returns) < MIN_OBSERVATIONS:
+        return result
+
+    last = closes[-1, :-1][priced]
+    value = last * np.array([holdings[symbol] for symbol in symbols], dtype=float)
+    weights = value / value.sum()
+    metrics = risk_metrics(
+        returns[:, :len(symbols)], weights,
+        benchmark=returns[:, -1] if has_benchmark else None,
+        confidence=confidence,
+        risk_free_rate=getattr(settings, 'RISK_FREE_RATE', DEFAULT_RISK_FREE_RATE),
+    )
+    days = calendar[1:][keep]
+    total = float(value.sum())
+    result.update({
+        'available': True,
+        'start': str(days[0]),
+        'end': str(days[-1]),
+        'value': round(total, 2),
+        'volatility': round(float(metrics['volatility']), 6),
+        'max_drawdown': round(float(metrics['max_drawdown']), 6),
+        'sharpe': None if metrics['sharpe'] is None else round(float(metrics['sharpe']), 4),
+        'beta': None if metrics['beta'] is None else round(metrics['beta'], 4),
+        'var_historical': round(float(metrics['var_historical']), 6),
+        'var_parametric': round(float(metrics['var_parametric']), 6),
+        'var_historical_amount': round(float(metrics['var_historical']) * total, 2),
+        'var_parametric_amount': round(float(metrics['var_parametric']) * total, 2),
+        'weights': weights.round(6).tolist(),
+        'symbol_volatility': metrics['symbol_volatility'].round(6).tolist(),
+        'symbol_beta': None if metrics['symbol_beta'] is None else metrics['symbol_beta'].round(4).tolist(),
+        'correlation': metrics['correlation'].round(4).tolist(),
+    })
+    return result
+
+
+def history_version():
+    """
+    Stamp of the stored price history, which changes whenever
+    update_history() touches any symbol, and its latest bar date.
+    Returns (str, date or None)
+    """
+    stamp = PriceHistory.objects.aggregate(updated=Max('updated_at'), last=Max('last_date'), symbols=Count('id'))
+    updated = stamp['updated'].timestamp() if stamp['updated'] else 0
+    return f"{updated:.6f}-{stamp['symbols']}", stamp['last']
+
+
+def cached_portfolio_risk(portfolio):
+    """
+    portfolio_risk() up to the latest stored bar, reused until the
+    portfolio (its version) or the price history changes.
+    """
+    cache = caches[getattr(settings, 'DASHBOARD_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+    version, last = history_version()
+    key = f"portfolio_risk_{portfolio.pk}_{portfolio.version}_{version}"
+    risk = cache.get(key)
+    record_cache('risk', risk is not None, risk is None)
+    if risk is None:
+        risk = portfolio_risk(portfolio, end=last)
+        cache.set(key, risk, getattr(settings, 'RISK_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return risk
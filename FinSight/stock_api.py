@@ -0,0 +1,733 @@
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, wait
+from decimal import Decimal
+from functools import partial
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.utils import timezone
+
+from .models import StockPriceCache, Holding, FavoriteStock
+from .metrics import record_cache, record_upstream
+from .providers import get_provider_chain
+from .quote_cache import QuoteCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_TIMEOUT = 3600  # seconds = 1 hour, hard TTL of a cached price
+SOFT_TTL = 300  # seconds before a cached price is served stale and revalidated
+LOCK_TIMEOUT = 10  # seconds a fetch lock is held at most
+DEFAULT_FETCH_DEADLINE = 0.8  # seconds for all misses of one request
+DEFAULT_FETCH_WORKERS = 8
+FETCH_THREAD_PREFIX = 'quote-fetch'
+DEFAULT_ASYNC_CONCURRENCY = 16  # provider requests in flight at once per event loop
+DEFAULT_BATCH_SIZE = 20  # symbols per provider request
+DEFAULT_FETCH_ON_REQUEST = False  # misses are read from StockPriceCache, kept warm by refresh_prices
+DEFAULT_BACKOFF_BASE = 30  # seconds before retrying a symbol after its first failure
+DEFAULT_BACKOFF_MAX = 6 * 3600
+DEFAULT_LATE_STORE_ATTEMPTS = 6  # saves of a late fetch tried while the database reports a lock
+LATE_STORE_BACKOFF = 0.05  # seconds before the second attempt, doubling after each
+
+_executor = None
+_executor_lock = threading.Lock()
+_metrics = Counter()
+_metrics_lock = threading.Lock()
+_inflight = {}  # symbol -> Future of the provider request fetching it
+_inflight_lock = threading.Lock()
+_claim_lock = threading.Lock()
+_failure_counts = Counter()  # symbol -> failed fetches seen by this process
+_loop_fetches = weakref.WeakKeyDictionary()  # event loop -> LoopFetches
+
+quote_cache = QuoteCache()
+
+# Cache calls are thread-safe and use no database connection, so async code
+# runs them on any worker thread rather than queueing them behind ORM calls
+# on the single thread-sensitive one.
+cache_to_async = partial(sync_to_async, thread_sensitive=False)
+
+
+class PriceMap(dict):
+    """
+    symbol -> (price, last_updated), plus the set of symbols that were served
+    from the last known StockPriceCache value because the live fetch failed or
+    missed the deadline.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stale = set()
+
+    def version(self):
+        """
+        Digest of these prices and their stale flags, for cache keys and
+        ETags of what was computed from them.
+        Returns str
+        """
+        raw = repr(sorted((s, str(price), updated and updated.isoformat(), s in self.stale)
+                          for s, (price, updated) in self.items()))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def record_quotes(source, count=1):
+    with _metrics_lock:
+        _metrics[source] += count
+
+
+def quote_metrics():
+    """
+    Running totals of symbols served per source: cache, live, coalesced, db,
+    stale, missing, plus background revalidations started, symbols skipped
+    while backing off, and failed/invalid fetch results.
+    """
+    with _metrics_lock:
+        return dict(_metrics)
+
+
+def quote_failures():
+    """
+    Failed fetches per symbol seen by this process.
+    """
+    with _metrics_lock:
+        return dict(_failure_counts)
+
+
+def cache_key(symbol):
+    return f"stock_price_{symbol}"
+
+
+def lock_key(symbol):
+    return f"stock_price_lock_{symbol}"
+
+
+def fail_key(symbol):
+    return f"stock_price_fail_{symbol}"
+
+
+def backoff_delay(failures):
+    """
+    Exponential backoff with jitter: somewhere between half and all of
+    base * 2^(failures - 1), capped at STOCK_PRICE_BACKOFF_MAX.
+    """
+    base = getattr(settings, 'STOCK_PRICE_BACKOFF_BASE', DEFAULT_BACKOFF_BASE)
+    cap = getattr(settings, 'STOCK_PRICE_BACKOFF_MAX', DEFAULT_BACKOFF_MAX)
+    delay = min(cap, base * 2 ** (failures - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def record_failures(symbols, invalid):
+    """
+    Negative-cache symbols whose fetch failed. `invalid` means the provider
+    answered but had no data for the symbol, as opposed to an error.
+    """
+    if not symbols:
+        return
+    current = quote_cache.get_many([fail_key(s) for s in symbols])
+    now = time.time()
+    updates = {}
+    for s in symbols:
+        failures = current.get(fail_key(s), {}).get('failures', 0) + 1
+        updates[fail_key(s)] = {'failures': failures, 'retry_at': now + backoff_delay(failures), 'invalid': invalid}
+    quote_cache.set_many(updates, timeout=2 * getattr(settings, 'STOCK_PRICE_BACKOFF_MAX', DEFAULT_BACKOFF_MAX))
+    with _metrics_lock:
+        _metrics['invalid' if invalid else 'failed'] += len(symbols)
+        _failure_counts.update(symbols)
+
+
+def backed_off(symbols):
+    """
+    Symbols whose last fetch failed and whose retry time has not come yet.
+    Returns dict: symbol -> {'failures', 'retry_at', 'invalid'}
+    """
+    records = quote_cache.get_many([fail_key(s) for s in symbols])
+    now = time.time()
+    return {s: records[fail_key(s)] for s in symbols
+            if fail_key(s) in records and records[fail_key(s)]['retry_at'] > now}
+
+
+def is_invalid_symbol(symbol):
+    """
+    True if the provider recently reported no data for the symbol. Only reads
+    the negative cache, never the network.
+    """
+    record = quote_cache.get_many([fail_key(symbol)]).get(fail_key(symbol))
+    return bool(record and record['invalid'])
+
+
+def call_provider(provider, symbols):
+    """
+    Call the provider and keep the negative cache in step with the outcome.
+    Returns dict: symbol -> price
+    """
+    called = time.perf_counter()
+    try:
+        prices = provider(symbols)
+    except Exception:
+        record_failures(symbols, invalid=False)
+        raise
+    finally:
+        record_upstream(time.perf_counter() - called)
+    record_answer(symbols, prices)
+    return prices
+
+
+def record_answer(symbols, prices):
+    """
+    Negative-cache the symbols a provider had no data for and clear the
+    failure records of those it priced.
+    """
+    record_failures([s for s in symbols if s not in prices], invalid=True)
+    if prices:
+        quote_cache.delete_many([fail_key(s) for s in prices])
+
+
+def cache_prices(quotes):
+    """
+    Put symbol -> (price, last_updated) into the two-tier quote cache. Entries
+    carry a soft expiry after which they are still served but revalidated.
+    """
+    if not quotes:
+        return
+    fresh_until = time.time() + getattr(settings, 'STOCK_PRICE_SOFT_TTL', SOFT_TTL)
+    entries = {cache_key(s): (price, updated, fresh_until) for s, (price, updated) in quotes.items()}
+    quote_cache.set_many(entries, timeout=getattr(settings, 'STOCK_PRICE_HARD_TTL', CACHE_TIMEOUT))
+
+
+def save_prices(quotes):
+    """
+    Upsert symbol -> (price, last_updated) into StockPriceCache in one statement.
+    """
+    if not quotes:
+        return
+    StockPriceCache.objects.bulk_create(
+        [StockPriceCache(ticker=s, last_price=price, last_updated=updated) for s, (price, updated) in quotes.items()],
+        update_conflicts=True,
+        unique_fields=['ticker'],
+        update_fields=['last_price', 'last_updated'],
+    )
+
+
+def store_prices(prices, now=None):
+    """
+    Upsert freshly fetched prices into StockPriceCache and the quote cache.
+    Returns dict: symbol -> (price: Decimal, last_updated: datetime)
+    """
+    now = now or timezone.now()
+    fresh = {s: (Decimal(p), now) for s, p in prices.items()}
+    save_prices(fresh)
+    cache_prices(fresh)
+    return fresh
+
+
+def get_provider():
+    """
+    The batch quote function of the configured provider chain: a list of
+    symbols in, dict symbol -> Decimal out.
+    """
+    return get_provider_chain().get_quotes
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'STOCK_PRICE_FETCH_WORKERS', DEFAULT_FETCH_WORKERS),
+                thread_name_prefix=FETCH_THREAD_PREFIX,
+            )
+        return _executor
+
+
+def _fetch_job(provider, symbols):
+    # Runs on the pool: caching here lets waiters in other processes, and the
+    # next request after a missed deadline, see the result.
+    now = timezone.now()
+    fresh = {s: (Decimal(p), now) for s, p in call_provider(provider, symbols).items()}
+    cache_prices(fresh)
+    return fresh
+
+
+def _refresh_job(provider, symbols):
+    try:
+        fresh = _fetch_job(provider, symbols)
+        save_prices(fresh)
+        return fresh
+    except Exception as e:
+        logger.warning("Background refresh failed for %s: %s", ", ".join(symbols), e)
+        return {}
+    finally:
+        connections.close_all()
+
+
+def _store_late(future):
+    """
+    Save a request's fetch that finished after the request stopped waiting
+    for it to StockPriceCache; the fetch job has already cached it. Runs on
+    the fetch pool; a fetch that finished just as the request gave up on it
+    is handed to the pool so the request never waits on the save.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    if not threading.current_thread().name.startswith(FETCH_THREAD_PREFIX):
+        try:
+            _get_executor().submit(_save_late, future.result())
+        except RuntimeError:  # the pool is shut down at interpreter exit
+            pass
+        return
+    _save_late(future.result())
+
+
+def _save_late(fresh):
+    # The request that gave up on this fetch may still hold the write lock, and
+    # a lock can be reported without waiting out busy_timeout (shared-cache
+    # databases), so retry with backoff rather than drop the prices.
+    attempts = getattr(settings, 'STOCK_PRICE_LATE_STORE_ATTEMPTS', DEFAULT_LATE_STORE_ATTEMPTS)
+    try:
+        for attempt in range(attempts):
+            try:
+                save_prices(fresh)
+                return
+            except OperationalError as e:
+                if attempt == attempts - 1:
+                    logger.warning("Could not store late prices for %s after %s attempts: %s",
+                                   ", ".join(fresh), attempts, e)
+                    return
+                time.sleep(LATE_STORE_BACKOFF * 2 ** attempt)
+    except Exception as e:
+        logger.warning("Could not store late prices for %s: %s", ", ".join(fresh), e)
+    finally:
+        connections.close_all()
+
+
+def _claim(symbols):
+    """
+    Take the fetch for symbols that are neither in flight in this process nor
+    locked in the shared quote cache. The lock keeps other processes from
+    fetching the same symbol only if that cache's add() is atomic (Redis,
+    Memcached; see QuoteCache.atomic_add). With the file-based cache it is
+    best effort, and workers may fetch a symbol once each.
+    Returns list of claimed symbols.
+    """
+    # Serialised within the process, which makes the claim exact here whatever the backend.
+    with _claim_lock:
+        with _inflight_lock:
+            free = [s for s in symbols if s not in _inflight]
+        return [s for s in free if quote_cache.add(lock_key(s), os.getpid(), timeout=LOCK_TIMEOUT)]
+
+
+def _claim_missing(symbols):
+    """
+    _claim(), then double-check the cache: a fetch may have finished between
+    the caller's cache miss and the claim.
+    Returns tuple: (claimed: list of symbols to fetch, fresh: dict symbol -> (price, last_updated))
+    """
+    claimed = _claim(symbols)
+    fresh = {}
+    if claimed:
+        found = quote_cache.get_many([cache_key(s) for s in claimed])
+        fresh = {s: found[cache_key(s)][:2] for s in claimed if cache_key(s) in found}
+        if fresh:
+            quote_cache.delete_many([lock_key(s) for s in fresh])
+            claimed = [s for s in claimed if s not in fresh]
+    return claimed, fresh
+
+
+def _release(symbols, future):
+    with _inflight_lock:
+        for s in symbols:
+            if _inflight.get(s) is future:
+                del _inflight[s]
+    quote_cache.delete_many([lock_key(s) for s in symbols])
+
+
+def _start_fetch(symbols, job, for_request=False):
+    """
+    Submit provider requests for claimed symbols in batches and register them
+    as in flight. Fetches `for_request` run in a copy of the caller's context,
+    so their provider calls are counted for the request waiting on them.
+    Returns dict: Future -> list of symbols
+    """
+    provider = get_provider()
+    size = max(1, getattr(settings, 'STOCK_PRICE_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    executor = _get_executor()
+    futures = {}
+    for i in range(0, len(symbols), size):
+        chunk = symbols[i:i + size]
+        if for_request:
+            future = executor.submit(contextvars.copy_context().run, job, provider, chunk)
+        else:
+            future = executor.submit(job, provider, chunk)
+        with _inflight_lock:
+            _inflight.update(dict.fromkeys(chunk, future))
+        future.add_done_callback(partial(_release, chunk))
+        futures[future] = chunk
+    return futures
+
+
+def refresh_in_background(symbols):
+    """
+    Revalidate soft-expired symbols without blocking, at most one fetch per symbol.
+    """
+    claimed = _claim(symbols)
+    if claimed:
+        record_quotes('revalidated', len(claimed))
+        _start_fetch(claimed, _refresh_job)
+
+
+def fetch_live_prices(symbols, deadline=None):
+    """
+    Fetch symbols from the provider in parallel batches, waiting at most
+    `deadline` seconds overall. Symbols already being fetched by another
+    request in this process, or in another one when the shared cache has an
+    atomic add() (see _claim), are waited on instead of fetched again.
+    Returns tuple: (fresh: dict symbol -> (price, last_updated), answered: set
+    of symbols whose request completed in time, claimed: set of symbols this
+    call fetched itself)
+    """
+    started = time.monotonic()
+    claimed, fresh = _claim_missing(symbols)
+    answered = set(fresh)
+    own = _start_fetch(claimed, _fetch_job, for_request=True)
+    futures = dict(own)
+    with _inflight_lock:
+        for s in symbols:
+            if s not in claimed and s in _inflight:
+                futures.setdefault(_inflight[s], []).append(s)
+    waiting = {s for chunk in futures.values() for s in chunk}
+    remote = [s for s in symbols if s not in waiting and s not in answered]
+
+    done, pending = wait(futures, timeout=deadline)
+    for future in done:
+        chunk = futures[future]
+        answered.update(chunk)
+        try:
+            prices = future.result()
+        except Exception as e:
+            logger.warning("Error fetching prices for %s: %s", ", ".join(chunk), e)
+            continue
+        fresh.update({s: prices[s] for s in chunk if s in prices})
+    for future in pending:
+        logger.warning("Price fetch for %s missed the %ss deadline", ", ".join(futures[future]), deadline)
+        if future in own:
+            future.add_done_callback(_store_late)
+
+    # Another process holds the lock: poll the shared cache until the deadline.
+    while remote:
+        found = quote_cache.get_many([cache_key(s) for s in remote])
+        for s in remote:
+            if cache_key(s) in found:
+                fresh[s] = found[cache_key(s)][:2]
+                answered.add(s)
+        remote = [s for s in remote if s not in answered]
+        if not remote or deadline is None or time.monotonic() - started >= deadline:
+            break
+        time.sleep(0.05)
+
+    record_quotes('coalesced', len([s for s in fresh if s not in claimed]))
+    return fresh, answered, set(claimed)
+
+
+def fetch_on_request():
+    return getattr(settings, 'STOCK_PRICE_FETCH_ON_REQUEST', DEFAULT_FETCH_ON_REQUEST)
+
+
+def get_stock_prices(symbols, deadline=None, live=None):
+    """
+    Get prices for many symbols with one cache read, parallel provider requests
+    for the misses bounded by a deadline, one bulk database upsert and one cache
+    write. Cached prices past their soft TTL are served as-is while a single
+    background refresh runs. Symbols not fetched in time fall back to
+    StockPriceCache and are listed in the result's `stale` set. Misses only
+    go upstream if `live`, which defaults to STOCK_PRICE_FETCH_ON_REQUEST.
+    Returns PriceMap: symbol -> (price: Decimal, last_updated: datetime)
+    """
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    results, misses = _read_cached(symbols, live)
+    if not misses:
+        return results
+
+    if deadline is None:
+        deadline = getattr(settings, 'STOCK_PRICE_FETCH_DEADLINE', DEFAULT_FETCH_DEADLINE)
+    blocked = backed_off(misses)
+    record_quotes('backoff', len(blocked))
+    fresh, answered, claimed = fetch_live_prices([s for s in misses if s not in blocked], deadline)
+    return _complete(results, misses, fresh, answered, claimed)
+
+
+async def aget_stock_prices(symbols, deadline=None):
+    """
+    get_stock_prices() for async views. Cache and database work runs through
+    sync_to_async; misses are fetched on the event loop with the providers'
+    async clients, at most STOCK_PRICE_ASYNC_CONCURRENCY requests at a time.
+    Returns PriceMap: symbol -> (price: Decimal, last_updated: datetime)
+    """
+    symbols = list(dict.fromkeys(s.upper() for s in symbols))
+    state = loop_fetches()
+    # Only the STOCK_PRICE_FETCH_ON_REQUEST=False branch of _read_cached() queries the database.
+    read = cache_to_async if fetch_on_request() else sync_to_async
+    results, misses, blocked, claimed, fresh = await read(_read_and_claim)(symbols, set(state.inflight))
+    if not misses:
+        return results
+
+    if deadline is None:
+        deadline = getattr(settings, 'STOCK_PRICE_FETCH_DEADLINE', DEFAULT_FETCH_DEADLINE)
+    record_quotes('backoff', len(blocked))
+    wanted = [s for s in misses if s not in blocked]
+    answered, claimed = await afetch_live_prices(state, wanted, claimed, fresh, deadline)
+    return await sync_to_async(_complete)(results, misses, fresh, answered, claimed)
+
+
+def _read_and_claim(symbols, skip):
+    """
+    The cache read, backoff check and fetch claim of aget_stock_prices() in
+    one trip off the event loop. Symbols in `skip` are already being fetched
+    on the loop and are not claimed.
+    Returns tuple: (results, misses, blocked, claimed, fresh)
+    """
+    results, misses = _read_cached(symbols)
+    if not misses:
+        return results, misses, {}, [], {}
+    blocked = backed_off(misses)
+    claimed, fresh = _claim_missing([s for s in misses if s not in blocked and s not in skip])
+    return results, misses, blocked, claimed, fresh
+
+
+def _read_cached(symbols, live=None):
+    """
+    The cache read of get_stock_prices(), revalidating soft-expired entries
+    in the background. Unless `live` (default: STOCK_PRICE_FETCH_ON_REQUEST)
+    misses are filled from StockPriceCache here.
+    Returns tuple: (results: PriceMap, misses: list of symbols to fetch live)
+    """
+    results = PriceMap()
+    if not symbols:
+        return results, []
+
+    cached = quote_cache.get_many([cache_key(s) for s in symbols])
+    now = time.time()
+    expired = []
+    for s in symbols:
+        entry = cached.get(cache_key(s))
+        if entry:
+            results[s] = entry[:2]
+            if entry[2] < now:
+                expired.append(s)
+    record_quotes('cache', len(results))
+    record_cache('quotes', len(results), len(symbols) - len(results))
+    if live is None:
+        live = fetch_on_request()
+    if expired and live:
+        refresh_in_background(expired)
+    misses = [s for s in symbols if s not in results]
+    if not misses or live:
+        return results, misses
+
+    # The refresher keeps StockPriceCache warm; requests never go upstream.
+    stored = StockPriceCache.objects.filter(ticker__in=misses).values_list('ticker', 'last_price', 'last_updated')
+    from_db = {ticker: (Decimal(price), updated) for ticker, price, updated in stored}
+    cache_prices(from_db)
+    record_quotes('db', len(from_db))
+    record_quotes('missing', len(misses) - len(from_db))
+    results.update(from_db)
+    for s in misses:
+        results.setdefault(s, (Decimal(0), None))
+    return results, []
+
+
+def _complete(results, misses, fresh, answered, claimed):
+    """
+    Store what this request fetched and fall back to StockPriceCache for
+    anything that could not be priced live.
+    Returns the completed PriceMap
+    """
+    save_prices({s: v for s, v in fresh.items() if s in claimed})
+    record_quotes('live', len([s for s in fresh if s in claimed]))
+
+    unpriced = [s for s in misses if s not in fresh]
+    fallback = {}
+    if unpriced:
+        for ticker, price, updated in StockPriceCache.objects.filter(ticker__in=unpriced).values_list(
+                'ticker', 'last_price', 'last_updated'):
+            fallback[ticker] = (Decimal(price), updated)
+    results.stale.update(fallback)
+    record_quotes('stale', len(fallback))
+    record_quotes('missing', len(unpriced) - len(fallback))
+
+    # Fallback prices are not cached: they would be served as fresh and hide
+    # the late result, which _store_late() caches and saves when it arrives.
+    results.update(fresh)
+    results.update(fallback)
+    for s in misses:
+        results.setdefault(s, (Decimal(0), None))
+    return results
+
+
+class LoopFetches:
+    """
+    Async fetch state of one event loop: the semaphore bounding provider
+    requests and symbol -> Task for fetches in flight.
+    """
+
+    def __init__(self):
+        self.limit = asyncio.Semaphore(getattr(settings, 'STOCK_PRICE_ASYNC_CONCURRENCY', DEFAULT_ASYNC_CONCURRENCY))
+        self.inflight = {}
+
+
+def loop_fetches():
+    loop = asyncio.get_running_loop()
+    state = _loop_fetches.get(loop)
+    if state is None:
+        state = _loop_fetches[loop] = LoopFetches()
+    return state
+
+
+def _finish_fetch(symbols, fresh):
+    """
+    Record the outcome of an async provider request (fresh is None if it
+    failed) and release the symbols' fetch locks.
+    """
+    if fresh is None:
+        record_failures(symbols, invalid=False)
+    else:
+        record_answer(symbols, fresh)
+        cache_prices(fresh)
+    quote_cache.delete_many([lock_key(s) for s in symbols])
+
+
+async def _afetch_job(state, symbols):
+    # Errors are logged here rather than raised: a task that outlives its
+    # caller's deadline has nobody left to retrieve them.
+    try:
+        try:
+            async with state.limit:
+                called = time.perf_counter()
+                try:
+                    prices = await get_provider_chain().aget_quotes(symbols)
+                finally:
+                    record_upstream(time.perf_counter() - called)
+        except Exception as e:
+            logger.warning("Error fetching prices for %s: %s", ", ".join(symbols), e)
+            fresh = None
+        else:
+            now = timezone.now()
+            fresh = {s: (Decimal(p), now) for s, p in prices.items()}
+        await cache_to_async(_finish_fetch)(symbols, fresh)
+        return fresh or {}
+    finally:
+        task = asyncio.current_task()
+        for s in symbols:
+            if state.inflight.get(s) is task:
+                del state.inflight[s]
+
+
+async def afetch_live_prices(state, symbols, claimed, fresh, deadline=None):
+    """
+    fetch_live_prices() on the event loop, for symbols whose claim was taken
+    by _read_and_claim(): claimed ones are fetched in batches, those already
+    being fetched on this loop are awaited, and those locked by another
+    thread or process are polled from the shared cache. Adds what arrives in
+    time to `fresh`.
+    Returns tuple: (answered: set of symbols, claimed: set of symbols fetched by this call)
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    answered = set(fresh)
+    tasks = {}  # Task -> symbols it answers for this call
+    for s in symbols:
+        if s in state.inflight and s not in claimed:
+            tasks.setdefault(state.inflight[s], []).append(s)
+
+    size = max(1, getattr(settings, 'STOCK_PRICE_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    for i in range(0, len(claimed), size):
+        chunk = claimed[i:i + size]
+        task = loop.create_task(_afetch_job(state, chunk))
+        state.inflight.update(dict.fromkeys(chunk, task))
+        tasks[task] = chunk
+    waiting = {s for chunk in tasks.values() for s in chunk}
+    remote = [s for s in symbols if s not in waiting and s not in answered]
+
+    done, pending = await asyncio.wait(tasks, timeout=deadline) if tasks else (set(), set())
+    for task in done:
+        chunk = tasks[task]
+        answered.update(chunk)
+        prices = task.result()
+        fresh.update({s: prices[s] for s in chunk if s in prices})
+    for task in pending:
+        logger.warning("Price fetch for %s missed the %ss deadline", ", ".join(tasks[task]), deadline)
+        if set(tasks[task]) <= set(claimed):
+            # Done callbacks run on the loop, where the ORM may not be used.
+            task.add_done_callback(lambda late: _get_executor().submit(_store_late, late))
+
+    # Another thread or process holds the lock: poll the shared cache until the deadline.
+    while remote:
+        found = await cache_to_async(quote_cache.get_many)([cache_key(s) for s in remote])
+        for s in remote:
+            if cache_key(s) in found:
+                fresh[s] = found[cache_key(s)][:2]
+                answered.add(s)
+        remote = [s for s in remote if s not in answered]
+        if not remote or deadline is None or loop.time() - started >= deadline:
+            break
+        await asyncio.sleep(0.05)
+
+    record_quotes('coalesced', len([s for s in fresh if s not in claimed]))
+    return answered, set(claimed)
+
+
+def get_stock_price(symbol):
+    """
+    Get stock price from cache or fetch live if missing, whatever
+    STOCK_PRICE_FETCH_ON_REQUEST says: trades and new favorites need a
+    price for symbols the refresher does not track yet.
+    Updates the database cache as well.
+    Returns tuple: (price: Decimal, last_updated: datetime)
+    """
+    return get_stock_prices([symbol], live=True)[symbol.upper()]
+
+
+def tracked_symbols():
+    """
+    Every symbol someone currently holds or watches, most popular first.
+    Returns list of (symbol, number of distinct users holding or watching it)
+    """
+    pairs = set(Holding.objects.filter(quantity__gt=0).values_list('portfolio__user_id', 'stockSymbol'))
+    pairs.update(FavoriteStock.objects.values_list('user_id', 'symbol'))
+    popularity = Counter(symbol for _, symbol in pairs)
+    return sorted(popularity.items(), key=lambda item: (-item[1], item[0]))
+
+
+def fetch_and_cache_all_prices(symbols=None, batch_size=None):
+    """
+    Refresh StockPriceCache and the Django cache for all tracked symbols (or
+    the given ones) in provider-sized batches, most popular symbols first.
+    Symbols still backing off after a failure are skipped and count as failed.
+    Returns tuple: (refreshed: list of symbols, failed: list of symbols)
+    """
+    if symbols is None:
+        symbols = [symbol for symbol, _ in tracked_symbols()]
+    size = batch_size or getattr(settings, 'STOCK_PRICE_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+    provider = get_provider()
+    blocked = backed_off(symbols)
+
+    refreshed, failed = [], list(blocked)
+    symbols = [s for s in symbols if s not in blocked]
+    for i in range(0, len(symbols), size):
+        batch = symbols[i:i + size]
+        try:
+            prices = call_provider(provider, batch)
+        except Exception as e:
+            logger.exception("Failed to update prices for %s: %s", ", ".join(batch), e)
+            prices = {}
+        store_prices(prices)
+        refreshed.extend(prices)
+        failed.extend(s for s in batch if s not in prices)
+    return refreshed, failed
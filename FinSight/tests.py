@@ -1,3 +1,1365 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import json
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import async_to_sync, sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.dispatch import receiver
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connection, connections, transaction as db_transaction
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.signals import setting_changed
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    MainUser, Portfolio, Transaction, Holding, TaxLot, StockPriceCache, FavoriteStock, PriceHistory,
+)
+from .stock_api import (
+    get_stock_price, get_stock_prices, quote_metrics, tracked_symbols, fetch_and_cache_all_prices, cache_prices, cache_key,
+    _inflight, quote_cache, quote_failures, backoff_delay, store_prices, aget_stock_prices,
+)
+from .quote_cache import QuoteCache
+from .price_history import PriceHistoryStore, update_history
+from .timeseries import business_days, portfolio_timeseries
+from .risk import cached_portfolio_risk, portfolio_risk, risk_metrics
+from .exports import parquet_available
+from .imports import import_transactions
+from .orders import OrderRejected, book_order
+from .db import DashboardRouter, apply_sqlite_pragmas, dashboard_reads
+from .tickers import load_tickers, reset_index, search_tickers
+from .dashboard import dashboard_cache_metrics, favorites_summary, portfolio_summary
+from .price_stream import PriceBroker, event_stream
+from .providers import (
+    FakeProvider, ProviderChain, ProviderError, ProviderUnavailable, QuoteProvider, get_provider_chain,
+    reset_provider_chain,
+)
+from .benchmarks import FAKE_PROVIDERS as BENCHMARK_PROVIDERS, compare_to_baseline, generate_dataset, run_scenarios
+from . import metrics, views
+
+# Tests never touch the on-disk quote cache of the working tree.
+TEST_CACHES = override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-default'},
+    'quotes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'test-quotes'},
+})
+
+
+def setUpModule():
+    TEST_CACHES.enable()
+
+
+def tearDownModule():
+    TEST_CACHES.disable()
+
+
+@receiver(setting_changed)
+def fresh_provider_chain(setting, **kwargs):
+    # Every provider override starts with closed circuit breakers.
+    if setting in ('STOCK_PRICE_PROVIDERS', 'STOCK_PRICE_CIRCUIT_BREAKER'):
+        reset_provider_chain()
+
+
+def make_portfolio(email="trader@example.com", cash=Decimal('100000.00')):
+    user = MainUser.objects.create_user(username=email.split('@')[0], email=email, password="pw")
+    return Portfolio.objects.create(user=user, cashBalance=cash)
+
+
+PROVIDER_CALLS = []
+
+
+class RecordingProvider(FakeProvider):
+    """Local quote provider with fixed prices that records every request."""
+
+    def get_quotes(self, symbols):
+        PROVIDER_CALLS.append(list(symbols))
+        if "SLOW" in symbols:
+            time.sleep(0.5)
+        if "HERD" in symbols:
+            time.sleep(0.2)
+        return {s: Decimal(100 + len(s)) for s in symbols if s != "BAD"}
+
+    # Async callers go through the recording get_quotes on a thread too.
+    aget_quotes = QuoteProvider.aget_quotes
+
+
+class AsyncCountingProvider(FakeProvider):
+    """Async-native provider that tracks how many requests overlap."""
+    active = peak = 0
+
+    async def aget_quotes(self, symbols):
+        AsyncCountingProvider.active += 1
+        AsyncCountingProvider.peak = max(AsyncCountingProvider.peak, AsyncCountingProvider.active)
+        await asyncio.sleep(0.02)
+        AsyncCountingProvider.active -= 1
+        return {s: Decimal(100 + len(s)) for s in symbols}
+
+
+class BrokenProvider(FakeProvider):
+    name = 'broken'
+
+    def get_quotes(self, symbols):
+        PROVIDER_CALLS.append(['broken'] + list(symbols))
+        raise ProviderError("upstream down")
+
+
+FAKE_PROVIDERS = [{'BACKEND': 'FinSight.tests.RecordingProvider'}]
+
+
+def trade(portfolio, symbol, transactionType, quantity, price):
+    price = Decimal(price)
+    return Transaction.objects.create(
+        portfolio=portfolio,
+        stockSymbol=symbol,
+        stockName=symbol,
+        transactionType=transactionType,
+        quantity=quantity,
+        pricePerShare=price,
+        totalPrice=quantity * price,
+    )
+
+
+class HoldingTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio()
+
+    def test_buys_and_sells_update_holding(self):
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        trade(self.portfolio, "AAPL", "Buy", 10, "200.00")
+        trade(self.portfolio, "AAPL", "Sell", 5, "250.00")
+        trade(self.portfolio, "MSFT", "Buy", 5, "50.00")
+
+        self.assertEqual(Transaction.getOwnedShares(self.portfolio, "AAPL"), 15)
+        self.assertEqual(Transaction.getAverageBuyPrice(self.portfolio, "AAPL"), Decimal('150'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.diversification, {"AAPL": 75.0, "MSFT": 25.0})
+
+    def test_update_and_delete_reverse_previous_effect(self):
+        buy = trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        sell = trade(self.portfolio, "AAPL", "Sell", 4, "120.00")
+
+        buy.stockSymbol = "MSFT"
+        buy.save()
+        self.assertEqual(Transaction.getOwnedShares(self.portfolio, "AAPL"), -4)
+        self.assertEqual(Transaction.getOwnedShares(self.portfolio, "MSFT"), 10)
+
+        sell.delete()
+        self.assertEqual(Transaction.getOwnedShares(self.portfolio, "AAPL"), 0)
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.diversification, {"MSFT": 100.0})
+
+    def test_rebuild_matches_incremental(self):
+        trade(self.portfolio, "AAPL", "Buy", 3, "10.50")
+        trade(self.portfolio, "TSLA", "Buy", 7, "20.25")
+        trade(self.portfolio, "TSLA", "Sell", 2, "30.00")
+        expected = list(Holding.objects.order_by('stockSymbol')
+                        .values_list('stockSymbol', 'quantity', 'buyQuantity', 'costBasis'))
+
+        Holding.objects.all().delete()
+        Holding.rebuild(self.portfolio)
+
+        rebuilt = list(Holding.objects.order_by('stockSymbol')
+                       .values_list('stockSymbol', 'quantity', 'buyQuantity', 'costBasis'))
+        self.assertEqual(rebuilt, expected)
+
+
+class TaxLotTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio()
+
+    def _trade_partial_sell(self, method):
+        self.portfolio.costBasisMethod = method
+        self.portfolio.save()
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        trade(self.portfolio, "AAPL", "Buy", 10, "200.00")
+        trade(self.portfolio, "AAPL", "Sell", 15, "250.00")
+        return self.portfolio.positions()["AAPL"]
+
+    def test_fifo_partial_sell(self):
+        position = self._trade_partial_sell('FIFO')
+        self.assertEqual(position.realized_pnl, Decimal('1750'))
+        self.assertEqual(position.avg_cost, Decimal('200'))
+        self.assertEqual(list(TaxLot.objects.filter(openQuantity__gt=0).values_list('openQuantity', 'pricePerShare')),
+                         [(5, Decimal('200.00'))])
+
+    def test_lifo_partial_sell(self):
+        position = self._trade_partial_sell('LIFO')
+        self.assertEqual(position.realized_pnl, Decimal('1250'))
+        self.assertEqual(position.avg_cost, Decimal('100'))
+
+    def test_average_cost_partial_sell(self):
+        position = self._trade_partial_sell('AVG')
+        self.assertEqual(position.realized_pnl, Decimal('1500'))
+        self.assertEqual(position.avg_cost, Decimal('150'))
+
+    def test_edit_and_method_change_rebuild_symbol(self):
+        self._trade_partial_sell('FIFO')
+        first = Transaction.objects.order_by('id').first()
+        first.pricePerShare = Decimal('120.00')
+        first.totalPrice = first.quantity * first.pricePerShare
+        first.save()
+        self.assertEqual(self.portfolio.positions()["AAPL"].realized_pnl, Decimal('1550'))
+
+        self.portfolio.costBasisMethod = 'LIFO'
+        self.portfolio.save()
+        TaxLot.rebuild(self.portfolio, "AAPL")
+        self.assertEqual(self.portfolio.positions()["AAPL"].realized_pnl, Decimal('1150'))
+
+        Transaction.objects.filter(transactionType="Sell").get().delete()
+        position = self.portfolio.positions()["AAPL"]
+        self.assertEqual((position.realized_pnl, position.avg_cost), (Decimal('0'), Decimal('160')))
+
+    def test_unknown_cost_basis_method_is_rejected(self):
+        self._trade_partial_sell('FIFO')
+        self.client.force_login(self.portfolio.user)
+        response = self.client.post(reverse('updatePortfolio'), {'name': "Renamed", 'costBasisMethod': 'HIFO'})
+        self.assertRedirects(response, reverse('updatePortfolio'), fetch_redirect_response=False)
+        self.portfolio.refresh_from_db()
+        self.assertEqual((self.portfolio.name, self.portfolio.costBasisMethod), ("My Portfolio", 'FIFO'))
+        self.assertEqual(self.portfolio.positions()["AAPL"].realized_pnl, Decimal('1750'))
+
+    def test_total_profit_loss_includes_realized(self):
+        self._trade_partial_sell('FIFO')
+        StockPriceCache.objects.create(ticker="AAPL", last_price=Decimal('300.00'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.total_profit_loss(), Decimal('2250'))
+
+
+class TransactionExportTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio()
+        self.client.force_login(self.portfolio.user)
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        trade(self.portfolio, "MSFT", "Buy", 5, "50.00")
+        trade(self.portfolio, "AAPL", "Sell", 4, "120.00")
+
+    def _download(self, **params):
+        response = self.client.get(reverse('downloadTransactionsCSV'), params)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content)
+
+    def test_csv_streams_with_list_filters(self):
+        response, body = self._download(type="Buy", symbol="aap")
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:2], ["Date", "Stock Symbol"])
+        self.assertEqual(len(lines), 2)
+        self.assertIn("AAPL,AAPL,Buy,10,100.0,1000.0,", lines[1])
+
+    def test_gzip_round_trip(self):
+        _, plain = self._download()
+        response, body = self._download(format="gzip")
+        self.assertIn('.csv.gz', response['Content-Disposition'])
+        self.assertEqual(gzip.decompress(body), plain)
+
+    @unittest.skipUnless(parquet_available(), "pyarrow not installed")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+
+        _, body = self._download(format="parquet", symbol="AAPL")
+        table = pq.read_table(io.BytesIO(body))
+        self.assertEqual(table.column('transactionType').to_pylist(), ["Sell", "Buy"])
+        self.assertEqual(table.column('pricePerShare').to_pylist(), [Decimal('120.00'), Decimal('100.00')])
+
+
+class TransactionImportTests(TestCase):
+    CSV = [
+        "Date,Stock Symbol,Stock Name,Transaction Type,Quantity,Price Per Share,Total Price,Note\n",
+        "2021-03-01 10:00,AAPL,Apple,Buy,10,100.00,1000.00,\n",
+        "2021-06-01,msft,,buy,5,50,,migrated\n",
+        "2022-01-03 15:30,AAPL,Apple,Sell,4,120.00,480.00,\n",
+    ]
+
+    def setUp(self):
+        self.portfolio = make_portfolio(cash=Decimal('10000.00'))
+
+    def test_csv_import_recomputes_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            result = import_transactions(self.portfolio, self.CSV)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.created, 3)
+        self.assertLess(len(queries), 30)
+
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cashBalance, Decimal('9230.00'))
+        self.assertEqual(self.portfolio.diversification, {"AAPL": 54.55, "MSFT": 45.45})
+        aapl = self.portfolio.positions()["AAPL"]
+        self.assertEqual((aapl.owned_qty, aapl.realized_pnl), (6, Decimal('80')))
+        first = Transaction.objects.order_by('date').first()
+        self.assertEqual(first.date.date(), date(2021, 3, 1))
+
+    def test_rows_are_checked_in_date_order(self):
+        header = self.CSV[0]
+        sell_first = [header, "2021-06-01,AAPL,Apple,Sell,4,120.00,,\n", "2021-03-01,AAPL,Apple,Buy,10,100.00,,\n"]
+        with CaptureQueriesContext(connection) as queries:
+            result = import_transactions(self.portfolio, sell_first)
+        self.assertTrue(result.ok, result.errors)
+        self.assertFalse([q for q in queries if q['sql'].startswith('UPDATE "FinSight_transaction"')])
+        self.assertEqual(list(Transaction.objects.order_by('date').values_list('transactionType', flat=True)),
+                         ["Buy", "Sell"])
+        self.assertEqual(self.portfolio.positions()["AAPL"].owned_qty, 6)
+
+        # The buy is dated after the sell, so the sell would go short on its date.
+        buy_later = [header, "2023-01-02,MSFT,,Buy,5,50,,\n", "2022-06-01,MSFT,,Sell,5,60,,\n"]
+        result = import_transactions(self.portfolio, buy_later)
+        self.assertEqual(result.errors, [(3, "Cannot sell 5 shares of MSFT; only 0 held at this point.")])
+        self.assertFalse(Transaction.objects.filter(stockSymbol="MSFT").exists())
+
+    def test_bad_rows_reject_whole_file(self):
+        lines = self.CSV + ["2022-02-01,AAPL,Apple,Sell,50,120.00,,\n", "yesterday,TSLA,Tesla,Hold,1,1,,\n"]
+        result = import_transactions(self.portfolio, lines)
+        self.assertEqual(result.error_count, 2)
+        self.assertEqual([line for line, _ in result.errors], [5, 6])
+        self.assertIn("only 6 held", result.errors[0][1])
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_dry_run_writes_nothing(self):
+        result = import_transactions(self.portfolio, self.CSV, dry_run=True)
+        self.assertTrue(result.ok)
+        self.assertEqual((result.rows, result.created), (3, 0))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_jsonl_upload_view(self):
+        self.client.force_login(self.portfolio.user)
+        body = (b'{"stockSymbol": "IBM", "transactionType": "Buy", "quantity": 3, "pricePerShare": 140.5}\n'
+                b'{"stockSymbol": "IBM", "transactionType": "Sell", "quantity": 1, "pricePerShare": 150}\n')
+        upload = SimpleUploadedFile("trades.jsonl", body)
+        response = self.client.post(reverse('importTransactions'), {'file': upload})
+        self.assertRedirects(response, reverse('viewTransactions'))
+        self.assertEqual(Transaction.getOwnedShares(self.portfolio, "IBM"), 2)
+
+
+@override_settings(TRANSACTIONS_PAGE_SIZE=2)
+class TransactionListTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio()
+        self.client.force_login(self.portfolio.user)
+        for symbol in ["AAPL", "MSFT", "AMZN", "AAPL", "IBM"]:
+            trade(self.portfolio, symbol, "Buy", 1, "10.00")
+        # Two rows share a timestamp so the id tiebreak matters.
+        Transaction.objects.filter(stockSymbol="AMZN").update(date=Transaction.objects.get(stockSymbol="MSFT").date)
+
+    def _ids(self, response):
+        return [t.id for t in response.context['transactions']]
+
+    def test_keyset_pages_forward_and_back(self):
+        expected = list(Transaction.objects.order_by('-date', '-id').values_list('id', flat=True))
+        url = reverse('viewTransactions')
+        pages = []
+        response = self.client.get(url)
+        self.assertIsNone(response.context['newer_query'])
+        while True:
+            pages.append(self._ids(response))
+            if not response.context['older_query']:
+                break
+            response = self.client.get(f"{url}?{response.context['older_query']}")
+        self.assertEqual(sum(pages, []), expected)
+        self.assertEqual([len(p) for p in pages], [2, 2, 1])
+
+        response = self.client.get(f"{url}?{response.context['newer_query']}")
+        self.assertEqual(self._ids(response), pages[1])
+
+    def test_prefix_and_date_filters(self):
+        url = reverse('viewTransactions')
+        response = self.client.get(url, {'symbol': 'a', 'type': 'Buy'})
+        self.assertEqual({t.stockSymbol for t in response.context['transactions']}, {"AAPL", "AMZN"})
+        today = timezone.localdate()
+        response = self.client.get(url, {'start': today.isoformat(), 'end': today.isoformat()})
+        self.assertEqual(len(response.context['transactions']), 2)
+        response = self.client.get(url, {'end': (today - timedelta(days=1)).isoformat()})
+        self.assertEqual(len(response.context['transactions']), 0)
+
+    def test_deep_page_seeks_through_index(self):
+        row = Transaction.objects.order_by('date', 'id').first()
+        plan = (Transaction.objects.filter(portfolio=self.portfolio)
+                .filter(date__lt=row.date).order_by('-date', '-id')[:3].explain())
+        self.assertIn('tx_portfolio_date_id', plan)
+
+
+class TickerDirectoryTests(TestCase):
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+        call_command('load_tickers', stdout=io.StringIO())
+
+    def test_prefix_search_on_symbols_and_names(self):
+        self.assertEqual(search_tickers("aap")[0], ("AAPL", "Apple Inc."))
+        self.assertEqual(search_tickers("V")[0][0], "V")
+        self.assertEqual({s for s, _ in search_tickers("micro")}, {"MSFT", "AMD", "MU"})
+        self.assertEqual(search_tickers("coca")[0][0], "KO")
+        self.assertEqual(len(search_tickers("a", limit=3)), 3)
+
+        started = time.perf_counter()
+        for _ in range(1000):
+            search_tickers("micro")
+        self.assertLess((time.perf_counter() - started) / 1000, 0.001)
+
+    def test_autocomplete_endpoint(self):
+        portfolio = make_portfolio()
+        self.client.force_login(portfolio.user)
+        response = self.client.get(reverse('tickerAutocomplete'), {'q': 'tes', 'limit': 2})
+        self.assertEqual(response.json()['results'], [{'symbol': 'TSLA', 'name': 'Tesla Inc.'}])
+
+    @override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS)
+    def test_favorites_validate_locally(self):
+        PROVIDER_CALLS.clear()
+        portfolio = make_portfolio()
+        self.client.force_login(portfolio.user)
+        self.client.post(reverse('addFavoriteStock'), {'symbol': 'zzzz'})
+        self.client.post(reverse('addFavoriteStock'), {'symbol': 'nvda'})
+        self.assertEqual(list(FavoriteStock.objects.values_list('symbol', 'name')), [("NVDA", "NVIDIA Corporation")])
+        self.assertEqual(PROVIDER_CALLS, [])
+
+    def test_pipe_listing_and_delisting(self):
+        listing = io.StringIO(
+            "Symbol|Security Name|Market Category|Test Issue\n"
+            "AAPL|Apple Inc. - Common Stock|Q|N\n"
+            "ZXZZT|NASDAQ TEST STOCK|G|Y\n"
+            "File Creation Time: 1018202608:00|||\n"
+        )
+        loaded, deactivated = load_tickers(listing, deactivate_missing=True)
+        self.assertEqual((loaded, deactivated), (1, 100))
+        self.assertEqual(search_tickers("tsl"), [])
+        self.assertEqual(search_tickers("aapl"), [("AAPL", "Apple Inc. - Common Stock")])
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True)
+class JsonApiTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        self.portfolio = make_portfolio()
+        self.client.force_login(self.portfolio.user)
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+
+    def test_portfolio_summary_conditional_get(self):
+        url = reverse('apiPortfolio')
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['totals']['value'], "1040.00")
+        # The ETag covers the price fetched by this very request, so it revalidates straight away.
+        etag = first['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(reverse('apiHoldings'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        trade(self.portfolio, "AAPL", "Sell", 1, "110.00")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['realizedPnl'], "10.00")
+
+        etag = response['ETag']
+        store_prices({"AAPL": Decimal('120.00')})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['totals']['value'], "1080.00")
+
+    def test_portfolio_save_bumps_version(self):
+        stale = Portfolio.objects.get(pk=self.portfolio.pk)
+        version = stale.version
+        self.portfolio.name = "Renamed"
+        self.portfolio.save()
+        stale.save()
+        self.assertEqual(Portfolio.objects.get(pk=self.portfolio.pk).version, version + 2)
+
+    def test_transactions_and_favorites(self):
+        response = self.client.get(reverse('apiTransactions'), {'symbol': 'AA'})
+        self.assertEqual([t['symbol'] for t in response.json()['transactions']], ["AAPL"])
+        self.assertIsNone(response.json()['older'])
+        etag = response['ETag']
+        self.assertEqual(self.client.get(reverse('apiTransactions'), {'symbol': 'AA'},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(reverse('apiTransactions'), {'symbol': 'MS'},
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        url = reverse('apiFavorites')
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        FavoriteStock.objects.create(user=self.portfolio.user, symbol="AAPL")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['favorites'][0]['ownedQuantity'], 10)
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        cache.clear()
+        self.portfolio = make_portfolio()
+        self.client.force_login(self.portfolio.user)
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        store_prices({"AAPL": Decimal('150.00')})
+
+    def _view(self):
+        before = dashboard_cache_metrics()
+        response = self.client.get(reverse('viewPortfolio'))
+        after = dashboard_cache_metrics()
+        outcome = 'hit' if after.get('hit', 0) > before.get('hit', 0) else 'miss'
+        return outcome, response.context['total_portfolio_value']
+
+    def test_invalidated_by_transactions_and_prices(self):
+        self.assertEqual(self._view(), ('miss', Decimal('1500.00')))
+        self.assertEqual(self._view(), ('hit', Decimal('1500.00')))
+
+        trade(self.portfolio, "AAPL", "Buy", 2, "100.00")
+        self.assertEqual(self._view(), ('miss', Decimal('1800.00')))
+
+        store_prices({"AAPL": Decimal('160.00')})
+        self.assertEqual(self._view(), ('miss', Decimal('1920.00')))
+
+        Transaction.objects.filter(quantity=2).delete()
+        self.assertEqual(self._view(), ('miss', Decimal('1600.00')))
+        self.assertEqual(self._view(), ('hit', Decimal('1600.00')))
+
+        # Prices of symbols outside the portfolio don't touch its entry.
+        store_prices({"MSFT": Decimal('300.00')})
+        self.assertEqual(self._view(), ('hit', Decimal('1600.00')))
+
+    @override_settings(STOCK_PRICE_FETCH_ON_REQUEST=True)
+    def test_live_fetch_is_reused(self):
+        trade(self.portfolio, "NVDA", "Buy", 1, "100.00")
+        self.assertEqual(self._view(), ('miss', Decimal('1604.00')))
+        self.assertEqual(self._view(), ('hit', Decimal('1604.00')))
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True)
+class AsyncPriceViewTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        cache.clear()
+        PROVIDER_CALLS.clear()
+        self.portfolio = make_portfolio()
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        trade(self.portfolio, "MSFT", "Buy", 2, "300.00")
+        FavoriteStock.objects.create(user=self.portfolio.user, symbol="NVDA")
+
+    def _request(self, path):
+        request = AsyncRequestFactory().get(path)
+        user = self.portfolio.user
+
+        async def auser():
+            return user
+        request.user, request.auser = user, auser
+        return request
+
+    async def test_views_match_sync_versions(self):
+        response = await views.viewPortfolioAsync(self._request('/view/'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "new EventSource", count=1)
+        self.assertEqual(len(PROVIDER_CALLS), 1)
+        summary = await sync_to_async(portfolio_summary)(self.portfolio)
+        self.assertIn(f"${summary['total_portfolio_value']}".encode(), response.content)
+
+        response = await views.favoriteStocksPageAsync(self._request('/favorite-stocks/'))
+        self.assertContains(response, "NVDA")
+        self.assertContains(response, "new EventSource", count=1)
+        favorites = await sync_to_async(favorites_summary)(self.portfolio.user, self.portfolio)
+        self.assertEqual(favorites['stock_data'][0]['current_price'], Decimal('104.00'))
+
+    async def test_async_fetch_matches_sync_and_coalesces(self):
+        prices, again = await asyncio.gather(aget_stock_prices(["AAPL", "BAD"]), aget_stock_prices(["aapl"]))
+        self.assertEqual(prices["AAPL"], again["AAPL"])
+        self.assertEqual(prices["BAD"], (Decimal(0), None))
+        # Whichever call claims a symbol first fetches it; the other waits for that fetch.
+        self.assertEqual(sorted(s for call in PROVIDER_CALLS for s in call), ["AAPL", "BAD"])
+        self.assertEqual(await sync_to_async(get_stock_prices)(["AAPL"]), {"AAPL": prices["AAPL"]})
+
+    @override_settings(STOCK_PRICE_PROVIDERS=[{'BACKEND': 'FinSight.tests.AsyncCountingProvider'}],
+                       STOCK_PRICE_ASYNC_CONCURRENCY=2, STOCK_PRICE_BATCH_SIZE=1)
+    async def test_semaphore_bounds_upstream_requests(self):
+        AsyncCountingProvider.peak = 0
+        prices = await aget_stock_prices([f"S{i}" for i in range(6)])
+        self.assertEqual(len(prices), 6)
+        self.assertEqual(AsyncCountingProvider.peak, 2)
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True, PERF_SERVER_TIMING=True)
+class PerformanceMetricsTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        cache.clear()
+        metrics.registry.clear()
+        self.portfolio = make_portfolio()
+        self.client.force_login(self.portfolio.user)
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+
+    def test_request_breakdown_and_prometheus_endpoint(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(reverse('viewPortfolio'))
+        timing = first['Server-Timing']
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        # The quote miss is fetched on the fetch pool and still counted for this request.
+        self.assertIn('desc="1 calls"', timing)
+        self.assertIn('cache-quotes;desc="0 hit, 1 miss"', timing)
+        self.assertIn('cache-dashboard;desc="0 hit, 1 miss"', timing)
+
+        second = self.client.get(reverse('viewPortfolio'))
+        self.assertIn('cache-quotes;desc="1 hit, 0 miss"', second['Server-Timing'])
+        self.assertIn('cache-dashboard;desc="1 hit, 0 miss"', second['Server-Timing'])
+        self.assertNotIn('upstream', second['Server-Timing'])
+
+        body = self.client.get(reverse('performanceMetrics')).content.decode()
+        self.assertIn('finsight_request_duration_seconds_count{view="viewPortfolio"} 2', body)
+        self.assertIn('finsight_upstream_call_seconds_count{view="viewPortfolio"} 1', body)
+        self.assertIn('finsight_requests_total{view="viewPortfolio",code="200"} 2', body)
+        self.assertIn('finsight_cache_requests_total{view="viewPortfolio",cache="dashboard",result="hit"} 1', body)
+        self.assertIn('finsight_quotes_total{source="live"}', body)
+        self.assertEqual(self.client.get(reverse('performanceMetrics'), REMOTE_ADDR='10.0.0.5').status_code, 404)
+
+    @override_settings(PERF_SERVER_TIMING=False)
+    def test_server_timing_is_optional(self):
+        self.assertNotIn('Server-Timing', self.client.get(reverse('viewPortfolio')))
+
+
+class PriceStreamTests(TestCase):
+    def test_one_poll_fans_out_and_conflates(self):
+        polls = []
+        prices = {"AAPL": 100, "MSFT": 200}
+
+        async def fetch(symbols):
+            polls.append(sorted(symbols))
+            return {s: {'price': str(prices[s])} for s in symbols}
+
+        async def scenario():
+            broker = PriceBroker(fetch=fetch, interval=3600)
+            streams = [event_stream(broker, ["AAPL"], heartbeat=1) for _ in range(50)]
+            for stream in streams:
+                self.assertTrue((await anext(stream)).startswith("retry:"))
+            slow = broker.subscribe(["AAPL", "MSFT"])
+            reader = anext(streams[0])
+            await asyncio.sleep(0)
+            first = await reader
+            # Unchanged prices are not sent again; changed ones replace what a slow reader has not taken.
+            broker.publish({"AAPL": {'price': "100"}})
+            broker.publish({"AAPL": {'price': "101"}})
+            batch = await slow.next_batch(1)
+            for stream in streams:
+                await stream.aclose()
+            broker.unsubscribe(slow)
+            return first, batch, slow.conflated, broker.subscribers
+
+        first, batch, conflated, subscribers = asyncio.run(scenario())
+        self.assertEqual(polls, [["AAPL", "MSFT"]])
+        self.assertEqual(json.loads(first.split("data: ")[1]), {"AAPL": {"price": "100"}})
+        self.assertEqual(json.loads(batch["AAPL"]), {"price": "101"})
+        self.assertEqual(conflated, 1)
+        self.assertEqual(subscribers, 0)
+
+    @override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS)
+    def test_wsgi_gets_snapshot(self):
+        quote_cache.clear()
+        portfolio = make_portfolio()
+        self.client.force_login(portfolio.user)
+        trade(portfolio, "AAPL", "Buy", 1, "100.00")
+        FavoriteStock.objects.create(user=portfolio.user, symbol="MSFT")
+        response = self.client.get(reverse('priceStream'))
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b"".join(response.streaming_content).decode()
+        self.assertTrue(body.startswith("retry: 300000\n"))
+        self.assertEqual(sorted(json.loads(body.split("data: ")[1])), ["AAPL", "MSFT"])
+        # WSGI pages don't subscribe at all.
+        self.assertNotContains(self.client.get(reverse('viewPortfolio')), "EventSource")
+        self.assertNotContains(self.client.get(reverse('favoriteStocksPage')), "EventSource")
+
+
+class PositionLoaderTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio()
+        quote_cache.clear()
+
+    def test_positions_single_query(self):
+        trade(self.portfolio, "AAPL", "Buy", 10, "100.00")
+        trade(self.portfolio, "AAPL", "Buy", 10, "200.00")
+        trade(self.portfolio, "AAPL", "Sell", 5, "250.00")
+
+        with self.assertNumQueries(1):
+            positions = self.portfolio.positions()
+        self.assertEqual(positions["AAPL"].owned_qty, 15)
+        self.assertEqual(positions["AAPL"].buy_qty, 20)
+        self.assertEqual(positions["AAPL"].avg_buy_price, Decimal('150'))
+
+    def _view_portfolio_queries(self, symbol_count):
+        for i in range(symbol_count):
+            symbol = f"S{i}"
+            trade(self.portfolio, symbol, "Buy", i + 1, "10.00")
+            cache_prices({symbol: (Decimal('12.00'), timezone.now())})
+        self.client.force_login(self.portfolio.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('viewPortfolio'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['stock_data']), symbol_count)
+        Transaction.objects.all().delete()
+        return len(ctx.captured_queries)
+
+    def test_view_portfolio_query_count_is_constant(self):
+        self.assertEqual(self._view_portfolio_queries(2), self._view_portfolio_queries(40))
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True)
+class BatchPriceTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        PROVIDER_CALLS.clear()
+
+    def test_misses_fetched_in_one_provider_call(self):
+        StockPriceCache.objects.create(ticker="BAD", last_price=Decimal('5.00'))
+
+        prices = get_stock_prices(["aapl", "MSFT", "BAD", "AAPL"])
+
+        self.assertEqual(PROVIDER_CALLS, [["AAPL", "MSFT", "BAD"]])
+        self.assertEqual(prices["AAPL"][0], Decimal(104))
+        self.assertEqual(prices["BAD"][0], Decimal('5.00'))
+        self.assertEqual(StockPriceCache.objects.get(ticker="MSFT").last_price, Decimal(104))
+
+    def test_cached_symbols_skip_provider(self):
+        get_stock_prices(["AAPL"])
+        with self.assertNumQueries(0):
+            prices = get_stock_prices(["AAPL"])
+        get_stock_prices(["AAPL", "IBM"])
+        self.assertEqual(PROVIDER_CALLS, [["AAPL"], ["IBM"]])
+        self.assertEqual(prices["AAPL"][0], Decimal(104))
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS)
+class PriceRefresherTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        PROVIDER_CALLS.clear()
+
+    def test_refresh_prioritises_popular_symbols(self):
+        first = make_portfolio("a@example.com")
+        second = make_portfolio("b@example.com")
+        trade(first, "MSFT", "Buy", 1, "10.00")
+        trade(second, "MSFT", "Buy", 1, "10.00")
+        trade(first, "AAPL", "Buy", 1, "10.00")
+        FavoriteStock.objects.create(user=second.user, symbol="AAPL")
+        FavoriteStock.objects.create(user=first.user, symbol="MSFT")
+        FavoriteStock.objects.create(user=first.user, symbol="BAD")
+
+        self.assertEqual(tracked_symbols(), [("AAPL", 2), ("MSFT", 2), ("BAD", 1)])
+
+        refreshed, failed = fetch_and_cache_all_prices(batch_size=2)
+        self.assertEqual(PROVIDER_CALLS, [["AAPL", "MSFT"], ["BAD"]])
+        self.assertEqual(refreshed, ["AAPL", "MSFT"])
+        self.assertEqual(failed, ["BAD"])
+
+        with override_settings(STOCK_PRICE_FETCH_ON_REQUEST=False):
+            quote_cache.clear()
+            prices = get_stock_prices(["AAPL", "BAD"])
+        self.assertEqual(prices["AAPL"][0], Decimal(104))
+        self.assertEqual(prices["BAD"], (Decimal(0), None))
+        self.assertEqual(len(PROVIDER_CALLS), 2)
+
+    def test_pages_read_stored_prices_but_trades_price_live(self):
+        StockPriceCache.objects.create(ticker="AAPL", last_price=Decimal('99.00'))
+
+        prices = get_stock_prices(["AAPL", "MSFT"])
+
+        self.assertEqual(PROVIDER_CALLS, [])
+        self.assertEqual(prices["AAPL"][0], Decimal('99.00'))
+        self.assertEqual(prices["MSFT"], (Decimal(0), None))
+        self.assertEqual(get_stock_price("MSFT")[0], Decimal(104))
+        self.assertEqual(PROVIDER_CALLS, [["MSFT"]])
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True)
+class CoalescedFetchTests(TransactionTestCase):
+    def setUp(self):
+        self.wait_for_fetches()  # fetches left running by earlier tests
+        quote_cache.clear()
+        PROVIDER_CALLS.clear()
+
+    def wait_for_fetches(self):
+        while _inflight:
+            time.sleep(0.01)
+
+    def test_concurrent_misses_share_one_fetch(self):
+        results = []
+
+        def request():
+            results.append(get_stock_prices(["HERD"], deadline=2)["HERD"][0])
+            connections.close_all()
+
+        threads = [threading.Thread(target=request) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(PROVIDER_CALLS, [["HERD"]])
+        self.assertEqual(results, [Decimal(104)] * 10)
+
+    def test_soft_expired_price_served_while_refreshing_once(self):
+        old = timezone.now() - timezone.timedelta(minutes=10)
+        quote_cache.set_many({cache_key("HERD"): (Decimal('90.00'), old, time.time() - 1)})
+
+        first = get_stock_prices(["HERD"])
+        second = get_stock_prices(["HERD"])
+        self.wait_for_fetches()
+
+        self.assertEqual(first["HERD"], (Decimal('90.00'), old))
+        self.assertEqual(second["HERD"], (Decimal('90.00'), old))
+        self.assertEqual(PROVIDER_CALLS, [["HERD"]])
+        self.assertEqual(get_stock_prices(["HERD"])["HERD"][0], Decimal(104))
+        self.assertEqual(StockPriceCache.objects.get(ticker="HERD").last_price, Decimal(104))
+
+    @override_settings(STOCK_PRICE_BATCH_SIZE=1)
+    def test_deadline_serves_last_known_price_as_stale(self):
+        StockPriceCache.objects.create(ticker="SLOW", last_price=Decimal('7.00'))
+        before = quote_metrics()
+
+        prices = get_stock_prices(["SLOW", "FAST"], deadline=0.1)
+
+        self.assertEqual(prices["SLOW"][0], Decimal('7.00'))
+        self.assertEqual(prices.stale, {"SLOW"})
+        self.assertEqual(prices["FAST"][0], Decimal(104))
+        after = quote_metrics()
+        self.assertEqual(after['stale'] - before.get('stale', 0), 1)
+        self.assertEqual(after['live'] - before.get('live', 0), 1)
+        self.wait_for_price("SLOW", Decimal(104))  # the late save, before the tables are flushed
+
+    def wait_for_price(self, symbol, price):
+        for _ in range(300):
+            if StockPriceCache.objects.get(ticker=symbol).last_price == price:
+                break
+            time.sleep(0.01)
+        self.assertEqual(StockPriceCache.objects.get(ticker=symbol).last_price, price)
+
+    def test_late_result_is_cached_and_stored(self):
+        StockPriceCache.objects.create(ticker="SLOW", last_price=Decimal('7.00'))
+
+        prices = get_stock_prices(["SLOW"], deadline=0.1)
+
+        self.assertEqual((prices["SLOW"][0], prices.stale), (Decimal('7.00'), {"SLOW"}))
+        # The fallback is not cached as a fresh quote...
+        self.assertEqual(quote_cache.get_many([cache_key("SLOW")]), {})
+        # ...the late answer is, and it reaches StockPriceCache too.
+        self.wait_for_price("SLOW", Decimal(104))
+        self.assertEqual(get_stock_prices(["SLOW"])["SLOW"][0], Decimal(104))
+        self.assertEqual(PROVIDER_CALLS, [["SLOW"]])
+
+    def test_late_result_waits_out_the_requests_lock(self):
+        StockPriceCache.objects.create(ticker="SLOW", last_price=Decimal('7.00'))
+
+        with db_transaction.atomic():
+            # The request still holds the write lock when the late answer arrives.
+            StockPriceCache.objects.filter(ticker="SLOW").update(last_price=Decimal('8.00'))
+            prices = get_stock_prices(["SLOW"], deadline=0.1)
+            time.sleep(0.7)
+        self.assertEqual(prices["SLOW"][0], Decimal('8.00'))
+        self.wait_for_price("SLOW", Decimal(104))
+
+
+class QuoteCacheTests(TestCase):
+    def test_l1_is_bounded(self):
+        worker = QuoteCache()
+        with override_settings(STOCK_PRICE_L1_MAX_ENTRIES=2):
+            worker.set_many({"a": 1, "b": 2, "c": 3})
+        self.assertEqual(list(worker._entries), ["b", "c"])
+        self.assertEqual(worker.get_many(["a", "c"]), {"a": 1, "c": 3})
+
+    def test_write_in_one_worker_invalidates_l1_of_another(self):
+        first, second = QuoteCache(), QuoteCache()
+        first.set_many({"k": "old"})
+        self.assertEqual(second.get_many(["k"]), {"k": "old"})
+
+        first.set_many({"k": "new"})
+        self.assertEqual(second.get_many(["k"]), {"k": "old"})
+        with override_settings(STOCK_PRICE_L1_VALIDATE_AFTER=0):
+            self.assertEqual(second.get_many(["k"]), {"k": "new"})
+
+    def test_only_shared_backends_with_atomic_add_lock_across_processes(self):
+        self.assertFalse(QuoteCache().atomic_add)
+        location = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, location, ignore_errors=True)
+        for backend in ('django.core.cache.backends.filebased.FileBasedCache',
+                        'django.core.cache.backends.redis.RedisCache'):
+            with override_settings(CACHES={'quotes': {'BACKEND': backend, 'LOCATION': location}}):
+                self.assertEqual(QuoteCache().atomic_add, backend.endswith('RedisCache'))
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS, STOCK_PRICE_FETCH_ON_REQUEST=True)
+class NegativeCacheTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        PROVIDER_CALLS.clear()
+
+    def test_backoff_grows_exponentially_with_jitter(self):
+        with override_settings(STOCK_PRICE_BACKOFF_BASE=10, STOCK_PRICE_BACKOFF_MAX=60):
+            for failures, full in [(1, 10), (2, 20), (3, 40), (4, 60), (8, 60)]:
+                self.assertTrue(full / 2 <= backoff_delay(failures) <= full)
+
+    def test_invalid_symbol_is_not_retried_during_backoff(self):
+        before = quote_failures().get("BAD", 0)
+        self.assertEqual(get_stock_prices(["BAD"])["BAD"], (Decimal(0), None))
+        self.assertEqual(get_stock_prices(["BAD"])["BAD"], (Decimal(0), None))
+        self.assertEqual(PROVIDER_CALLS, [["BAD"]])
+        self.assertEqual(quote_failures()["BAD"] - before, 1)
+
+    def test_add_favorite_rejects_invalid_symbol(self):
+        portfolio = make_portfolio()
+        self.client.force_login(portfolio.user)
+        self.client.post(reverse('addFavoriteStock'), {'symbol': 'bad'})
+        self.client.post(reverse('addFavoriteStock'), {'symbol': 'aapl'})
+
+        self.assertEqual(list(FavoriteStock.objects.values_list('symbol', flat=True)), ["AAPL"])
+        self.assertEqual(PROVIDER_CALLS, [["BAD"], ["AAPL"]])
+
+
+class ProviderChainTests(TestCase):
+    def setUp(self):
+        PROVIDER_CALLS.clear()
+
+    def test_chain_follows_the_settings(self):
+        chain = get_provider_chain()
+        self.assertIs(get_provider_chain(), chain)
+        with self.settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS):
+            self.assertIsNot(get_provider_chain(), chain)
+        # Rebuilt from the values alone: no setting_changed receiver needed.
+        setting_changed.disconnect(fresh_provider_chain)
+        self.addCleanup(setting_changed.connect, fresh_provider_chain)
+        with self.settings(STOCK_PRICE_CIRCUIT_BREAKER={'failure_threshold': 1, 'reset_timeout': 1}):
+            self.assertEqual(get_provider_chain().providers[0][1].failure_threshold, 1)
+        self.assertEqual(get_provider_chain().providers[0][1].failure_threshold, chain.providers[0][1].failure_threshold)
+
+    def test_fake_provider_is_deterministic(self):
+        provider = FakeProvider(invalid_symbols=["NOPE"])
+        today = timezone.now().date()
+        bars = provider.get_daily_history("AAPL", today - timezone.timedelta(days=30), today)
+        self.assertEqual(bars, provider.get_daily_history("AAPL", today - timezone.timedelta(days=30), today))
+        self.assertEqual(provider.get_quotes(["AAPL", "NOPE", "not a ticker"]),
+                         {"AAPL": Decimal(str(FakeProvider.close_on("AAPL", today)))})
+
+    def test_failover_and_circuit_breaker(self):
+        chain = ProviderChain([BrokenProvider(), RecordingProvider()], failure_threshold=2, reset_timeout=60)
+        for _ in range(3):
+            self.assertEqual(chain.get_quotes(["AAPL"]), {"AAPL": Decimal(104)})
+        # The broken provider is skipped once its circuit opens.
+        self.assertEqual([call[0] for call in PROVIDER_CALLS], ["broken", "AAPL", "broken", "AAPL", "AAPL"])
+
+    def test_open_circuit_fails_fast(self):
+        chain = ProviderChain([BrokenProvider()], failure_threshold=1, reset_timeout=60)
+        with self.assertRaises(ProviderUnavailable):
+            chain.get_quotes(["AAPL"])
+        started = time.monotonic()
+        with self.assertRaises(ProviderUnavailable):
+            chain.get_quotes(["AAPL"])
+        self.assertLess(time.monotonic() - started, 0.01)
+        self.assertEqual(len(PROVIDER_CALLS), 1)
+
+    def test_cancelled_trial_call_lets_the_next_one_through(self):
+        class HangingProvider(FakeProvider):
+            async def aget_quotes(self, symbols):
+                await asyncio.sleep(10)
+
+        chain = ProviderChain([HangingProvider()], failure_threshold=1, reset_timeout=0)
+        breaker = chain.providers[0][1]
+        breaker.record_failure()
+        with self.assertRaises(asyncio.TimeoutError):
+            async_to_sync(asyncio.wait_for)(chain.aget_quotes(["AAPL"]), 0.05)
+        self.assertEqual(breaker.allow(), 'half-open')
+
+    def test_connect_and_read_timeouts_are_both_passed(self):
+        provider = FakeProvider(connect_timeout=1.5, read_timeout=4)
+        self.assertEqual(provider.timeout, (1.5, 4))
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=[{'BACKEND': 'FinSight.providers.FakeProvider'}])
+class PriceHistoryStoreTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PriceHistoryStore(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_backfill_then_append_incrementally(self):
+        today = timezone.now().date()
+        update_history(["AAPL"], years=1, store=self.store)
+        rows = self.store.rows("AAPL")
+        self.assertGreater(rows, 250)
+        self.assertEqual(update_history(["AAPL"], years=1, store=self.store), {"AAPL": 0})
+
+        index = PriceHistory.objects.get(symbol="AAPL")
+        self.assertEqual(index.rows, rows)
+        self.assertEqual(index.last_date, self.store.last_date("AAPL"))
+        self.assertLessEqual(index.last_date, today)
+
+    def test_range_read_is_a_view(self):
+        bars = FakeProvider().get_daily_history("MSFT", date(2024, 1, 1), date(2024, 3, 31))
+        self.store.append("MSFT", bars[:20])
+        self.store.append("MSFT", bars)
+
+        window = self.store.read("MSFT", date(2024, 2, 1), date(2024, 2, 29), columns=['date', 'close'])
+        expected = [bar for bar in bars if date(2024, 2, 1) <= bar[0] <= date(2024, 2, 29)]
+        self.assertEqual(self.store.rows("MSFT"), len(bars))
+        self.assertEqual(list(window['close']), [bar[4] for bar in expected])
+        self.assertFalse(window['close'].flags.owndata)
+
+    def test_maps_only_requested_columns_within_a_bound(self):
+        store = PriceHistoryStore(self.tmp.name, max_open_maps=10)
+        bars = FakeProvider().get_daily_history("MSFT", date(2024, 1, 1), date(2024, 1, 31))
+        symbols = [f"S{i}" for i in range(20)]
+        for symbol in symbols:
+            store.append(symbol, bars)
+        fds = len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else None
+
+        for symbol in symbols:
+            self.assertEqual(list(store.read(symbol, columns=['date', 'close'])['close']), [bar[4] for bar in bars])
+
+        self.assertEqual(len(store._maps), 10)
+        self.assertEqual({column for _, column in store._maps}, {'date', 'close'})
+        self.assertEqual([symbol for symbol, _ in store._maps][-2:], ["S19", "S19"])
+        if fds is not None:
+            self.assertLessEqual(len(os.listdir('/proc/self/fd')), fds + 10)
+
+
+class PortfolioTimeseriesTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PriceHistoryStore(self.tmp.name)
+        self.portfolio = make_portfolio(cash=Decimal('1000.00'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_value_cash_and_pnl_follow_trades_and_closes(self):
+        monday = date(2024, 3, 4)
+        self.store.append("AAPL", [(monday + timedelta(days=i), 0, 0, 0, 10.0 + i, 0) for i in range(5)])
+        buy = trade(self.portfolio, "AAPL", "Buy", 10, "10.00")
+        sell = trade(self.portfolio, "AAPL", "Sell", 4, "12.00")
+        Transaction.objects.filter(pk=buy.pk).update(date=timezone.make_aware(timezone.datetime(2024, 3, 4, 15)))
+        Transaction.objects.filter(pk=sell.pk).update(date=timezone.make_aware(timezone.datetime(2024, 3, 6, 15)))
+
+        series = portfolio_timeseries(self.portfolio, end=date(2024, 3, 8), store=self.store)
+
+        self.assertEqual(series['dates'].astype(str).tolist(),
+                         ["2024-03-04", "2024-03-05", "2024-03-06", "2024-03-07", "2024-03-08"])
+        self.assertEqual(series['value'].tolist(), [100.0, 110.0, 72.0, 78.0, 84.0])
+        self.assertEqual(series['cash'].tolist(), [952.0, 952.0, 1000.0, 1000.0, 1000.0])
+        self.assertEqual(series['invested'].tolist(), [100.0, 100.0, 52.0, 52.0, 52.0])
+        self.assertEqual(series['pnl'].tolist(), [0.0, 10.0, 20.0, 26.0, 32.0])
+
+    def test_trades_after_end_are_left_out(self):
+        monday = date(2024, 3, 4)
+        self.store.append("AAPL", [(monday + timedelta(days=i), 0, 0, 0, 10.0 + i, 0) for i in range(10)])
+        early = trade(self.portfolio, "AAPL", "Buy", 10, "10.00")
+        late = trade(self.portfolio, "AAPL", "Buy", 90, "11.00")
+        Transaction.objects.filter(pk=early.pk).update(date=timezone.make_aware(timezone.datetime(2024, 3, 4, 15)))
+        Transaction.objects.filter(pk=late.pk).update(date=timezone.make_aware(timezone.datetime(2024, 3, 11, 15)))
+
+        series = portfolio_timeseries(self.portfolio, end=date(2024, 3, 8), store=self.store)
+
+        self.assertEqual(series['dates'][-1], np.datetime64('2024-03-08'))
+        self.assertEqual(series['value'].tolist(), [100.0, 110.0, 120.0, 130.0, 140.0])
+        self.assertEqual(series['invested'].tolist(), [100.0] * 5)
+        # Today's 1000.00 minus nothing earlier, plus the 990.00 the later buy spent.
+        self.assertEqual(series['cash'].tolist(), [1990.0] * 5)
+        self.assertEqual(portfolio_timeseries(self.portfolio, end=date(2024, 3, 1), store=self.store)['symbols'], [])
+
+    def test_json_endpoint(self):
+        self.client.force_login(self.portfolio.user)
+        response = self.client.get(reverse('portfolioTimeseries'))
+        self.assertEqual(response.json(), {'dates': [], 'value': [], 'cash': [], 'invested': [], 'pnl': []})
+        self.assertEqual(self.client.get(reverse('portfolioTimeseries'), {'start': 'x'}).status_code, 400)
+
+
+class RiskAnalyticsTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = PriceHistoryStore(self.tmp.name)
+        self.portfolio = make_portfolio()
+        cache.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_metrics_match_naive_computation(self):
+        rng = np.random.default_rng(3)
+        returns = rng.normal(0.0005, 0.01, size=(250, 3))
+        benchmark = returns @ [0.5, 0.3, 0.2] + rng.normal(0, 0.002, size=250)
+        weights = np.array([0.6, 0.3, 0.1])
+
+        metrics = risk_metrics(returns, weights, benchmark=benchmark, confidence=0.95, risk_free_rate=0.02)
+
+        portfolio = [sum(w * r for w, r in zip(weights, day)) for day in returns]
+        mean = sum(portfolio) / len(portfolio)
+        std = (sum((r - mean) ** 2 for r in portfolio) / (len(portfolio) - 1)) ** 0.5
+        self.assertAlmostEqual(metrics['volatility'], std * 252 ** 0.5)
+        self.assertAlmostEqual(metrics['sharpe'], (mean - 0.02 / 252) / std * 252 ** 0.5)
+        peak, value, worst = 1.0, 1.0, 0.0
+        for r in portfolio:
+            value *= 1 + r
+            peak = max(peak, value)
+            worst = max(worst, 1 - value / peak)
+        self.assertAlmostEqual(metrics['max_drawdown'], worst)
+        self.assertAlmostEqual(metrics['var_historical'], -np.percentile(portfolio, 5))
+        self.assertAlmostEqual(metrics['var_parametric'], -(mean - 1.6448536269514722 * std))
+        covariance = np.cov(portfolio, benchmark)
+        self.assertAlmostEqual(metrics['beta'], covariance[0, 1] / covariance[1, 1])
+        np.testing.assert_allclose(metrics['correlation'], np.corrcoef(returns, rowvar=False))
+        for column in range(3):
+            pair = np.cov(returns[:, column], benchmark)
+            self.assertAlmostEqual(metrics['symbol_beta'][column], pair[0, 1] / pair[1, 1])
+
+    def test_portfolio_risk_from_stored_closes(self):
+        days = business_days(date(2024, 1, 1), date(2024, 6, 28))
+        rng = np.random.default_rng(5)
+        market = rng.normal(0.0005, 0.01, size=len(days) - 1)
+        spy = 400 * np.cumprod(np.r_[1, 1 + market])
+        aapl = 150 * np.cumprod(np.r_[1, 1 + 2 * market])  # twice the benchmark's daily moves
+        msft = 300 * np.cumprod(np.r_[1, 1 + rng.normal(0, 0.01, size=len(days) - 1)])
+        for symbol, closes in (("SPY", spy), ("AAPL", aapl), ("MSFT", msft)):
+            self.store.append(symbol, [(day, 0, 0, 0, close, 0) for day, close in zip(days.astype(date), closes)])
+        trade(self.portfolio, "AAPL", "Buy", 10, "150.00")
+        trade(self.portfolio, "MSFT", "Buy", 5, "300.00")
+        trade(self.portfolio, "NVDA", "Buy", 1, "100.00")
+
+        risk = portfolio_risk(self.portfolio, end=date(2024, 6, 28), store=self.store)
+
+        self.assertTrue(risk['available'])
+        self.assertEqual((risk['symbols'], risk['missing'], risk['benchmark']), (["AAPL", "MSFT"], ["NVDA"], "SPY"))
+        self.assertEqual(risk['observations'], len(days) - 1)
+        self.assertEqual(risk['end'], "2024-06-28")
+        self.assertAlmostEqual(risk['symbol_beta'][0], 2.0, places=4)
+        self.assertAlmostEqual(risk['value'], aapl[-1] * 10 + msft[-1] * 5, places=2)
+        self.assertAlmostEqual(sum(risk['weights']), 1.0, places=5)
+        self.assertEqual(risk['correlation'][0][0], 1.0)
+        self.assertEqual(risk['correlation'][0][1], risk['correlation'][1][0])
+        self.assertGreater(risk['var_historical'], 0)
+        self.assertAlmostEqual(risk['var_historical_amount'], risk['var_historical'] * risk['value'], places=0)
+
+    def test_too_little_history_is_not_available(self):
+        trade(self.portfolio, "AAPL", "Buy", 1, "10.00")
+        risk = portfolio_risk(self.portfolio, end=date(2024, 6, 28), store=self.store)
+        self.assertEqual(risk, {'available': False, 'benchmark': None, 'confidence': 0.95, 'observations': 0,
+                                'symbols': [], 'missing': ["AAPL"]})
+
+    def test_cached_until_portfolio_or_history_changes(self):
+        trade(self.portfolio, "AAPL", "Buy", 10, "150.00")
+        with override_settings(PRICE_HISTORY_DIR=self.tmp.name, STOCK_PRICE_PROVIDERS=BENCHMARK_PROVIDERS):
+            update_history(["AAPL", "SPY"], years=1)
+
+            def lookup():
+                self.portfolio.refresh_from_db()
+                with CaptureQueriesContext(connection) as captured:
+                    risk = cached_portfolio_risk(self.portfolio)
+                return risk, len(captured)
+
+            first, queries = lookup()
+            self.assertTrue(first['available'])
+            self.assertEqual(first['end'], str(PriceHistory.objects.get(symbol="AAPL").last_date))
+            self.assertEqual(queries, 2)
+            self.assertEqual(lookup(), (first, 1))  # only the history stamp
+
+            trade(self.portfolio, "MSFT", "Buy", 1, "300.00")
+            second, queries = lookup()
+            self.assertEqual((second['missing'], queries), (["MSFT"], 2))
+
+            PriceHistory.objects.filter(symbol="SPY").update(updated_at=timezone.now() + timedelta(seconds=1))
+            self.assertEqual(lookup()[1], 2)
+
+    def test_json_endpoint(self):
+        self.client.force_login(self.portfolio.user)
+        self.assertFalse(self.client.get(reverse('portfolioRisk')).json()['available'])
+
+
+@override_settings(STOCK_PRICE_PROVIDERS=BENCHMARK_PROVIDERS)
+class BenchmarkTests(TestCase):
+    def setUp(self):
+        quote_cache.clear()
+        cache.clear()
+        reset_index()
+        self.addCleanup(reset_index)
+
+    def test_dataset_is_deterministic_and_consistent(self):
+        first = generate_dataset(users=2, transactions=40, favorites=3, seed=7, prefix='a')
+        generate_dataset(users=2, transactions=40, favorites=3, seed=7, prefix='b')
+
+        def ledger(prefix):
+            return list(Transaction.objects.filter(portfolio__user__username__startswith=prefix)
+                        .order_by('portfolio__user__username', 'date', 'id')
+                        .values_list('stockSymbol', 'transactionType', 'quantity', 'pricePerShare'))
+
+        self.assertEqual(first.transactions, 80)
+        self.assertEqual(ledger('a'), ledger('b'))
+        self.assertEqual(FavoriteStock.objects.filter(user=first.users[0]).count(), 3)
+        portfolio = Portfolio.objects.get(user=first.users[0])
+        for holding in Holding.objects.filter(portfolio=portfolio):
+            self.assertGreaterEqual(holding.quantity, 0)
+            self.assertEqual(holding.quantity, Transaction.getOwnedShares(portfolio, holding.stockSymbol))
+        self.assertEqual(set(portfolio.diversification), set(
+            Holding.objects.filter(portfolio=portfolio, quantity__gt=0).values_list('stockSymbol', flat=True)))
+
+    def test_run_scenarios_reports_percentiles_and_queries(self):
+        dataset = generate_dataset(users=2, transactions=20, favorites=2)
+        results = run_scenarios(dataset.users, iterations=3, rounds=2)
+        self.assertEqual(set(results), {'viewPortfolio', 'viewTransactions', 'favoriteStocksPage',
+                                        'downloadTransactionsCSV', 'update_diversification', 'addTransaction'})
+        for stats in results.values():
+            self.assertLessEqual(stats['p50_ms'], stats['p99_ms'])
+            self.assertGreater(stats['queries'], 0)
+
+    def test_compare_to_baseline(self):
+        baseline = {'view': {'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4}}
+        self.assertEqual(compare_to_baseline({'view': {'p50_ms': 11.5, 'p95_ms': 23.0, 'queries': 4}}, baseline), [])
+        regressions = compare_to_baseline({'view': {'p50_ms': 13.0, 'p95_ms': 30.0, 'queries': 5},
+                                           'new': {'p50_ms': 1.0, 'p95_ms': 1.0, 'queries': 1}}, baseline)
+        self.assertEqual(regressions, ["view: p50_ms 10.00 -> 13.00 (+30%)", "view: p95_ms 20.00 -> 30.00 (+50%)",
+                                       "view: queries 4 -> 5"])
+        # A slower tail alone is a regression too.
+        self.assertEqual(compare_to_baseline({'view': {'p50_ms': 10.0, 'p95_ms': 26.0, 'queries': 4}}, baseline),
+                         ["view: p95_ms 20.00 -> 26.00 (+30%)"])
+        # Tiny absolute changes are noise even when large in relative terms.
+        self.assertEqual(compare_to_baseline({'view': {'p50_ms': 0.9, 'p95_ms': 1.0, 'queries': 1}},
+                                             {'view': {'p50_ms': 0.3, 'p95_ms': 0.4, 'queries': 1}}), [])
+
+
+class OrderBookingTests(TestCase):
+    def setUp(self):
+        self.portfolio = make_portfolio(cash=Decimal('1000.00'))
+
+    def test_buy_and_sell_move_cash_holdings_and_lots(self):
+        book_order(self.portfolio, "AAPL", "Apple", "Buy", 5, Decimal('100.00'))
+        book_order(self.portfolio, "AAPL", "Apple", "Sell", 2, Decimal('120.00'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cashBalance, Decimal('740.00'))
+        self.assertEqual(self.portfolio.version, 2)
+        self.assertEqual(self.portfolio.diversification, {"AAPL": 100.0})
+        holding = Holding.objects.get(portfolio=self.portfolio, stockSymbol="AAPL")
+        self.assertEqual((holding.quantity, holding.openCost, holding.realizedPnl),
+                         (3, Decimal('300.0000'), Decimal('40.0000')))
+        self.assertEqual(TaxLot.objects.get(portfolio=self.portfolio).openQuantity, 3)
+
+    def test_rejections_write_nothing(self):
+        with self.assertRaisesMessage(OrderRejected, "Insufficient cash balance to buy 11 shares of AAPL."):
+            book_order(self.portfolio, "AAPL", "Apple", "Buy", 11, Decimal('100.00'))
+        with self.assertRaisesMessage(OrderRejected, "Cannot sell 1 shares of MSFT. You own 0."):
+            book_order(self.portfolio, "MSFT", "Microsoft", "Sell", 1, Decimal('100.00'))
+        with self.assertRaisesMessage(OrderRejected, "Quantity must be a positive number of shares, not -5."):
+            book_order(self.portfolio, "AAPL", "Apple", "Sell", -5, Decimal('100.00'))
+        with self.assertRaisesMessage(OrderRejected, "Quantity must be a positive number of shares, not 0."):
+            book_order(self.portfolio, "AAPL", "Apple", "Buy", 0, Decimal('100.00'))
+        with self.assertRaisesMessage(OrderRejected, "Price per share must be positive, not 0."):
+            book_order(self.portfolio, "AAPL", "Apple", "Buy", 1, 0)
+        self.assertFalse(Transaction.objects.exists())
+        self.assertFalse(Holding.objects.exists())
+        self.portfolio.refresh_from_db()
+        self.assertEqual((self.portfolio.cashBalance, self.portfolio.version), (Decimal('1000.00'), 0))
+
+    def test_stale_portfolio_instances_do_not_lose_debits(self):
+        # Two requests that loaded the portfolio before either booked.
+        first, second = Portfolio.objects.get(pk=self.portfolio.pk), Portfolio.objects.get(pk=self.portfolio.pk)
+        book_order(first, "AAPL", "Apple", "Buy", 6, Decimal('100.00'))
+        with self.assertRaises(OrderRejected):
+            book_order(second, "MSFT", "Microsoft", "Buy", 6, Decimal('100.00'))
+        book_order(second, "MSFT", "Microsoft", "Buy", 4, Decimal('100.00'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cashBalance, Decimal('0.00'))
+        self.assertEqual(self.portfolio.diversification, {"AAPL": 60.0, "MSFT": 40.0})
+
+    def test_booking_writes_the_portfolio_row_once(self):
+        book_order(self.portfolio, "AAPL", "Apple", "Buy", 1, Decimal('100.00'))
+        with CaptureQueriesContext(connection) as queries:
+            book_order(self.portfolio, "AAPL", "Apple", "Buy", 1, Decimal('100.00'))
+        portfolio_writes = [q['sql'] for q in queries if q['sql'].startswith('UPDATE "FinSight_portfolio"')]
+        self.assertEqual(len(portfolio_writes), 1)
+        self.assertLessEqual(len(queries), 8)  # savepoint and release included
+
+    @override_settings(STOCK_PRICE_PROVIDERS=FAKE_PROVIDERS)
+    def test_add_transaction_view(self):
+        quote_cache.clear()
+        self.client.force_login(self.portfolio.user)
+        form = {'stockSymbol': 'aapl', 'stockName': 'Apple', 'transactionType': 'Buy', 'quantity': 2, 'note': ''}
+        self.assertRedirects(self.client.post(reverse('addTransaction'), form), reverse('viewTransactions'))
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cashBalance, Decimal('1000.00') - 2 * Decimal(104))
+        response = self.client.post(reverse('addTransaction'), dict(form, transactionType='Sell', quantity=3))
+        self.assertRedirects(response, reverse('addTransaction'), fetch_redirect_response=False)
+        for quantity in ('', 'two', '-1'):
+            response = self.client.post(reverse('addTransaction'), dict(form, quantity=quantity))
+            self.assertRedirects(response, reverse('addTransaction'), fetch_redirect_response=False)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class ConcurrentOrderTests(TransactionTestCase):
+    def test_concurrent_submitters_stay_consistent(self):
+        portfolio = make_portfolio(cash=Decimal('1000.00'))
+        book_order(portfolio, "AAPL", "Apple", "Buy", 4, Decimal('100.00'))
+        outcomes = []
+        start = threading.Barrier(12)
+
+        def submit(transactionType):
+            # Each request loads its own (soon stale) copy of the portfolio.
+            own = Portfolio.objects.get(pk=portfolio.pk)
+            start.wait()
+            try:
+                while True:
+                    try:
+                        book_order(own, "AAPL", "Apple", transactionType, 2, Decimal('100.00'))
+                        outcomes.append((transactionType, True))
+                        break
+                    except OrderRejected:
+                        outcomes.append((transactionType, False))
+                        break
+                    except OperationalError:
+                        # The shared-cache test database reports table locks
+                        # at once instead of waiting out busy_timeout.
+                        time.sleep(0.001)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=submit, args=("Buy" if i % 3 else "Sell",)) for i in range(12)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        booked = {kind: sum(ok for k, ok in outcomes if k == kind) for kind in ("Buy", "Sell")}
+        self.assertEqual(len(outcomes), 12)
+        self.assertGreater(booked["Buy"], 0)
+        portfolio.refresh_from_db()
+        quantity = 4 + 2 * (booked["Buy"] - booked["Sell"])
+        self.assertEqual(portfolio.cashBalance, Decimal('1000.00') - 100 * quantity)
+        self.assertGreaterEqual(portfolio.cashBalance, 0)
+        self.assertEqual(portfolio.version, 1 + sum(booked.values()))
+        holding = Holding.objects.get(portfolio=portfolio, stockSymbol="AAPL")
+        self.assertEqual(holding.quantity, quantity)
+        self.assertEqual(sum(TaxLot.objects.filter(portfolio=portfolio).values_list('openQuantity', flat=True)),
+                         quantity)
+        self.assertEqual(Transaction.objects.filter(portfolio=portfolio).count(), 1 + sum(booked.values()))
+
+
+class DatabaseProfileTests(TestCase):
+    def test_pragmas_applied_to_new_connections(self):
+        self.assertEqual(connection.connection.execute("PRAGMA busy_timeout").fetchone()[0], 20000)
+        self.addCleanup(connection.connection.execute, "PRAGMA cache_size = -2000")  # SQLite's default
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+            apply_sqlite_pragmas(sender=None, connection=connection)
+        self.assertEqual(connection.connection.execute("PRAGMA cache_size").fetchone()[0], -1234)
+
+    def test_router_sends_only_marked_reads_to_the_read_alias(self):
+        router = DashboardRouter()
+        # No read alias configured: everything stays on default.
+        with dashboard_reads():
+            self.assertIsNone(router.db_for_read(Holding))
+        with override_settings(DASHBOARD_READ_DATABASE='default'):
+            self.assertIsNone(router.db_for_read(Holding))
+            with dashboard_reads():
+                self.assertEqual(router.db_for_read(Holding), 'default')
+                self.assertEqual(async_to_sync(sync_to_async(router.db_for_read))(Holding), 'default')
+                self.assertEqual(router.db_for_write(Holding), 'default')
+            self.assertFalse(router.allow_migrate('default', 'FinSight'))
+        self.assertIsNone(router.allow_migrate('default', 'FinSight'))
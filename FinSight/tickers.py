@@ -0,0 +1,180 @@
+import csv
+import re
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Ticker
+
+BUNDLED_CSV = Path(__file__).resolve().parent / 'data' / 'tickers.csv'
+DEFAULT_INDEX_TTL = 3600  # seconds before the in-memory index is rebuilt from the table
+DEFAULT_LIMIT = 10
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class TickerIndex:
+    """
+    Prefix index over symbols and company names held as sorted arrays, so a
+    lookup is two binary searches plus the matches. Names are indexed by
+    their full lower-cased text and by each word, so "micro" finds both
+    Microsoft and Advanced Micro Devices.
+    """
+
+    def __init__(self, rows):
+        self.names = dict(rows)  # symbol -> name
+        self.symbols = sorted(self.names)
+        entries = set()
+        for symbol, name in self.names.items():
+            text = name.lower()
+            entries.add((text, symbol))
+            for word in WORD_RE.findall(text):
+                entries.add((word, symbol))
+        entries = sorted(entries)
+        self.name_keys = [key for key, _ in entries]
+        self.name_symbols = [symbol for _, symbol in entries]
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self.names
+
+    @staticmethod
+    def _prefix_range(keys, prefix):
+        lo = bisect_left(keys, prefix)
+        hi = bisect_left(keys, prefix + '\uffff', lo)
+        return lo, hi
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Symbols starting with query first (exact match on top), then
+        companies whose name or a word of it starts with query.
+        Returns list of (symbol, name)
+        """
+        query = query.strip()
+        if not query:
+            return []
+        found = []
+        upper = query.upper()
+        if upper in self.names:
+            found.append(upper)
+        lo, hi = self._prefix_range(self.symbols, upper)
+        for symbol in self.symbols[lo:min(hi, lo + limit + 1)]:
+            if symbol != upper:
+                found.append(symbol)
+
+        if len(found) < limit:
+            lo, hi = self._prefix_range(self.name_keys, query.lower())
+            seen = set(found)
+            for symbol in self.name_symbols[lo:hi]:
+                if symbol not in seen:
+                    seen.add(symbol)
+                    found.append(symbol)
+                    if len(found) >= limit:
+                        break
+        return [(symbol, self.names[symbol]) for symbol in found[:limit]]
+
+
+_index = None
+_built_at = 0
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The process-wide index, rebuilt from the Ticker table every
+    TICKER_INDEX_TTL seconds. An empty directory is re-read on every call so
+    a first load_tickers run is picked up at once.
+    """
+    global _index, _built_at
+
+    def stale():
+        return _index is None or not len(_index) or time.monotonic() - _built_at > ttl
+
+    ttl = getattr(settings, 'TICKER_INDEX_TTL', DEFAULT_INDEX_TTL)
+    if stale():
+        with _index_lock:
+            if stale():
+                _index = TickerIndex(Ticker.objects.filter(active=True).values_list('symbol', 'name'))
+                _built_at = time.monotonic()
+    return _index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def search_tickers(query, limit=DEFAULT_LIMIT):
+    return get_index().search(query, limit)
+
+
+def is_known_symbol(symbol):
+    """
+    True/False from the local directory, or None when no directory has been
+    loaded and the caller has to ask a quote provider instead.
+    """
+    index = get_index()
+    if not len(index):
+        return None
+    return symbol in index
+
+
+def company_name(symbol):
+    return get_index().names.get(symbol, '')
+
+
+def read_ticker_csv(f):
+    """
+    Yield (symbol, name, exchange) from a CSV with Symbol and Name columns
+    (Exchange optional). Pipe-delimited exchange listings such as
+    nasdaqlisted.txt (Symbol|Security Name|...) are accepted too.
+    """
+    first = f.readline()
+    delimiter = '|' if '|' in first else ','
+    header = [column.strip().lower() for column in next(csv.reader([first], delimiter=delimiter))]
+    name_column = 'name' if 'name' in header else 'security name'
+    for row in csv.reader(f, delimiter=delimiter):
+        record = dict(zip(header, row))
+        symbol = (record.get('symbol') or record.get('act symbol') or '').strip().upper()
+        # Exchange listings end with a "File Creation Time" footer and mark dummy test issues.
+        if not symbol or len(symbol) > 10 or record.get('test issue', 'N') == 'Y':
+            continue
+        yield symbol, (record.get(name_column) or symbol).strip()[:200], (record.get('exchange') or '').strip()[:20]
+
+
+def load_tickers(f, deactivate_missing=False, batch_size=1000):
+    """
+    Upsert the directory from an open CSV file. Returns tuple: (loaded, deactivated)
+    """
+    started = timezone.now()
+    seen = set()
+    batch = []
+    loaded = 0
+    for symbol, name, exchange in read_ticker_csv(f):
+        if symbol in seen:
+            continue
+        seen.add(symbol)
+        batch.append(Ticker(symbol=symbol, name=name, exchange=exchange, active=True))
+        if len(batch) >= batch_size:
+            loaded += _upsert(batch)
+            batch = []
+    loaded += _upsert(batch)
+
+    deactivated = 0
+    if deactivate_missing and seen:
+        # Every row in the file was just stamped, so older rows were not in it.
+        deactivated = Ticker.objects.filter(active=True, updated_at__lt=started).update(active=False)
+    reset_index()
+    return loaded, deactivated
+
+
+def _upsert(tickers):
+    Ticker.objects.bulk_create(tickers, update_conflicts=True, unique_fields=['symbol'],
+                               update_fields=['name', 'exchange', 'active', 'updated_at'])
+    return len(tickers)
@@ -0,0 +1,119 @@
+from datetime import date
+
+import numpy as np
+from django.utils import timezone
+
+from .models import Transaction
+from .price_history import get_store
+
+
+def business_days(start, end):
+    """
+    Weekdays from start to end inclusive as datetime64[D].
+    """
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    return days[np.is_busday(days)]
+
+
+def forward_fill(matrix):
+    """
+    Replace NaNs in each column with the last value above them (in place).
+    """
+    rows = np.arange(matrix.shape[0])[:, None]
+    last_seen = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(last_seen, axis=0, out=last_seen)
+    matrix[:] = np.take_along_axis(matrix, last_seen, axis=0)
+    return matrix
+
+
+def close_matrix(symbols, calendar, store=None):
+    """
+    Closing prices aligned to calendar, one column per symbol. Days without a
+    bar carry the previous close; days before a symbol's first bar are NaN.
+    Returns np.ndarray of shape (len(calendar), len(symbols))
+    """
+    store = store or get_store()
+    closes = np.full((len(calendar), len(symbols)), np.nan)
+    if not len(calendar):
+        return closes
+    for column, symbol in enumerate(symbols):
+        bars = store.read(symbol, end=calendar[-1].astype(date), columns=['date', 'close'])
+        if not len(bars['date']):
+            continue
+        index = np.searchsorted(bars['date'], calendar, side='right') - 1
+        known = index >= 0
+        closes[known, column] = bars['close'][index[known]]
+    return closes
+
+
+def build_timeseries(calendar, symbols, day_index, symbol_index, signed_qty, trade_prices, flows,
+                     cash_balance, closes):
+    """
+    Daily portfolio series from per-transaction arrays, entirely in NumPy.
+
+    day_index / symbol_index locate each transaction in the (dates x symbols)
+    grid, signed_qty is +quantity for buys and -quantity for sells, flows is
+    the cash effect (-total for buys, +total for sells) and cash_balance the
+    cash at the last calendar day. Where closes has no price yet, the last trade price is used.
+    Returns dict of np.ndarray: value, cash, invested, pnl
+    """
+    days, width = len(calendar), len(symbols)
+    positions = np.zeros((days, width))
+    np.add.at(positions, (day_index, symbol_index), signed_qty)
+    np.cumsum(positions, axis=0, out=positions)
+
+    traded = np.full((days, width), np.nan)
+    traded[day_index, symbol_index] = trade_prices
+    prices = np.where(np.isnan(closes), forward_fill(traded), closes)
+    value = np.nansum(positions * prices, axis=1)
+
+    cumulative_flow = np.cumsum(np.bincount(day_index, weights=flows, minlength=days))
+    cash = cash_balance - cumulative_flow[-1] + cumulative_flow
+    invested = -cumulative_flow
+    return {'value': value, 'cash': cash, 'invested': invested, 'pnl': value - invested}
+
+
+def portfolio_timeseries(portfolio, start=None, end=None, store=None):
+    """
+    Daily value, cash, invested capital and P&L for a portfolio from its
+    first transaction (or start) to end. Trades after end are left out;
+    their cash flows are backed out of the current balance.
+    Returns dict with 'dates' (datetime64[D]), 'symbols' and the series arrays
+    """
+    rows = list(Transaction.objects.filter(portfolio=portfolio).order_by('date', 'id')
+                .values_list('date', 'stockSymbol', 'transactionType', 'quantity', 'pricePerShare', 'totalPrice'))
+    end = end or timezone.now().date()
+    cash_balance = float(portfolio.cashBalance)
+    if rows:
+        tx_days = np.array([timezone.localtime(r[0]).date() if timezone.is_aware(r[0]) else r[0].date()
+                            for r in rows], dtype='M8[D]')
+        later = tx_days > np.datetime64(end, 'D')
+        cash_balance -= sum(float(r[5]) if r[2] == "Sell" else -float(r[5]) for r, after in zip(rows, later) if after)
+        rows = [r for r, after in zip(rows, later) if not after]
+        tx_days = tx_days[~later]
+    if not rows:
+        empty = np.empty(0)
+        return {'dates': np.empty(0, 'M8[D]'), 'symbols': [], 'value': empty, 'cash': empty,
+                'invested': empty, 'pnl': empty}
+
+    _, tx_symbols, tx_types, quantities, trade_prices, totals = zip(*rows)
+    calendar = business_days(tx_days[0], end)
+    if not len(calendar):
+        calendar = np.array([end], dtype='M8[D]')
+    symbols, symbol_index = np.unique(np.array(tx_symbols), return_inverse=True)
+    day_index = np.minimum(np.searchsorted(calendar, tx_days, side='left'), len(calendar) - 1)
+    sign = np.where(np.array(tx_types) == "Buy", 1.0, -1.0)
+
+    series = build_timeseries(
+        calendar, symbols, day_index, symbol_index,
+        signed_qty=sign * np.array(quantities, dtype=float),
+        trade_prices=np.array(trade_prices, dtype=float),
+        flows=-sign * np.array(totals, dtype=float),
+        cash_balance=cash_balance,
+        closes=close_matrix(list(symbols), calendar, store),
+    )
+    if start:
+        keep = calendar >= np.datetime64(start, 'D')
+        calendar = calendar[keep]
+        series = {name: values[keep] for name, values in series.items()}
+    return {'dates': calendar, 'symbols': list(symbols), **series}
@@ -1,6 +1,7 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.userSignup, name='signup'),
@@ -12,17 +13,28 @@ urlpatterns = [
     path('passwordchange/', auth_views.PasswordChangeView.as_view(template_name='ChangePassword.html'), name='changepassword'),
     path('passwordchangedone/', auth_views.PasswordChangeDoneView.as_view(template_name='PasswordChangeDone.html'), name='password_change_done'),
     path('create/', views.createPortfolio, name='createPortfolio'),
-    path('view/', views.viewPortfolio, name='viewPortfolio'),
+    path('view/', views.viewPortfolioAsync if settings.ASYNC_PRICE_VIEWS else views.viewPortfolio, name='viewPortfolio'),
+    path('view/timeseries/', views.portfolioTimeseries, name='portfolioTimeseries'),
+    path('view/risk/', views.portfolioRisk, name='portfolioRisk'),
     path('update/', views.updatePortfolio, name='updatePortfolio'),
     path('delete/', views.deletePortfolio, name='deletePortfolio'),
     path('transactions/add/', views.addTransaction, name='addTransaction'),
+    path('transactions/import/', views.importTransactions, name='importTransactions'),
     path('transactions/view/', views.viewTransactions, name='viewTransactions'),
     path('transactions/update/<int:id>/', views.updateTransaction, name='updateTransaction'),
     path('transactions/delete/<int:id>/', views.deleteTransaction, name='deleteTransaction'),
     path('transactions/download-csv/', views.downloadTransactionsCSV, name='downloadTransactionsCSV'),
-    path('favorite-stocks/', views.favoriteStocksPage, name='favoriteStocksPage'),
+    path('tickers/autocomplete/', views.tickerAutocomplete, name='tickerAutocomplete'),
+    path('favorite-stocks/', views.favoriteStocksPageAsync if settings.ASYNC_PRICE_VIEWS else views.favoriteStocksPage,
+         name='favoriteStocksPage'),
     path('favorite-stocks/add/', views.addFavoriteStock, name='addFavoriteStock'),
     path('favorite-stocks/remove/', views.removeFavoriteStock, name='removeFavoriteStock'),
+    path('api/v1/portfolio/', api.portfolioSummaryApi, name='apiPortfolio'),
+    path('api/v1/holdings/', api.holdingsApi, name='apiHoldings'),
+    path('api/v1/transactions/', api.transactionsApi, name='apiTransactions'),
+    path('api/v1/favorites/', api.favoritesApi, name='apiFavorites'),
+    path('prices/stream/', views.priceStream, name='priceStream'),
+    path('metrics/', views.performanceMetrics, name='performanceMetrics'),
 
 
 
@@ -1,14 +1,28 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import asyncio
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
-from .models import MainUser, Portfolio, Transaction, StockPriceCache, FavoriteStock
+from .models import MainUser, Portfolio, Transaction, StockPriceCache, FavoriteStock, Holding, TaxLot
 from decimal import Decimal
-import csv
-from django.http import HttpResponse
-from datetime import timedelta
+import io
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from datetime import date, datetime, time, timedelta
 from django.utils import timezone
+from django.conf import settings
 from django.views.decorators.http import require_POST
+from .stock_api import get_stock_price, is_invalid_symbol, quote_metrics
+from .timeseries import portfolio_timeseries
+from .risk import cached_portfolio_risk
+from . import metrics
+from .dashboard import dashboard_cache_metrics, acached_portfolio_summary, afavorites_summary, cached_portfolio_summary, favorites_summary
+from .exports import FORMATS, export_chunks, parquet_available
+from .imports import detect_format, import_transactions
+from .orders import OrderRejected, book_order
+from .pagination import DEFAULT_PAGE_SIZE, keyset_page
+from .tickers import company_name, is_known_symbol, search_tickers
+from .price_stream import event_stream, fetch_prices, get_broker, sse_event, stream_symbols, DEFAULT_SNAPSHOT_RETRY_MS
+from django.core.handlers.asgi import ASGIRequest
 
 # ----------------------------
 # AUTHENTICATION VIEWS
@@ -126,145 +140,100 @@ def createPortfolio(request):
 
     return render(request, 'createPortfolio.html')
 
-from django.core.cache import cache
-from decimal import Decimal
-from .models import StockPriceCache
-import yfinance as yf
-from django.utils import timezone
+def live_prices(request):
+    # Pages subscribe to priceStream only when it can stream, i.e. under ASGI.
+    return isinstance(request, ASGIRequest)
+
+
+@login_required
+def viewPortfolio(request):
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    context = {
+        **cached_portfolio_summary(portfolio),
+        'portfolio': portfolio,
+        'favorite_symbols': set(FavoriteStock.objects.filter(user=request.user).values_list('symbol', flat=True)),
+        'live_prices': live_prices(request),
+    }
+
+    return render(request, 'viewPortfolio.html', context)
 
-CACHE_TIMEOUT = 3600  # seconds = 1 hour
 
-def get_stock_price(symbol):
+@login_required
+async def viewPortfolioAsync(request):
     """
-    Get stock price from cache or fetch live if missing.
-    Updates the database cache as well.
-    Returns tuple: (price: Decimal, last_updated: datetime)
+    viewPortfolio for ASGI deployments (settings.ASYNC_PRICE_VIEWS): quotes
+    are awaited on the event loop instead of holding a thread per request.
     """
-    cache_key = f"stock_price_{symbol}"
-    cached = cache.get(cache_key)
+    user = await request.auser()
+    portfolio = await aget_object_or_404(Portfolio, user=user)
+    summary, favorite_symbols = await asyncio.gather(
+        acached_portfolio_summary(portfolio),
+        _favorite_symbols(user),
+    )
+    context = {**summary, 'portfolio': portfolio, 'favorite_symbols': favorite_symbols,
+               'live_prices': live_prices(request)}
+    return render(request, 'viewPortfolio.html', context)
 
-    if cached:
-        return cached  # (price, last_updated)
 
-    # Fetch live price
-    try:
-        stock = yf.Ticker(symbol)
-        live_price = stock.info.get('regularMarketPrice')
-        if live_price is None:
-            # fallback to database cache
-            db_cache = StockPriceCache.objects.filter(ticker=symbol).first()
-            if db_cache:
-                result = (Decimal(db_cache.last_price), db_cache.last_updated)
-                cache.set(cache_key, result, timeout=CACHE_TIMEOUT)
-                return result
-            return (Decimal(0), None)
-
-        live_price_decimal = Decimal(str(live_price))
-
-        # Update database cache
-        db_cache, _ = StockPriceCache.objects.get_or_create(ticker=symbol)
-        db_cache.last_price = live_price_decimal
-        db_cache.last_updated = timezone.now()
-        db_cache.save()
-
-        # Update Django cache
-        result = (live_price_decimal, db_cache.last_updated)
-        cache.set(cache_key, result, timeout=CACHE_TIMEOUT)
-        return result
-    except Exception as e:
-        print(f"Error fetching price for {symbol}: {e}")
-        return (Decimal(0), None)
+async def _favorite_symbols(user):
+    return {symbol async for symbol in FavoriteStock.objects.filter(user=user).values_list('symbol', flat=True)}
 
 
 
-@login_required
-def viewPortfolio(request):
-    portfolio = get_object_or_404(Portfolio, user=request.user)
-    diversification = portfolio.diversification or {}
-    stock_data = []
-    total_portfolio_value = Decimal(0)
-    total_portfolio_pnl = Decimal(0)
-    last_cache_time = None
-
-    favorite_symbols = set(FavoriteStock.objects.filter(user=request.user)
-                           .values_list('symbol', flat=True))
-
-    # Build stock_data with P&L
-    for symbol, percent in diversification.items():
-        owned_qty = Transaction.getOwnedShares(portfolio, symbol)
-        current_price, updated_at = get_stock_price(symbol)
-        if updated_at and (not last_cache_time or updated_at > last_cache_time):
-            last_cache_time = updated_at
-        avg_buy_price = Transaction.getAverageBuyPrice(portfolio, symbol)
-        holding_value = owned_qty * current_price
-        pnl = owned_qty * (current_price - avg_buy_price)
-
-        total_portfolio_value += holding_value
-        total_portfolio_pnl += pnl
-
-        stock_data.append({
-            'symbol': symbol,
-            'owned_qty': owned_qty,
-            'current_price': round(current_price, 2),
-            'avg_buy_price': round(avg_buy_price, 2),
-            'holding_value': round(holding_value, 2),
-            'pnl': round(pnl, 2),
-            'percent': percent
-        })
-
-    # Determine top gainer and top loser
-    top_gainer = top_loser = None
-    if stock_data:
-        # Use full stock dicts for top_gainer and top_loser
-        top_gainer = max(stock_data, key=lambda x: x['pnl'])
-        top_loser = min(stock_data, key=lambda x: x['pnl'])
-
-    # Compute top 5 holdings by value
-    sorted_by_value = sorted(stock_data, key=lambda x: x['holding_value'], reverse=True)
-    top5 = sorted_by_value[:5]
-    top5_with_value_pct = []
-    for item in top5:
-        pct_by_value = (Decimal(item['holding_value']) / total_portfolio_value * 100) if total_portfolio_value > 0 else Decimal(0)
-        top5_with_value_pct.append({
-            'symbol': item['symbol'],
-            'qty': item['owned_qty'],
-            'price': item['current_price'],
-            'value': item['holding_value'],
-            'pnl': item['pnl'],
-            'avg_buy_price': item['avg_buy_price'],
-            'percent_by_diversification': item['percent'],
-            'percent_by_value': round(pct_by_value, 2)
-        })
 
-    context = {
-        'portfolio': portfolio,
-        'diversification': diversification,
-        'stock_data': stock_data,
-        'total_portfolio_value': round(total_portfolio_value, 2),
-        'total_portfolio_pnl': round(total_portfolio_pnl, 2),
-        'last_cache_time': last_cache_time,
-        'top5': top5_with_value_pct,
-        'favorite_symbols': favorite_symbols,
-        'top_gainer': top_gainer,
-        'top_loser': top_loser,
-    }
 
-    return render(request, 'viewPortfolio.html', context)
+@login_required
+def portfolioTimeseries(request):
+    """
+    Daily portfolio value, cash, invested capital and P&L as JSON for charting.
+    Optional GET 'start' and 'end' (YYYY-MM-DD).
+    """
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    try:
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': 'Dates must be YYYY-MM-DD.'}, status=400)
 
+    series = portfolio_timeseries(portfolio, start=start, end=end)
+    return JsonResponse({
+        'dates': series['dates'].astype(str).tolist(),
+        'value': series['value'].round(2).tolist(),
+        'cash': series['cash'].round(2).tolist(),
+        'invested': series['invested'].round(2).tolist(),
+        'pnl': series['pnl'].round(2).tolist(),
+    })
 
 
+@login_required
+def portfolioRisk(request):
+    """
+    Volatility, drawdown, Sharpe, beta, correlation and VaR of the current
+    holdings as JSON, from the stored daily price history.
+    """
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    return JsonResponse(cached_portfolio_risk(portfolio))
 
 
 @login_required
 def updatePortfolio(request):
     portfolio = get_object_or_404(Portfolio, user=request.user)
     if request.method == "POST":
+        method = request.POST.get('costBasisMethod') or portfolio.costBasisMethod
+        if method not in dict(Portfolio.COST_BASIS_CHOICES):
+            messages.error(request, f"{method} is not a supported cost basis method.")
+            return redirect('updatePortfolio')
         portfolio.name = request.POST.get('name')
         portfolio.description = request.POST.get('description')
         portfolio.initialInvestment = Decimal(request.POST.get('initialInvestment') or portfolio.cashBalance)
         portfolio.cashBalance = Decimal(request.POST.get('cashBalance') or portfolio.cashBalance)
         portfolio.riskTolerance = request.POST.get('riskTolerance')
         portfolio.investmentGoal = request.POST.get('investmentGoal')
+        if method != portfolio.costBasisMethod:
+            portfolio.costBasisMethod = method
+            # Rebuilt before the save, whose version bump then covers the new lots too.
+            for symbol in Holding.objects.filter(portfolio=portfolio).values_list('stockSymbol', flat=True):
+                TaxLot.rebuild(portfolio, symbol)
         portfolio.save()
         messages.success(request, "Portfolio updated successfully!")
         return redirect('viewPortfolio')
@@ -293,52 +262,35 @@ def addTransaction(request):
         stockSymbol = request.POST.get('stockSymbol').upper()
         stockName = request.POST.get('stockName')
         transactionType = request.POST.get('transactionType')
-        shareQuant = int(request.POST.get('quantity'))
         note = request.POST.get('note', '')
+        try:
+            shareQuant = int(request.POST.get('quantity'))
+        except (TypeError, ValueError):
+            messages.error(request, "Quantity must be a whole number of shares.")
+            return redirect('addTransaction')
+
+        # Unknown symbols are rejected from the local directory, without a quote request
+        if is_known_symbol(stockSymbol) is False:
+            messages.error(request, f"{stockSymbol} is not a recognised stock symbol.")
+            return redirect('addTransaction')
+        stockName = stockName or company_name(stockSymbol) or stockSymbol
 
         # Get latest price using the new caching function
         pricePerShare, last_updated = get_stock_price(stockSymbol)
 
+        if pricePerShare == 0 and is_invalid_symbol(stockSymbol):
+            messages.error(request, f"{stockSymbol} is not a recognised stock symbol.")
+            return redirect('addTransaction')
+
         if pricePerShare == 0:
             messages.error(request, f"Could not fetch price for {stockSymbol}.")
             return redirect('addTransaction')
 
-        totalPrice = shareQuant * Decimal(pricePerShare)
-
-        # Validate Sell transaction
-        if transactionType == "Sell":
-            ownedShares = Transaction.getOwnedShares(portfolio, stockSymbol)
-            if ownedShares <= 0 or shareQuant > ownedShares:
-                messages.error(
-                    request,
-                    f"Cannot sell {shareQuant} shares of {stockSymbol}. You own {ownedShares}."
-                )
-                return redirect('addTransaction')
-
-        # Validate Buy transaction
-        elif transactionType == "Buy":
-            if totalPrice > portfolio.cashBalance:
-                messages.error(
-                    request,
-                    f"Insufficient cash balance to buy {shareQuant} shares of {stockSymbol}."
-                )
-                return redirect('addTransaction')
-
-        # Create transaction
-        Transaction.objects.create(
-            portfolio=portfolio,
-            stockSymbol=stockSymbol,
-            stockName=stockName,
-            transactionType=transactionType,
-            quantity=shareQuant,
-            pricePerShare=Decimal(pricePerShare),
-            totalPrice=totalPrice,
-            note=note
-        )
-
-        # Update portfolio cash balance
-        portfolio.cashBalance += -totalPrice if transactionType == "Buy" else totalPrice
-        portfolio.save()
+        try:
+            book_order(portfolio, stockSymbol, stockName, transactionType, shareQuant, pricePerShare, note)
+        except OrderRejected as e:
+            messages.error(request, str(e))
+            return redirect('addTransaction')
 
         messages.success(request, f"{transactionType} transaction for {stockSymbol} added successfully.")
         return redirect('viewTransactions')
@@ -351,30 +303,150 @@ def addTransaction(request):
 
 
 @login_required
-def viewTransactions(request):
+def tickerAutocomplete(request):
+    """
+    Symbols and company names starting with GET 'q', as JSON.
+    """
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    results = search_tickers(request.GET.get('q', ''), limit)
+    return JsonResponse({'results': [{'symbol': symbol, 'name': name} for symbol, name in results]})
+
+
+def performanceMetrics(request):
+    """
+    Per-view request metrics and the quote and dashboard cache counters of
+    this worker process in the Prometheus text format. Only answers
+    PERF_METRICS_ALLOWED_IPS.
+    """
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'PERF_METRICS_ALLOWED_IPS', metrics.DEFAULT_ALLOWED_IPS):
+        raise Http404
+    body = "".join([
+        metrics.registry.render(),
+        metrics.render_counter('finsight_quotes_total', "Quotes served by source since the worker started.",
+                               'source', quote_metrics()),
+        metrics.render_counter('finsight_dashboard_cache_total', "Dashboard summary cache lookups by result.",
+                               'result', dashboard_cache_metrics()),
+    ])
+    return HttpResponse(body, content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+async def priceStream(request):
+    """
+    Server-sent events with price updates for the symbols the user holds or
+    watches. Under WSGI a streaming response would tie up a worker thread per
+    browser, and pages don't subscribe there (see live_prices()); a client
+    that connects anyway gets one snapshot and a long reconnect delay, so it
+    doesn't turn into a price fetch every few seconds per tab.
+    """
+    symbols = await stream_symbols(await request.auser())
+    if isinstance(request, ASGIRequest):
+        response = StreamingHttpResponse(event_stream(get_broker(), symbols), content_type='text/event-stream')
+    else:
+        snapshot = await fetch_prices(symbols) if symbols else {}
+        retry = getattr(settings, 'STOCK_STREAM_SNAPSHOT_RETRY_MS', DEFAULT_SNAPSHOT_RETRY_MS)
+        response = StreamingHttpResponse([f"retry: {retry}\n\n", sse_event(snapshot)],
+                                         content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # keep nginx from buffering the stream
+    return response
+
+
+@login_required
+def importTransactions(request):
+    """
+    Bulk import a CSV or JSONL file of historical trades. With 'dry_run'
+    checked the file is only validated.
+    """
     portfolio = get_object_or_404(Portfolio, user=request.user)
-    transactions = Transaction.objects.filter(portfolio=portfolio).order_by('-date')
+    result = None
+    if request.method == "POST":
+        upload = request.FILES.get('file')
+        if not upload:
+            messages.error(request, "Choose a CSV or JSONL file to import.")
+            return redirect('importTransactions')
 
-    transaction_type = request.GET.get('type')
-    stock_symbol = request.GET.get('symbol')
-    start_date = request.GET.get('start')
-    end_date = request.GET.get('end')
+        lines = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+        result = import_transactions(portfolio, lines, fmt=detect_format(upload.name),
+                                     dry_run=bool(request.POST.get('dry_run')))
+        if result.ok and not result.dry_run:
+            messages.success(request, f"Imported {result.created} transactions.")
+            return redirect('viewTransactions')
+
+    return render(request, 'importTransactions.html', {'portfolio': portfolio, 'result': result})
+
+
+def filter_transactions(transactions, params):
+    """
+    Apply the transaction list filters (type, symbol, start, end) from a
+    QueryDict, shared by the list page and the exports. Symbols match by
+    prefix and dates by half-open datetime ranges, so both can use the
+    (portfolio, ...) indexes instead of scanning the ledger.
+    """
+    transaction_type = params.get('type')
+    stock_symbol = (params.get('symbol') or '').strip().upper()
+    start_date = parse_date_param(params.get('start'))
+    end_date = parse_date_param(params.get('end'))
 
     if transaction_type and transaction_type != "All":
         transactions = transactions.filter(transactionType=transaction_type)
     if stock_symbol:
-        transactions = transactions.filter(stockSymbol__icontains=stock_symbol)
+        # Symbols are stored upper-case; a range is a prefix match any index can serve.
+        upper = stock_symbol[:-1] + chr(ord(stock_symbol[-1]) + 1)
+        transactions = transactions.filter(stockSymbol__gte=stock_symbol, stockSymbol__lt=upper)
     if start_date:
-        transactions = transactions.filter(date__date__gte=start_date)
+        transactions = transactions.filter(date__gte=start_of_day(start_date))
     if end_date:
-        transactions = transactions.filter(date__date__lte=end_date)
+        transactions = transactions.filter(date__lt=start_of_day(end_date + timedelta(days=1)))
+    return transactions
+
+
+def parse_date_param(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+@login_required
+def viewTransactions(request):
+    """
+    Filtered transactions, newest first, one keyset page at a time
+    (GET 'after' / 'before' cursors).
+    """
+    portfolio = get_object_or_404(Portfolio, user=request.user)
+    transactions = filter_transactions(Transaction.objects.filter(portfolio=portfolio), request.GET)
+    page, older, newer = keyset_page(transactions, after=request.GET.get('after'), before=request.GET.get('before'),
+                                     size=getattr(settings, 'TRANSACTIONS_PAGE_SIZE', DEFAULT_PAGE_SIZE))
+
+    def page_query(**cursor):
+        query = request.GET.copy()
+        query.pop('after', None)
+        query.pop('before', None)
+        query.update(cursor)
+        return query.urlencode()
+
+    transaction_type = request.GET.get('type')
+    stock_symbol = request.GET.get('symbol')
+    start_date = request.GET.get('start')
+    end_date = request.GET.get('end')
 
     context = {
-        'transactions': transactions,
+        'transactions': page,
         'selected_type': transaction_type or "All",
         'symbol': stock_symbol or "",
         'start_date': start_date or "",
         'end_date': end_date or "",
+        'older_query': page_query(after=older) if older else None,
+        'newer_query': page_query(before=newer) if newer else None,
+        'first_query': page_query() if newer else None,
     }
 
     return render(request, 'viewTransactions.html', context)
@@ -409,30 +481,24 @@ def deleteTransaction(request, id):
 
 @login_required
 def downloadTransactionsCSV(request):
+    """
+    Stream the filtered transaction history. GET 'format' picks csv
+    (default), gzip (CSV compressed on the fly) or parquet.
+    """
     portfolio = get_object_or_404(Portfolio, user=request.user)
-    transactions = Transaction.objects.filter(portfolio=portfolio).order_by('-date')
-
-    response = HttpResponse(content_type="text/csv")
-    response['Content-Disposition'] = 'attachment; filename="transaction_history.csv"'
+    transactions = filter_transactions(Transaction.objects.filter(portfolio=portfolio), request.GET).order_by('-date', '-id')
 
-    writer = csv.writer(response)
-    writer.writerow([
-        "Date", "Stock Symbol", "Stock Name", "Transaction Type",
-        "Quantity", "Price Per Share", "Total Price", "Note"
-    ])
-
-    for t in transactions:
-        writer.writerow([
-            t.date.strftime("%Y-%m-%d %H:%M"),
-            t.stockSymbol,
-            t.stockName,
-            t.transactionType,
-            t.quantity,
-            float(t.pricePerShare),
-            float(t.totalPrice),
-            t.note or ""
-        ])
+    fmt = request.GET.get('format') or 'csv'
+    if fmt not in FORMATS:
+        messages.error(request, f"Unknown export format '{fmt}'.")
+        return redirect('viewTransactions')
+    if fmt == 'parquet' and not parquet_available():
+        messages.error(request, "Parquet export needs the pyarrow package installed on the server.")
+        return redirect('viewTransactions')
 
+    content_type, filename = FORMATS[fmt]
+    response = StreamingHttpResponse(export_chunks(transactions, fmt), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
@@ -441,59 +507,19 @@ def favoriteStocksPage(request):
     """
     Show the user's favorite stocks with cached or live prices.
     """
-    favorites = FavoriteStock.objects.filter(user=request.user).order_by('-added_at')
-    stock_data = []
-    last_cache_time = None
-    cache_expiry = timedelta(hours=12)
-    total_value = Decimal(0)
-
-    for fav in favorites:
-        symbol = fav.symbol
-        name = fav.name or ""
-        current_price = Decimal(0)
-        cache = StockPriceCache.objects.filter(ticker=symbol).first()
-        need_update = True if not cache else timezone.now() - cache.last_updated > cache_expiry
-
-        if cache:
-            current_price = Decimal(cache.last_price)
-            if not last_cache_time or cache.last_updated > last_cache_time:
-                last_cache_time = cache.last_updated
-
-        if need_update:
-            live_price = fetch_and_update_stock_price(symbol)
-            if live_price is not None:
-                current_price = Decimal(live_price)
-                cache = StockPriceCache.objects.get(ticker=symbol)
-                if not last_cache_time or cache.last_updated > last_cache_time:
-                    last_cache_time = cache.last_updated
-
-        # optional: compute user's owned shares in portfolio(s) for this symbol
-        # We'll sum across all portfolios the user owns (if any)
-        owned_qty = 0
-        # If user has a portfolio we use it; otherwise 0
-        try:
-            portfolio = request.user.portfolio
-            owned_qty = Transaction.getOwnedShares(portfolio, symbol)
-        except Portfolio.DoesNotExist:
-            owned_qty = 0
-
-        value = owned_qty * current_price
-        total_value += Decimal(value)
-
-        stock_data.append({
-            'symbol': symbol,
-            'name': name,
-            'current_price': round(current_price, 2),
-            'owned_qty': owned_qty,
-            'value': round(value, 2),
-        })
+    context = favorites_summary(request.user, Portfolio.objects.filter(user=request.user).first())
+    context['live_prices'] = live_prices(request)
+    return render(request, 'favorite_stocks.html', context)
 
-    context = {
-        'favorites': favorites,
-        'stock_data': stock_data,
-        'last_cache_time': last_cache_time,
-        'total_value': round(total_value, 2),
-    }
+
+@login_required
+async def favoriteStocksPageAsync(request):
+    """
+    favoriteStocksPage for ASGI deployments (settings.ASYNC_PRICE_VIEWS).
+    """
+    user = await request.auser()
+    context = await afavorites_summary(user, await Portfolio.objects.filter(user=user).afirst())
+    context['live_prices'] = live_prices(request)
     return render(request, 'favorite_stocks.html', context)
 
 @require_POST
@@ -508,6 +534,17 @@ def addFavoriteStock(request):
         messages.error(request, "No symbol provided.")
         return redirect(request.META.get('HTTP_REFERER', 'favoriteStocksPage'))
 
+    # Checked against the local ticker directory; without one, ask the quote
+    # provider (unknown symbols are negative-cached there).
+    known = is_known_symbol(symbol)
+    if known is None:
+        price, _ = get_stock_price(symbol)
+        known = not (price == 0 and is_invalid_symbol(symbol))
+    if not known:
+        messages.error(request, f"{symbol} is not a recognised stock symbol.")
+        return redirect(request.META.get('HTTP_REFERER', 'favoriteStocksPage'))
+    name = name or company_name(symbol)
+
     fav, created = FavoriteStock.objects.get_or_create(user=request.user, symbol=symbol, defaults={'name': name})
     if created:
         messages.success(request, f"{symbol} added to your favorites.")
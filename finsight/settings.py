@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'FinSight.metrics.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,6 +82,33 @@ DATABASES = {
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
+# Applied to every new SQLite connection by FinSight/db.py; busy_timeout (ms)
+# is how long a writer waits for the lock before "database is locked".
+SQLITE_PRAGMAS = {'busy_timeout': 20000}
+# Production profile (FINSIGHT_DB_PROFILE=production): WAL so readers run
+# alongside the single writer, relaxed fsync, bigger page cache and mmap,
+# persistent connections, and read-only dashboard queries on a query-only
+# connection of their own (FinSight.db.DashboardRouter). Point
+# DATABASES['dashboard'] at a replica to take them off the primary.
+# manage.py bench_database compares these pragmas with the default ones.
+SQLITE_PRODUCTION_PRAGMAS = {
+    **SQLITE_PRAGMAS,  # first, so switching the journal mode waits for the lock too
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -65536,  # KiB, i.e. 64 MiB of page cache per connection
+    'mmap_size': 268435456,  # bytes
+    'temp_store': 'MEMORY',
+}
+if os.environ.get('FINSIGHT_DB_PROFILE') == 'production':
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    DATABASES['default'].update(CONN_MAX_AGE=600, CONN_HEALTH_CHECKS=True)
+    DATABASES['dashboard'] = {
+        **DATABASES['default'],
+        'OPTIONS': {'init_command': 'PRAGMA query_only = 1'},
+        'TEST': {'MIRROR': 'default'},
+    }
+DATABASE_ROUTERS = ['FinSight.db.DashboardRouter']
+DASHBOARD_READ_DATABASE = 'dashboard'
 
 
 # Password validation
@@ -135,7 +164,97 @@ CACHES = {
     "default": {
         "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
         "LOCATION": "unique-snowflake",
-    }
+    },
+    # Shared (L2) tier of the quote cache, visible to every worker process.
+    # Concurrent fetches of a symbol are coalesced within each process; across
+    # processes only with a backend whose add() is atomic (Redis, Memcached),
+    # which multi-worker deployments should use. For Redis use:
+    #   "BACKEND": "django.core.cache.backends.redis.RedisCache",
+    #   "LOCATION": "redis://127.0.0.1:6379",
+    # FileBasedCache lists its directory on every set and drops a random third
+    # of the files once MAX_ENTRIES is passed. A tracked symbol takes up to
+    # five files (quote and failure record, each with a version stamp, and a
+    # fetch lock), so the limit below fits about 6000 symbols; size it to the
+    # symbol universe, or use Redis when that is much larger.
+    "quotes": {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": BASE_DIR / ".cache" / "quotes",
+        "OPTIONS": {"MAX_ENTRIES": 30000},
+    },
 }
 
 
+
+# Stock quote providers, tried in order. Each has connect/read timeouts and
+# its own circuit breaker; FinSight.providers.FakeProvider works offline.
+STOCK_PRICE_PROVIDERS = [
+    {
+        'BACKEND': 'FinSight.providers.YFinanceProvider',
+        'OPTIONS': {'connect_timeout': 3.05, 'read_timeout': 5},
+    },
+]
+if os.environ.get('ALPHAVANTAGE_API_KEY'):
+    STOCK_PRICE_PROVIDERS.append({
+        'BACKEND': 'FinSight.providers.AlphaVantageProvider',
+        'OPTIONS': {'api_key': os.environ['ALPHAVANTAGE_API_KEY'], 'connect_timeout': 3.05, 'read_timeout': 5},
+    })
+STOCK_PRICE_CIRCUIT_BREAKER = {'failure_threshold': 5, 'reset_timeout': 30}
+# Quote misses are fetched in parallel batches; whatever is not back within
+# the deadline (seconds) is served from StockPriceCache and marked stale.
+STOCK_PRICE_BATCH_SIZE = 20
+STOCK_PRICE_FETCH_WORKERS = 8
+STOCK_PRICE_FETCH_DEADLINE = 0.8
+# Upstream requests in flight at once per event loop for the async price views.
+STOCK_PRICE_ASYNC_CONCURRENCY = 16
+# Page views only read cached prices and never call the provider: run
+# `manage.py refresh_prices --loop` to keep StockPriceCache warm. Set to True
+# to fetch misses on the request instead (single-process development setups).
+# Trades and new favorites always price their one symbol live.
+STOCK_PRICE_FETCH_ON_REQUEST = False
+# Cached prices are served as-is for STOCK_PRICE_SOFT_TTL seconds, then served
+# stale while one background refresh runs, and dropped after the hard TTL.
+STOCK_PRICE_SOFT_TTL = 300
+STOCK_PRICE_HARD_TTL = 3600
+# In-process (L1) tier of the quote cache: entry limit, lifetime, and how
+# often an entry is checked against the shared tier's version stamp.
+STOCK_PRICE_L1_MAX_ENTRIES = 1024
+STOCK_PRICE_L1_TTL = 60
+STOCK_PRICE_L1_VALIDATE_AFTER = 1
+# Symbols that fail to price are retried after an exponentially growing,
+# jittered delay starting at STOCK_PRICE_BACKOFF_BASE seconds.
+STOCK_PRICE_BACKOFF_BASE = 30
+STOCK_PRICE_BACKOFF_MAX = 6 * 3600
+# Columnar daily price history (see FinSight/price_history.py)
+PRICE_HISTORY_DIR = BASE_DIR / "price_history"
+# Column files kept memory-mapped at once (one open file descriptor each)
+PRICE_HISTORY_MAX_OPEN_MAPS = 256
+# Portfolio risk analytics from that history (FinSight/risk.py): beta against the
+# benchmark, one-day VaR at RISK_CONFIDENCE, Sharpe over the annual risk-free rate
+RISK_BENCHMARK_SYMBOL = "SPY"
+RISK_LOOKBACK_DAYS = 365
+RISK_CONFIDENCE = 0.95
+RISK_FREE_RATE = 0.0
+RISK_CACHE_TIMEOUT = 86400
+# Rows per page on the transaction list (keyset pagination)
+TRANSACTIONS_PAGE_SIZE = 50
+# Ticker directory (manage.py load_tickers); the in-memory index is rebuilt this often
+TICKER_INDEX_TTL = 3600
+# Computed dashboard summaries, keyed by portfolio and price versions
+DASHBOARD_CACHE_ALIAS = "default"
+DASHBOARD_CACHE_TIMEOUT = 600
+# Live price stream (server-sent events, served under ASGI): one poll per interval
+# for all subscribed symbols, and a keep-alive comment after this many idle seconds
+STOCK_STREAM_POLL_INTERVAL = 5
+STOCK_STREAM_HEARTBEAT = 15
+# Pages only subscribe under ASGI; a WSGI client that connects anyway gets one
+# snapshot and is told to reconnect after this many ms
+STOCK_STREAM_SNAPSHOT_RETRY_MS = 300000
+# Serve the portfolio and favorites pages from their async views. asgi.py turns
+# this on; under WSGI the sync views avoid running an event loop per request.
+ASYNC_PRICE_VIEWS = os.environ.get('FINSIGHT_ASYNC_VIEWS') == '1'
+# Per-request performance metrics (FinSight/metrics.py), scraped from /metrics/
+# by these addresses only; Server-Timing response headers while debugging.
+PERF_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+PERF_SERVER_TIMING = DEBUG
+# Results of `manage.py run_benchmarks --save-baseline`, compared on every run
+BENCHMARK_BASELINE = BASE_DIR / "benchmarks" / "baseline.json"